@@ -0,0 +1,88 @@
+"""
+Benchmark: the tools on the three DataLoader backends, pandas, DuckDB and Spark, over the same
+parquet file.
+
+For each backend it reports the load time (for DuckDB also with a persisted database file, whose
+first load imports the data), the memory the loaded data takes in the Python process, and the
+wall time of every tool. Spark runs locally and is skipped if pyspark or Java is missing.
+
+    python benchmarks/bench_backends.py --stores 50 --skus 200 --days 365
+    python benchmarks/bench_backends.py --backends pandas duckdb
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame, timed
+from src.data_loader import DataLoader
+from src.tools.trend_analysis import calculate_category_trends, compare_stores_performance, analyze_seasonality
+from src.tools.anomaly_detection import detect_sales_spikes, detect_stock_shortages, flag_anomalous_promotions
+from src.tools.scenario_simulation import simulate_price_change, simulate_promotion, simulate_price_grid
+
+TOOLS = [
+    ("category trends (W)", lambda data: calculate_category_trends(data, time_period='W')),
+    ("store performance", lambda data: compare_stores_performance(data)),
+    ("seasonality", lambda data: analyze_seasonality(data, category='Snacks')),
+    ("sales spikes", lambda data: detect_sales_spikes(data, threshold=2.0)),
+    ("sales spikes (28D)", lambda data: detect_sales_spikes(data, threshold=2.0, window=28)),
+    ("stock shortages", lambda data: detect_stock_shortages(data, critical_level=20)),
+    ("failed promotions", lambda data: flag_anomalous_promotions(data)),
+    ("price change", lambda data: simulate_price_change(data, 101, 0.1)),
+    ("promotion", lambda data: simulate_promotion(data, 'Snacks', 0.2, 1.5)),
+    ("price grid", lambda data: simulate_price_grid(data, [101, 102, 103], [-0.1, 0.1], [-1.5, -1.0])),
+]
+
+def load(backend, path, database):
+    if backend == 'pandas':
+        loader = DataLoader(use_spark=False)
+        return loader.load_data(path, compact=True)
+    if backend == 'spark':
+        loader = DataLoader(use_spark=True)
+        return loader.load_data(path, compact=True).cache()
+    return DataLoader(backend='duckdb', database=database).load_data(path, compact=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tools on the pandas, DuckDB and Spark backends.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--backends", nargs="+", choices=["pandas", "duckdb", "spark"], default=["pandas", "duckdb", "spark"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sales.parquet")
+        make_sales_frame(args.stores, args.skus, args.days).to_parquet(path, index=False)
+        print(f"Rows: {args.stores * args.skus * args.days:,}  Parquet: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        runs = [(backend, None) for backend in args.backends]
+        if 'duckdb' in args.backends:
+            runs.insert(runs.index(('duckdb', None)) + 1, ('duckdb', os.path.join(tmp, "sales.duckdb")))
+
+        for backend, database in runs:
+            label = f"{backend} (database file)" if database else backend
+            start = time.perf_counter()
+            try:
+                data = load(backend, path, database)
+                if backend == 'spark':
+                    data.count()
+            except Exception as e:
+                print(f"\n{label}: unavailable ({type(e).__name__}: {str(e).splitlines()[0]})")
+                continue
+            load_time = time.perf_counter() - start
+
+            in_memory = data.memory_usage(deep=True).sum() / 1e6 if backend == 'pandas' else 0.0
+            print(f"\n{label}: load {load_time:.3f}s  data in Python memory {in_memory:.1f} MB")
+            if database:
+                reload_time, _ = timed(load, backend, path, database)
+                print(f"  reopen with stored table: {reload_time:.3f}s")
+            for name, tool in TOOLS:
+                elapsed, _ = timed(tool, data, repeat=3)
+                print(f"  {name:<20}: {elapsed:8.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Benchmark: memory footprint and groupby speed of the default vs. compact DataLoader representation.
+
+    python benchmarks/bench_compact_load.py --stores 50 --skus 200 --days 365
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame, timed
+from src.data_loader import DataLoader
+from src.tools.trend_analysis import compare_stores_performance
+from src.tools.anomaly_detection import detect_sales_spikes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compact DataLoader mode.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cpg_sales_data.parquet")
+        make_sales_frame(args.stores, args.skus, args.days).to_parquet(path)
+
+        dl = DataLoader(use_spark=False)
+        frames = {
+            "default": dl.load_data(path),
+            "compact": dl.load_data(path, compact=True),
+        }
+
+    report = dl.last_memory_report
+    print(f"Rows: {len(frames['compact']):,}")
+    print(f"default: {report['original_bytes'] / 1e6:8.1f} MB")
+    print(f"compact: {report['compact_bytes'] / 1e6:8.1f} MB  ({report['original_bytes'] / report['compact_bytes']:.1f}x smaller)")
+
+    for name, df in frames.items():
+        store_time, _ = timed(compare_stores_performance, df, repeat=3)
+        spike_time, _ = timed(detect_sales_spikes, df, repeat=3)
+        print(f"{name}: StorePerformance {store_time:.3f}s  SalesSpikes {spike_time:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark: N simultaneous chat sessions answered one after another with the blocking
+`agent.run` vs. concurrently through AgentSessions.arun.
+
+The LLM is the local StubChatModel with a fixed simulated latency per call, so the numbers
+measure the agent runtime, the tools and the scheduling, not a provider. Each session asks
+`--turns` questions in sequence; the per-turn latency is measured from the moment the
+session sends the question until it has its answer.
+
+    python benchmarks/bench_concurrency.py --sessions 20 --turns 3 --latency 0.2
+
+With `--llm env` the LLM comes from get_llm() instead, e.g. LLM_BACKEND=replay to replay a
+recorded session with real model responses and no network.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import warnings
+import numpy as np
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame
+from src.dataset import PreparedDataset
+from src.agent.runner import AgentSessions
+from src.genai.llm_interface import get_llm
+from src.genai.stub_llm import StubChatModel
+
+QUESTIONS = [
+    "Which categories are trending this quarter?",
+    "Were there any sales spikes?",
+    "Which stores are running low on stock?",
+    "Which promotions underperformed?",
+    "How do the stores compare?",
+    "What does seasonality look like?",
+]
+
+def question(session, turn):
+    return QUESTIONS[(session + turn) % len(QUESTIONS)]
+
+def run_blocking(sessions, n_sessions, n_turns):
+    """
+    The original front-end behaviour: every turn blocks until the previous one is answered, so the
+    sessions' questions, all sent at the start of a round, queue behind each other.
+    """
+    latencies = []
+    for turn in range(n_turns):
+        sent = time.perf_counter()
+        for session in range(n_sessions):
+            sessions.get(session).run(question(session, turn))
+            latencies.append(time.perf_counter() - sent)
+    return latencies
+
+async def run_concurrent(sessions, n_sessions, n_turns):
+    latencies = []
+
+    async def converse(session):
+        for turn in range(n_turns):
+            start = time.perf_counter()
+            await sessions.arun(session, question(session, turn))
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(converse(session) for session in range(n_sessions)))
+    return latencies
+
+def report(label, wall, latencies):
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"{label:<11}: wall {wall:7.2f}s  p50 {p50:6.3f}s  p95 {p95:6.3f}s  turns/s {len(latencies) / wall:7.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent agent sessions.")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per LLM call.")
+    parser.add_argument("--llm", choices=["stub", "env"], default="stub", help="'env' uses get_llm() and its LLM_BACKEND setting.")
+    parser.add_argument("--workers", type=int, default=None, help="Tool thread pool size.")
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--skus", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    # LangChain flags the legacy agent API on every call
+    warnings.simplefilter("ignore")
+
+    dataset = PreparedDataset(make_sales_frame(args.stores, args.skus, args.days))
+    print(f"Rows: {len(dataset):,}  Sessions: {args.sessions}  Turns/session: {args.turns}  LLM latency: {args.latency}s")
+
+    def new_sessions():
+        # A fresh tool cache each run, so neither mode is served from the other's results
+        llm_factory = get_llm if args.llm == "env" else lambda: StubChatModel(latency=args.latency)
+        return AgentSessions(dataset, llm_factory=llm_factory,
+                             max_workers=args.workers, verbose=False)
+
+    sessions = new_sessions()
+    start = time.perf_counter()
+    latencies = run_blocking(sessions, args.sessions, args.turns)
+    report("blocking", time.perf_counter() - start, latencies)
+    sessions.close()
+
+    sessions = new_sessions()
+    start = time.perf_counter()
+    latencies = asyncio.run(run_concurrent(sessions, args.sessions, args.turns))
+    report("concurrent", time.perf_counter() - start, latencies)
+    sessions.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: demand forecasts for every SKU x store series, batched across the series and a process pool.
+
+Holds out the last `--holdout` days, fits each model on the rest (sequentially and with `--jobs`
+worker processes, checking both give the same forecasts) and reports the time and the holdout
+accuracy (WAPE, weighted absolute percentage error). The batched ridge regression is compared with
+a loop that fits one series at a time (timed on `--loop-series` series and extrapolated), and the
+cached calls the agent makes afterwards (another horizon, projected stock-outs) are timed too.
+
+    python benchmarks/bench_forecasting.py --stores 50 --skus 500 --days 365 --jobs 4
+"""
+import argparse
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame, timed
+from src.data_loader import compact_frame
+from src.dataset import PreparedDataset
+from src.tools.forecasting import FORECAST_MODELS, RIDGE_PENALTY, SalesPanel, _ridge_calendar, forecast_demand, project_stock_outs
+
+def legacy_ridge_loop(frame: pd.DataFrame, horizon: int):
+    """
+    The ridge forecast of every series of `frame`, fitted one series at a time with pandas groups.
+    """
+    panel_dates = pd.date_range(frame['date'].min(), frame['date'].max(), freq='D')
+    future = pd.date_range(panel_dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    forecasts = {}
+    for key, group in frame.groupby(['sku_id', 'store_id'], observed=True):
+        dates = pd.DatetimeIndex(group['date'])
+        calendar = _calendar_features(dates, panel_dates)
+        log_price = np.log(group['price'].to_numpy(dtype='float64') / group['price'].iloc[-1])
+        features = np.column_stack([calendar, group['promo_flag'].to_numpy(), log_price])
+        penalty = np.diag([1e-8] + [RIDGE_PENALTY] * (features.shape[1] - 1))
+        coefficients = np.linalg.solve(features.T @ features + penalty, features.T @ group['units_sold'].to_numpy(dtype='float64'))
+        ahead = np.column_stack([_calendar_features(future, panel_dates), np.zeros((horizon, 2))])
+        forecasts[key] = np.clip(ahead @ coefficients, 0, None)
+    return forecasts
+
+def _calendar_features(dates: pd.DatetimeIndex, history: pd.DatetimeIndex):
+    # Same columns as forecasting._ridge_calendar (holidays left at 0)
+    day_of_year = 2 * np.pi * dates.dayofyear.to_numpy() / 365.25
+    return np.column_stack(
+        [np.ones(len(dates)), (dates - history[0]).days.to_numpy() / len(history), np.sin(day_of_year), np.cos(day_of_year), np.zeros(len(dates))]
+        + [(dates.dayofweek == weekday).astype('float64') for weekday in range(1, 7)]
+    )
+
+def wape(forecast: pd.DataFrame, actual: pd.DataFrame):
+    merged = forecast.merge(actual[['date', 'sku_id', 'store_id', 'units_sold']], on=['date', 'sku_id', 'store_id'])
+    return (merged['forecast_units'] - merged['units_sold']).abs().sum() / merged['units_sold'].sum()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batched demand forecasts.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--holdout", type=int, default=14)
+    parser.add_argument("--jobs", type=int, default=2)
+    parser.add_argument("--loop-series", type=int, default=1000, help="Series (whole stores) the per-series loop is timed on.")
+    args = parser.parse_args()
+
+    frame = compact_frame(make_sales_frame(args.stores, args.skus, args.days + args.holdout))
+    cutoff = frame['date'].max() - pd.Timedelta(days=args.holdout)
+    actual = frame[frame['date'] > cutoff]
+    frame = frame[frame['date'] <= cutoff].reset_index(drop=True)
+
+    dataset = PreparedDataset(frame)
+    print(f"Rows: {len(dataset):,}  Series: {args.stores * args.skus:,}  Days: {args.days}  Horizon: {args.holdout}")
+
+    panel_time, panel = timed(SalesPanel, dataset.df, dataset.rollups.series_stats.index, dataset.rollups.series_codes)
+    print(f"sales panel               : {panel_time:8.3f}s")
+
+    for model in FORECAST_MODELS:
+        runs = {}
+        for jobs in dict.fromkeys((1, args.jobs)):
+            # A fresh cache per run, sharing the panel
+            dataset.derived.clear()
+            dataset.derived['sales_panel'] = panel
+            elapsed, runs[jobs] = timed(forecast_demand, dataset, args.holdout, model, n_jobs=jobs)
+            print(f"{model:<15} (n_jobs={jobs}) : {elapsed:8.3f}s  WAPE {wape(runs[jobs], actual):.3f}")
+        pd.testing.assert_frame_equal(runs[1], runs[args.jobs])
+
+    # The loop runs on the rows of the first stores, so its cost is in proportion to the series it fits
+    loop_stores = max(1, args.loop_series // args.skus)
+    loop_frame = frame[frame['store_id'] <= frame['store_id'].min() + loop_stores - 1]
+    loop_time, loop_forecasts = timed(legacy_ridge_loop, loop_frame, args.holdout)
+    estimated = loop_time / len(loop_forecasts) * args.stores * args.skus
+    dataset.derived.clear()
+    batched_time, _ = timed(forecast_demand, dataset, args.holdout, 'ridge')
+    print(f"per-series ridge loop     : {estimated:8.3f}s (estimated from {len(loop_forecasts):,} series)")
+    print(f"batched ridge incl. panel : {batched_time:8.3f}s  speedup: {estimated / batched_time:.0f}x")
+
+    # The agent's follow-up questions read the cached forecasts
+    cached_time, _ = timed(forecast_demand, dataset, 7, 'ridge', sku_ids=[101], repeat=3)
+    print(f"cached forecast, one SKU  : {cached_time * 1000:8.1f} ms")
+    stock_out_time, stock_outs = timed(project_stock_outs, dataset, args.holdout, repeat=3)
+    print(f"projected stock-outs      : {stock_out_time * 1000:8.1f} ms  ({len(stock_outs):,} series run out)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: end-to-end latency of composite questions with the ReAct agent vs. the
+planner/executor mode (create_cpg_agent(mode='plan')).
+
+The LLM is the local StubChatModel with a fixed simulated latency per call. For a health check
+it calls the five diagnostic tools (see stub_llm.HEALTH_CHECK_ROUTES): the ReAct agent makes one
+LLM call before each tool and one for the answer, running the tools one at a time, while the
+planner makes one planning call, runs the five tools at once and makes one synthesis call.
+Every question starts from a fresh tool cache, so both modes run the tools.
+
+    python benchmarks/bench_planner.py --latency 0.5 --questions 3
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame
+from src.dataset import PreparedDataset
+from src.agent.agent_core import create_cpg_agent
+from src.agent.tool_cache import ToolResultCache
+from src.genai.stub_llm import StubChatModel
+
+def run(dataset, mode, latency, questions, executor):
+    llm = StubChatModel(latency=latency)
+    agent = None
+    elapsed = []
+    for i in range(questions):
+        # A new agent per question, so every turn computes its tools instead of hitting the cache
+        agent = create_cpg_agent(dataset, tool_cache=ToolResultCache(), llm=llm, executor=executor, verbose=False, mode=mode)
+        start = time.perf_counter()
+        agent.run(f"Give me a full health check of the business (question {i})")
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed), len(llm.prompt_tokens) // questions, agent
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ReAct agent against the planner/executor on composite questions.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per LLM call.")
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=8, help="Tool thread pool size.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    # LangChain flags the legacy agent API on every call
+    warnings.simplefilter("ignore")
+
+    dataset = PreparedDataset(make_sales_frame(args.stores, args.skus, args.days))
+    print(f"Rows: {len(dataset):,}  LLM latency: {args.latency}s")
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        react, react_calls, _ = run(dataset, 'react', args.latency, args.questions, executor)
+        plan, plan_calls, planner = run(dataset, 'plan', args.latency, args.questions, executor)
+
+    print(f"react: {react:7.3f}s  LLM calls/question {react_calls}")
+    timings = "  ".join(f"{step} {seconds:.3f}s" for step, seconds in planner.last_timings.items())
+    print(f"plan : {plan:7.3f}s  LLM calls/question {plan_calls}  ({timings})")
+    print(f"speedup: {react / plan:.1f}x")
+
+if __name__ == "__main__":
+    main()
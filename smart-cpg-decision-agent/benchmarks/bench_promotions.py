@@ -0,0 +1,77 @@
+"""
+Benchmark: flag_anomalous_promotions with baselines gathered by series code vs. the original
+merge of every promo row against a freshly computed baseline table.
+
+Reports the best wall time and the peak memory allocated during the call (tracemalloc, which
+numpy and pandas buffers report to) for the legacy merge, the raw-frame path and the
+PreparedDataset path, whose baselines are maintained with the rollups, plus the vectorized options.
+
+    python benchmarks/bench_promotions.py --stores 50 --skus 200 --days 365
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+import pandas as pd
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame, timed
+from src.dataset import PreparedDataset
+from src.tools.anomaly_detection import flag_anomalous_promotions
+
+def legacy_flag_anomalous_promotions(df: pd.DataFrame):
+    """
+    The original implementation: a groupby for the baselines, then a merged copy of all promo rows.
+    """
+    baseline = df[df['promo_flag'] == 0].groupby(['sku_id', 'store_id'])['units_sold'].mean().reset_index()
+    baseline.rename(columns={'units_sold': 'baseline_avg_units'}, inplace=True)
+    promo_days = df[df['promo_flag'] == 1]
+    merged = pd.merge(promo_days, baseline, on=['sku_id', 'store_id'], how='left')
+    failed_promos = merged[merged['units_sold'] < merged['baseline_avg_units']]
+    return failed_promos.sort_values(by='date', kind='stable')
+
+def peak_memory(func, *args, **kwargs):
+    """
+    Peak bytes allocated while `func` runs, above what was allocated before it started.
+    """
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flag_anomalous_promotions.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    df = make_sales_frame(args.stores, args.skus, args.days)
+    dataset = PreparedDataset(df)
+    print(f"Rows: {len(df):,}  Promo rows: {int(df['promo_flag'].sum()):,}  Series (sku x store): {args.stores * args.skus:,}")
+
+    runs = [
+        ("legacy merge", legacy_flag_anomalous_promotions, df, {}),
+        ("gather (raw frame)", flag_anomalous_promotions, df, {}),
+        ("gather (prepared)", flag_anomalous_promotions, dataset, {}),
+        ("prepared + holiday", flag_anomalous_promotions, dataset, {'holiday_adjusted': True}),
+        ("prepared + promo_type", flag_anomalous_promotions, dataset, {'by_promo_type': True, 'lift_ratio': True}),
+    ]
+    results = {}
+    for label, func, data, options in runs:
+        elapsed, result = timed(func, data, repeat=3, **options)
+        peak = peak_memory(func, data, **options)
+        results[label] = (elapsed, result)
+        print(f"{label:<22}: {elapsed:8.3f}s  peak {peak / 2**20:8.1f} MiB  flagged={len(result):,}")
+
+    legacy_time, legacy_result = results["legacy merge"]
+    assert legacy_result['units_sold'].tolist() == results["gather (raw frame)"][1]['units_sold'].tolist(), "gather differs from merge"
+    assert len(legacy_result) == len(results["gather (prepared)"][1]), "prepared path differs from merge"
+    print(f"speedup: raw {legacy_time / results['gather (raw frame)'][0]:.1f}x  prepared {legacy_time / results['gather (prepared)'][0]:.1f}x")
+
+if __name__ == "__main__":
+    main()
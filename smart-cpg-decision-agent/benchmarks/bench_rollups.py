@@ -0,0 +1,44 @@
+"""
+Benchmark: trend/store/seasonality tools answered from the RollupCube vs. rescanning the raw rows.
+
+    python benchmarks/bench_rollups.py --stores 50 --skus 200 --days 365
+"""
+import argparse
+import os
+import sys
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame, timed
+from src.data_loader import compact_frame
+from src.dataset import PreparedDataset
+from src.tools.trend_analysis import calculate_category_trends, compare_stores_performance, analyze_seasonality
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the materialized rollups.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    df = compact_frame(make_sales_frame(args.stores, args.skus, args.days))
+    build_time, dataset = timed(PreparedDataset, df)
+    print(f"Rows: {len(df):,}  (dataset + rollups built in {build_time:.2f}s)")
+
+    calls = {
+        "CategoryTrends('W')": lambda data: calculate_category_trends(data, 'W'),
+        "CategoryTrends('M')": lambda data: calculate_category_trends(data, 'M'),
+        "StorePerformance": lambda data: compare_stores_performance(data, 'revenue'),
+        "SeasonalityAnalysis": lambda data: analyze_seasonality(data, 'Snacks'),
+    }
+    for name, call in calls.items():
+        raw_time, _ = timed(call, df, repeat=3)
+        cube_time, _ = timed(call, dataset, repeat=3)
+        print(f"{name:22s} raw {raw_time * 1000:9.1f} ms   rollup {cube_time * 1000:7.1f} ms   ({raw_time / cube_time:.0f}x)")
+
+    refresh_time, _ = timed(dataset.refresh_rollups)
+    print(f"refresh_rollups: {refresh_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
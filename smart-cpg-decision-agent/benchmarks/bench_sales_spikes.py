@@ -0,0 +1,61 @@
+"""
+Benchmark: vectorized detect_sales_spikes vs. the original per-group Python loop.
+
+The production shape is ~500 stores x 2,000 SKUs x 3 years of daily rows. The defaults
+below keep that shape (many SKU/Store series, daily rows) at a size that fits on a laptop;
+pass e.g. `--stores 500 --skus 2000 --days 1095` on a large host to run it at full scale.
+
+    python benchmarks/bench_sales_spikes.py --stores 50 --skus 200 --days 365
+"""
+import argparse
+import os
+import sys
+import pandas as pd
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame, timed
+from src.tools.anomaly_detection import detect_sales_spikes
+
+def legacy_detect_sales_spikes(df: pd.DataFrame, threshold=2.0):
+    """
+    The original implementation: one Python iteration and one filtered frame per group.
+    """
+    anomalies = []
+    for name, group in df.groupby(['sku_id', 'store_id']):
+        limit = group['units_sold'].mean() + (threshold * group['units_sold'].std())
+        spike_rows = group[group['units_sold'] > limit]
+        if not spike_rows.empty:
+            anomalies.append(spike_rows)
+    if anomalies:
+        return pd.concat(anomalies).sort_values(by='date')
+    return pd.DataFrame()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detect_sales_spikes.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--threshold", type=float, default=2.0)
+    parser.add_argument("--window", type=int, default=28, help="Trailing window (days) for the rolling-baseline run.")
+    parser.add_argument("--skip-legacy", action="store_true", help="Skip the per-group loop (it is slow at large scales).")
+    args = parser.parse_args()
+
+    df = make_sales_frame(args.stores, args.skus, args.days)
+    print(f"Rows: {len(df):,}  Series (sku x store): {args.stores * args.skus:,}")
+
+    vec_time, vec_result = timed(detect_sales_spikes, df, threshold=args.threshold, repeat=3)
+    print(f"vectorized (full history) : {vec_time:8.3f}s  spikes={len(vec_result):,}")
+
+    roll_time, roll_result = timed(detect_sales_spikes, df, threshold=args.threshold, window=args.window)
+    print(f"vectorized ({args.window}D rolling)  : {roll_time:8.3f}s  spikes={len(roll_result):,}")
+
+    if not args.skip_legacy:
+        legacy_time, legacy_result = timed(legacy_detect_sales_spikes, df, threshold=args.threshold)
+        print(f"legacy per-group loop     : {legacy_time:8.3f}s  spikes={len(legacy_result):,}")
+        assert sorted(vec_result.index) == sorted(legacy_result.index), "vectorized result differs from legacy loop"
+        print(f"speedup: {legacy_time / vec_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
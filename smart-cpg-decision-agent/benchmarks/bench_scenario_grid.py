@@ -0,0 +1,51 @@
+"""
+Benchmark: one vectorized simulate_price_grid call vs. the equivalent sequence of simulate_price_change calls.
+
+The default grid is the planner question from the backlog: 50 SKUs x price changes from -20% to +20%
+in 1% steps x elasticities -0.8, -1.5 and -2.5.
+
+    python benchmarks/bench_scenario_grid.py --stores 50 --skus 200 --days 365
+"""
+import argparse
+import os
+import sys
+import numpy as np
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame, timed
+from src.data_loader import compact_frame
+from src.dataset import PreparedDataset
+from src.tools.scenario_simulation import simulate_price_change, simulate_price_grid
+
+def run_sequential(data, sku_ids, price_changes, elasticities):
+    return [
+        simulate_price_change(data, sku_id=sku_id, price_change_pct=pct, elasticity=elasticity)
+        for sku_id in sku_ids for pct in price_changes for elasticity in elasticities
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batch scenario grid.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--grid-skus", type=int, default=50)
+    args = parser.parse_args()
+
+    df = compact_frame(make_sales_frame(args.stores, args.skus, args.days))
+    dataset = PreparedDataset(df)
+
+    sku_ids = list(range(101, 101 + args.grid_skus))
+    price_changes = list(np.round(np.arange(-0.20, 0.201, 0.01), 2))
+    elasticities = [-0.8, -1.5, -2.5]
+    scenarios = len(sku_ids) * len(price_changes) * len(elasticities)
+    print(f"Rows: {len(df):,}  Scenarios: {scenarios:,}")
+
+    for name, data in (("raw frame", df), ("PreparedDataset", dataset)):
+        grid_time, grid = timed(simulate_price_grid, data, sku_ids, price_changes, elasticities, repeat=3)
+        loop_time, _ = timed(run_sequential, data, sku_ids, price_changes, elasticities)
+        print(f"{name:16s} grid {grid_time * 1000:8.1f} ms   sequential {loop_time * 1000:10.1f} ms   ({loop_time / grid_time:.0f}x)")
+
+if __name__ == "__main__":
+    main()
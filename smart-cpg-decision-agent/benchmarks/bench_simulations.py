@@ -0,0 +1,48 @@
+"""
+Benchmark: 1,000 what-if simulations against a scanned DataFrame vs. the PreparedDataset index.
+
+    python benchmarks/bench_simulations.py --stores 50 --skus 200 --days 365 --calls 1000
+"""
+import argparse
+import os
+import sys
+import numpy as np
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame, timed, CATEGORIES
+from src.data_loader import compact_frame
+from src.dataset import PreparedDataset
+from src.tools.scenario_simulation import simulate_price_change, simulate_promotion
+
+def run_simulations(data, sku_ids, categories):
+    for sku_id, category in zip(sku_ids, categories):
+        simulate_price_change(data, sku_id=int(sku_id), price_change_pct=0.1)
+        simulate_promotion(data, category=category, promo_uplift_pct=0.2, promo_cost_per_unit=1.0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indexed scenario simulations.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--calls", type=int, default=1000, help="Number of (price, promotion) simulation pairs.")
+    args = parser.parse_args()
+
+    df = compact_frame(make_sales_frame(args.stores, args.skus, args.days))
+    build_time, dataset = timed(PreparedDataset, df)
+    print(f"Rows: {len(df):,}  (PreparedDataset built in {build_time:.2f}s)")
+
+    rng = np.random.default_rng(0)
+    sku_ids = rng.integers(101, 101 + args.skus, args.calls)
+    categories = rng.choice(CATEGORIES, args.calls)
+
+    indexed_time, _ = timed(run_simulations, dataset, sku_ids, categories)
+    print(f"indexed : {indexed_time:8.3f}s for {args.calls:,} x 2 simulations ({indexed_time / args.calls * 1e6:.0f} us per pair)")
+
+    scan_time, _ = timed(run_simulations, df, sku_ids, categories)
+    print(f"scan    : {scan_time:8.3f}s for {args.calls:,} x 2 simulations ({scan_time / args.calls * 1e3:.1f} ms per pair)")
+    print(f"speedup: {scan_time / indexed_time:.0f}x")
+
+if __name__ == "__main__":
+    main()
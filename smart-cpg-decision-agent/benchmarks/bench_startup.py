@@ -0,0 +1,104 @@
+"""
+Benchmark: cold-start cost of the front ends and the tools.
+
+Every measurement runs in a fresh interpreter. For each entry module it reports the cumulative
+import time from `python -X importtime` (best of `--repeat`) and the slowest modules it pulls
+in, and checks that none of the heavy dependencies in startup.LAZY_MODULES (pyspark, LangChain
+agents, provider SDKs, ...) was imported. It also times `cli.py --help` and, with the local stub
+LLM, how long the CLI's background startup takes to have the data and the agent ready.
+
+Exits with status 1 when an entry module imports a lazy dependency or goes over `--max-import-ms`,
+so it can guard against startup regressions in CI.
+
+    python benchmarks/bench_startup.py --repeat 5 --max-import-ms 1500
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from src.ui.startup import LAZY_MODULES
+
+ENTRY_MODULES = [
+    'src.ui.cli',
+    'src.data_loader',
+    'src.agent.runner',
+    'src.tools.trend_analysis',
+    'src.tools.anomaly_detection',
+    'src.tools.scenario_simulation',
+]
+
+# Builds the CLI's dataset and agent through BackgroundStartup and prints the seconds until ready
+READY_SCRIPT = """
+import argparse, time
+start = time.perf_counter()
+from src.ui import cli
+from src.ui.startup import BackgroundStartup
+args = argparse.Namespace(backend='pandas', database=None, cache_dir=None, token_budget=800, mode='react')
+startup = BackgroundStartup(lambda: cli.load_dataset(args, {data_path!r}), lambda dataset: cli.build_sessions(dataset, args))
+startup.result()
+print(time.perf_counter() - start)
+"""
+
+def python(*args, env=None):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+def import_profile(module):
+    """
+    (cumulative import time of `module` in ms, {imported module: self time in ms}) in a fresh interpreter.
+    """
+    stderr = python('-X', 'importtime', '-c', f'import {module}').stderr
+    self_times = {}
+    total = None
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        self_times[name.strip()] = int(self_us) / 1000
+        if name.strip() == module:
+            total = int(cumulative_us) / 1000
+    return total, self_times
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold-start time of the CLI, the app and the tools.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Slowest imported modules to list per entry module.")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if an entry module takes longer to import.")
+    parser.add_argument("--data_path", type=str, default=os.path.join(ROOT, 'data', 'cpg_sales_data.parquet'))
+    args = parser.parse_args()
+
+    failures = []
+    for module in ENTRY_MODULES:
+        profiles = [import_profile(module) for _ in range(args.repeat)]
+        total, self_times = min(profiles, key=lambda profile: profile[0])
+        heavy = sorted(name for name in self_times if name.split('.')[0] in LAZY_MODULES or name in LAZY_MODULES)
+        print(f"{module:<32}: import {total:8.1f} ms")
+        for name, ms in sorted(self_times.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {ms:7.1f} ms  {name}")
+
+        if heavy:
+            failures.append(f"{module} imports lazy dependencies: {', '.join(heavy[:5])}")
+        if args.max_import_ms is not None and total > args.max_import_ms:
+            failures.append(f"{module} takes {total:.0f} ms to import (budget {args.max_import_ms:.0f} ms)")
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        python('src/ui/cli.py', '--help')
+        best = min(best, time.perf_counter() - start)
+    print(f"\ncli.py --help (process wall time): {best:.3f}s")
+
+    env = dict(os.environ, LLM_BACKEND='stub')
+    ready = float(python('-W', 'ignore', '-c', READY_SCRIPT.format(data_path=args.data_path), env=env).stdout.strip().splitlines()[-1])
+    print(f"CLI data and agent ready (stub LLM): {ready:.3f}s")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
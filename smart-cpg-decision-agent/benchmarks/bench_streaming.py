@@ -0,0 +1,92 @@
+"""
+Benchmark: peak memory of the streaming anomaly detectors as the input grows.
+
+Writes synthetic histories of increasing length to parquet (one row group per `--chunk-days`
+days), then runs detect_sales_spikes_streaming and detect_stock_shortages_streaming on each in a
+fresh process and reports that process's peak RSS. Peak RSS should stay flat while the input,
+and the memory a full in-memory load would need, grows past `--memory-limit-mb`.
+
+    python benchmarks/bench_streaming.py --stores 100 --skus 200 --scales 1 2 4 8 --memory-limit-mb 1024
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import make_sales_frame
+
+def write_history(path, n_stores, n_skus, n_days, chunk_days):
+    """
+    Writes `n_days` of history chunk by chunk, so generating it needs no more memory than streaming it.
+    Returns the in-memory size (bytes) the whole history would take as one pandas frame.
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    frame_bytes = 0
+    for i, first_day in enumerate(range(0, n_days, chunk_days)):
+        start = pd.Timestamp('2022-01-01') + pd.Timedelta(days=first_day)
+        chunk = make_sales_frame(n_stores, n_skus, min(chunk_days, n_days - first_day), seed=i, start=start)
+        frame_bytes += chunk.memory_usage(deep=True).sum()
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        writer = writer or pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+    writer.close()
+    return frame_bytes
+
+def run_streaming(path, batch_rows, queue):
+    """
+    Child process: runs both streaming detectors and reports the wall time and peak RSS.
+    """
+    from src.tools.anomaly_detection import detect_sales_spikes_streaming, detect_stock_shortages_streaming
+
+    start = time.perf_counter()
+    spikes = detect_sales_spikes_streaming(path, path + '.spikes.parquet', batch_rows=batch_rows)
+    shortages = detect_stock_shortages_streaming(path, path + '.shortages.parquet', batch_rows=batch_rows)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is in KiB on Linux
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, spikes['anomalies'], shortages['anomalies']))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming anomaly detection memory.")
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=100)
+    parser.add_argument("--days", type=int, default=90, help="Days of history at scale 1.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-days", type=int, default=30)
+    parser.add_argument("--batch-rows", type=int, default=500_000)
+    parser.add_argument("--memory-limit-mb", type=float, default=512, help="Memory budget to compare against.")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'scale':>5} {'rows':>13} {'file MB':>9} {'in-memory MB':>13} {'peak RSS MB':>12} {'time s':>8} {'spikes':>9} {'shortages':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            path = os.path.join(tmp, f"sales_x{scale}.parquet")
+            n_days = args.days * scale
+            frame_bytes = write_history(path, args.stores, args.skus, n_days, args.chunk_days)
+
+            queue = context.Queue()
+            child = context.Process(target=run_streaming, args=(path, args.batch_rows, queue))
+            child.start()
+            elapsed, peak_rss, n_spikes, n_shortages = queue.get()
+            child.join()
+
+            rows = args.stores * args.skus * n_days
+            print(f"{scale:>5} {rows:>13,} {os.path.getsize(path) / 1e6:>9.1f} {frame_bytes / 1e6:>13.1f} "
+                  f"{peak_rss / 1e6:>12.1f} {elapsed:>8.2f} {n_spikes:>9,} {n_shortages:>10,}")
+            if frame_bytes > args.memory_limit_mb * 1e6 > peak_rss:
+                print(f"      input is {frame_bytes / (args.memory_limit_mb * 1e6):.1f}x the {args.memory_limit_mb:.0f} MB limit; streaming stayed under it")
+            os.remove(path)
+
+if __name__ == "__main__":
+    main()
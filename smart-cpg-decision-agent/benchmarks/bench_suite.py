@@ -0,0 +1,202 @@
+"""
+Benchmark suite: every tool and every DataLoader path at several data scales, checked against a
+stored baseline so that performance regressions fail the run.
+
+For each scale the synthetic data (src.synthetic) is written once as a partitioned parquet
+directory and as a single file. Every case is then timed (best of `--repeat`) and, unless
+`--no-memory`, run once more under tracemalloc for its peak Python/NumPy allocation (memory held
+by Arrow or DuckDB is not seen). The number of result rows is recorded too: the data is
+deterministic, so a changed count means a changed result.
+
+Each case is compared with `--baseline` (benchmarks/baseline.json). A case fails if it is over the
+baseline by more than `--tolerance` (relative) and by more than a small absolute margin, in time or
+in peak memory, or if its result rows differ. The run exits with status 1 if any case fails.
+Baselines depend on the machine: record them where the suite runs with `--save-baseline`.
+
+    python benchmarks/bench_suite.py --scales small medium
+    python benchmarks/bench_suite.py --scales small --save-baseline
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+
+# Ensure src modules can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.common import timed
+from src.synthetic import write_sales_dataset
+from src.data_loader import DataLoader, YEAR_MONTH, _data_files
+from src.dataset import PreparedDataset
+from src.tools.trend_analysis import calculate_category_trends, compare_stores_performance, analyze_seasonality
+from src.tools.anomaly_detection import detect_sales_spikes, detect_stock_shortages, flag_anomalous_promotions
+from src.tools.anomaly_detection import detect_sales_spikes_streaming, detect_stock_shortages_streaming
+from src.tools.scenario_simulation import simulate_price_change, simulate_promotion, simulate_price_grid, simulate_promotion_grid
+from src.tools.scenario_simulation import simulate_price_change_mc, simulate_promotion_mc
+from src.tools.forecasting import forecast_demand, project_stock_outs
+
+# (stores, SKUs, days)
+SCALES = {
+    'small': (20, 50, 365),
+    'medium': (50, 200, 365),
+    'large': (200, 500, 365),
+}
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Differences below these are noise, whatever the relative change
+MIN_SECONDS = 0.05
+MIN_PEAK_MIB = 5.0
+
+# (name, function of the context): loading paths, then the tools on the PreparedDataset
+LOADER_CASES = [
+    ("load file", lambda ctx: DataLoader(use_spark=False).load_data(ctx['file'])),
+    ("load file compact", lambda ctx: DataLoader(use_spark=False).load_data(ctx['file'], compact=True)),
+    ("load partitioned compact", lambda ctx: DataLoader(use_spark=False).load_data(ctx['directory'], compact=True)),
+    ("load partitioned pushdown", lambda ctx: DataLoader(use_spark=False).load_data(
+        ctx['directory'], columns=['date', 'sku_id', 'units_sold'], filters={'category': 'Snacks', 'start_date': ctx['last_month']})),
+    ("load_new since watermark", lambda ctx: DataLoader(use_spark=False).load_new(ctx['directory'], ctx['watermark'], compact=True)[0]),
+    ("iter_batches", lambda ctx: sum(len(batch) for batch in DataLoader(use_spark=False).iter_batches(ctx['directory']))),
+    ("duckdb load partitioned", lambda ctx: DataLoader(backend='duckdb').load_data(ctx['directory'], compact=True)),
+    ("prepare dataset", lambda ctx: PreparedDataset(ctx['frame'])),
+]
+
+TOOL_CASES = [
+    ("category trends (W)", lambda ctx: calculate_category_trends(ctx['dataset'], time_period='W')),
+    ("category trends (M)", lambda ctx: calculate_category_trends(ctx['dataset'], time_period='M')),
+    ("store performance", lambda ctx: compare_stores_performance(ctx['dataset'])),
+    ("seasonality", lambda ctx: analyze_seasonality(ctx['dataset'], category='Snacks')),
+    ("sales spikes", lambda ctx: detect_sales_spikes(ctx['dataset'], threshold=2.0)),
+    ("sales spikes (28D)", lambda ctx: detect_sales_spikes(ctx['dataset'], threshold=2.0, window=28)),
+    ("stock shortages", lambda ctx: detect_stock_shortages(ctx['dataset'], critical_level=20)),
+    ("failed promotions", lambda ctx: flag_anomalous_promotions(ctx['dataset'])),
+    ("failed promotions (all options)", lambda ctx: flag_anomalous_promotions(
+        ctx['dataset'], by_promo_type=True, holiday_adjusted=True, lift_ratio=True)),
+    ("sales spikes streaming", lambda ctx: detect_sales_spikes_streaming(ctx['file'], ctx['output'], threshold=2.0)),
+    ("stock shortages streaming", lambda ctx: detect_stock_shortages_streaming(ctx['file'], ctx['output'], critical_level=20)),
+    ("price change", lambda ctx: simulate_price_change(ctx['dataset'], 101, 0.1)),
+    ("promotion", lambda ctx: simulate_promotion(ctx['dataset'], 'Snacks', 0.2, 1.5)),
+    ("price grid", lambda ctx: simulate_price_grid(ctx['dataset'], list(range(101, 121)), [-0.1, 0.0, 0.1], [-1.5, -1.0])),
+    ("promotion grid", lambda ctx: simulate_promotion_grid(ctx['dataset'], ['Snacks', 'Dairy'], [0.1, 0.2], [1.0, 1.5])),
+    ("price change MC", lambda ctx: simulate_price_change_mc(ctx['dataset'], [101, 102, 103], 0.1, use_estimated=True, seed=0)),
+    ("promotion MC", lambda ctx: simulate_promotion_mc(ctx['dataset'], ['Snacks'], 0.2, 0.05, 1.5, seed=0)),
+    ("forecast seasonal naive", lambda ctx: forecast_demand(uncached(ctx['dataset']), 14, 'seasonal_naive')),
+    ("forecast exp smoothing", lambda ctx: forecast_demand(uncached(ctx['dataset']), 14, 'exp_smoothing')),
+    ("forecast ridge", lambda ctx: forecast_demand(uncached(ctx['dataset']), 14, 'ridge')),
+    ("projected stock-outs (cached)", lambda ctx: project_stock_outs(ctx['dataset'], 14)),
+]
+
+def uncached(dataset):
+    """
+    `dataset` with its cached sales panel and forecasts dropped, so a forecast case times the full fit.
+    """
+    dataset.derived.clear()
+    return dataset
+
+def result_rows(result):
+    """
+    The size of a case's result: rows of a frame, a count, or the anomalies a streaming detector wrote.
+    """
+    if isinstance(result, dict):
+        return result.get('anomalies')
+    if isinstance(result, int):
+        return result
+    return len(result) if hasattr(result, '__len__') else None
+
+def measure(case, ctx, repeat, memory):
+    seconds, result = timed(case, ctx, repeat=repeat)
+    entry = {"seconds": round(seconds, 4), "rows": result_rows(result)}
+    del result
+    if memory:
+        tracemalloc.start()
+        case(ctx)
+        entry["peak_mib"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return entry
+
+def compare(entry, baseline, tolerance):
+    """
+    The reasons `entry` regressed from `baseline`, if any.
+    """
+    problems = []
+    if baseline is None:
+        return problems
+    if entry['seconds'] > baseline['seconds'] * (1 + tolerance) and entry['seconds'] - baseline['seconds'] > MIN_SECONDS:
+        problems.append(f"time {entry['seconds']:.3f}s vs {baseline['seconds']:.3f}s")
+    if 'peak_mib' in entry and 'peak_mib' in baseline and \
+            entry['peak_mib'] > baseline['peak_mib'] * (1 + tolerance) and entry['peak_mib'] - baseline['peak_mib'] > MIN_PEAK_MIB:
+        problems.append(f"peak {entry['peak_mib']:.1f} MiB vs {baseline['peak_mib']:.1f} MiB")
+    if baseline.get('rows') is not None and entry['rows'] != baseline['rows']:
+        problems.append(f"result rows {entry['rows']} vs {baseline['rows']}")
+    return problems
+
+def run_scale(scale, tmp, args, baseline):
+    n_stores, n_skus, n_days = SCALES[scale]
+    results, failures = {}, []
+    directory, file = os.path.join(tmp, scale), os.path.join(tmp, f"{scale}.parquet")
+
+    start = time.perf_counter()
+    rows = write_sales_dataset(directory, n_stores, n_skus, n_days)
+    results["generate partitioned"] = {"seconds": round(time.perf_counter() - start, 4), "rows": rows}
+    write_sales_dataset(file, n_stores, n_skus, n_days, partition_cols=())
+    print(f"\n{scale}: {rows:,} rows ({n_stores} stores x {n_skus} SKUs x {n_days} days)")
+    print(f"  {'generate partitioned':<32}: {results['generate partitioned']['seconds']:8.3f}s")
+
+    # A watermark that has ingested all but the last month, so load_new reads one month of partitions
+    frame = DataLoader(use_spark=False).load_data(file, compact=True)
+    last_month = pd.Timestamp(frame['date'].max()).replace(day=1)
+    watermark = {
+        'files': [path for path in _data_files(directory) if f"{YEAR_MONTH}={last_month:%Y-%m}" not in path],
+        'max_date': f"{last_month - pd.Timedelta(days=1):%Y-%m-%d}",
+    }
+    ctx = {
+        'file': file, 'directory': directory, 'frame': frame, 'dataset': PreparedDataset(frame),
+        'last_month': last_month, 'watermark': watermark, 'output': os.path.join(tmp, f"{scale}_output.parquet"),
+    }
+
+    for name, case in LOADER_CASES + TOOL_CASES:
+        entry = measure(case, ctx, args.repeat, not args.no_memory)
+        problems = compare(entry, baseline.get(scale, {}).get(name), args.tolerance)
+        results[name] = entry
+        peak = f"  peak {entry['peak_mib']:8.1f} MiB" if 'peak_mib' in entry else ""
+        rows = f"  rows {entry['rows']:,}" if entry['rows'] is not None else ""
+        print(f"  {name:<32}: {entry['seconds']:8.3f}s{peak}{rows}{'  REGRESSION: ' + '; '.join(problems) if problems else ''}")
+        failures.extend(f"{scale} / {name}: {problem}" for problem in problems)
+    return results, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every tool and DataLoader path against a stored baseline.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=['small'])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown or memory growth.")
+    parser.add_argument("--baseline", type=str, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the baseline of its scales.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run of every case.")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            results, scale_failures = run_scale(scale, tmp, args, {} if args.save_baseline else baseline)
+            failures.extend(scale_failures)
+            baseline[scale] = results
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
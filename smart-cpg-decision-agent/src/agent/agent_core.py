@@ -1,54 +1,108 @@
-from langchain.agents.agent_types import AgentType
-from langchain.tools import Tool
-from langchain.agents.initialize import initialize_agent
+from langchain_core.tools import Tool
 from typing import List
+import asyncio
+import contextvars
+import json
+import numpy as np
 import pandas as pd
 
 # Import tools
 from src.tools.trend_analysis import calculate_category_trends, compare_stores_performance, analyze_seasonality
 from src.tools.anomaly_detection import detect_sales_spikes, detect_stock_shortages, flag_anomalous_promotions
-from src.tools.scenario_simulation import simulate_price_change, simulate_promotion
+from src.tools.scenario_simulation import simulate_price_change, simulate_promotion, simulate_price_grid, simulate_promotion_grid
+from src.tools.scenario_simulation import simulate_price_change_mc, simulate_promotion_mc
+from src.tools.forecasting import forecast_demand, project_stock_outs
+from src.dataset import dataset_fingerprint
 from src.genai.llm_interface import get_llm
 from src.agent.memory import get_memory
+from src.agent.tool_cache import ToolResultCache
+from src.agent.result_store import ResultStore
+from src.agent.planner import PlannerAgent
+from src.telemetry import telemetry, trace_llm, trace_scan, trace_tool
 
-def create_cpg_agent(df: pd.DataFrame):
+# Agent loops create_cpg_agent can build: the ReAct loop, or a planner/executor (see PlannerAgent)
+AGENT_MODES = ('react', 'plan')
+
+# Which rows a truncated tool result shows first: (column, ascending)
+TOP_ROWS = {
+    'SalesSpikes': ('units_sold', False),
+    'StockShortages': ('inventory_level', True),
+    'FailedPromotions': ('units_sold', True),
+    'StorePerformance': ('total_revenue', False),
+    'DemandForecast': ('forecast_units', False),
+    'ProjectedStockouts': ('days_until_stockout', True),
+}
+
+# Most scenarios one ScenarioGrid call may simulate (the product of its axes); its input comes from the LLM
+MAX_GRID_CELLS = 10_000
+
+SYSTEM_MESSAGE = """You are an expert Decision Support Agent for a Consumer Packaged Goods (CPG) company.
+Your goal is to help business heads understand sales data, detect anomalies, and simulate business scenarios to generate actionable strategy memos.
+Use the tools provided to answer the user's questions based on the synthetic data. Always summarize your findings clearly and concisely.
+If simulating a scenario, provide a brief interpretation of the financial impact."""
+
+def create_cpg_agent(df: pd.DataFrame, tool_cache=None, result_store=None, llm=None, executor=None, verbose=True, mode='react'):
     """
     Creates the LangChain Agent loop by binding the tools and the LLM.
+    `df` is shared read-only by every tool; pass a PreparedDataset so calendar keys are derived once.
+
+    Tool results are memoized in `tool_cache` (a fresh in-memory ToolResultCache by default).
+    Pass a shared or persistent cache to reuse results across agents and restarts.
+
+    Tools hand the agent a token-budgeted summary of their result; the full result is kept in
+    `result_store` (a fresh ResultStore by default) and paged through with the ResultPage tool.
+
+    `llm` defaults to get_llm(). With `executor` (e.g. a ThreadPoolExecutor shared by all sessions),
+    tool calls made through the async path (`agent.arun`) run on that pool and leave the event loop free.
+
+    Each call of a tool or the LLM is recorded in the turn opened by run_agent/arun_agent (see src.telemetry).
+
+    `mode='plan'` returns a PlannerAgent instead of the ReAct agent: one LLM call plans all the tool
+    calls a question needs, they run concurrently (on `executor` if given), and one LLM call writes
+    the answer. It is much faster for composite questions whose tool calls are independent.
     """
-    llm = get_llm()
+    if mode not in AGENT_MODES:
+        raise ValueError(f"Unknown agent mode '{mode}'. Choose one of {', '.join(AGENT_MODES)}.")
+
+    llm = trace_llm(llm if llm is not None else get_llm())
     memory = get_memory()
 
     # Wrap the python functions as LangChain Tools
     tools = [
         Tool(
             name="CategoryTrends",
-            func=lambda period: calculate_category_trends(df, time_period=period).to_string(),
+            func=lambda period: calculate_category_trends(df, time_period=period),
             description="Use this to get sales and revenue trends over a period (e.g., 'W' for weekly, 'M' for monthly). Input the period string."
         ),
         Tool(
             name="StorePerformance",
-            func=lambda metric: compare_stores_performance(df, metric=metric).to_string(),
+            func=lambda metric: compare_stores_performance(df, metric=metric),
             description="Use this to compare overall performance of all stores. Input the metric ('revenue' or 'units_sold')."
         ),
         Tool(
             name="SeasonalityAnalysis",
-            func=lambda category: analyze_seasonality(df, category=category if category != 'all' else None).to_string(),
+            func=lambda category: analyze_seasonality(df, category=category if category != 'all' else None),
             description="Use this to identify best selling months for a category. Input the category name or 'all'."
         ),
         Tool(
             name="SalesSpikes",
-            func=lambda threshold: detect_sales_spikes(df, threshold=float(threshold)).to_string(),
+            func=lambda threshold: detect_sales_spikes(df, threshold=float(threshold)),
             description="Use this to find abnormal sales spikes. Input the threshold multiplier (e.g., 2.0)."
         ),
         Tool(
             name="StockShortages",
-            func=lambda level: detect_stock_shortages(df, critical_level=int(level)).to_string(),
+            func=lambda level: detect_stock_shortages(df, critical_level=int(level)),
             description="Use this to find stores with stock below a critical level. Input the inventory level (e.g., 50)."
         ),
         Tool(
             name="FailedPromotions",
-            func=lambda _: flag_anomalous_promotions(df).to_string(),
-            description="Use this to find promotions that performed worse than average non-promo days. Input is ignored."
+            func=lambda options: flag_anomalous_promotions(
+                df,
+                holiday_adjusted='holiday' in options.split(','),
+                by_promo_type='promo_type' in options.split(','),
+                lift_ratio=True
+            ),
+            description="Use this to find promotions that performed worse than average non-promo days. Optional input: 'holiday' to compare holiday promotions with non-promo holidays, 'promo_type' to also expect the typical lift of each promotion type, or both comma-separated; otherwise leave it empty."
         ),
         Tool(
             name="SimulatePriceChange",
@@ -69,30 +123,153 @@ def create_cpg_agent(df: pd.DataFrame):
                 promo_cost_per_unit=float(args.split(",")[2])
             ),
             description="Simulate a promotion for a category. Input a comma-separated string: 'category,promo_uplift_pct,promo_cost_per_unit' (e.g., 'Beverages,0.2,1.5' for a 20% uplift with $1.5 cost)."
+        ),
+        Tool(
+            name="PriceChangeUncertainty",
+            func=lambda args: simulate_price_change_mc(
+                df,
+                sku_ids=[int(args.split(",")[0])],
+                price_change_pct=float(args.split(",")[1]),
+                use_estimated=True,
+                seed=0
+            ),
+            description="Simulate a price change for a SKU with uncertainty bands: the elasticity is estimated from the SKU's price history and sampled 10,000 times. Returns 5th/50th/95th percentiles of units, revenue and revenue impact. Input 'sku_id,price_change_pct' (e.g., '101,0.1')."
+        ),
+        Tool(
+            name="PromotionUncertainty",
+            func=lambda args: simulate_promotion_mc(
+                df,
+                categories=[args.split(",")[0]],
+                promo_uplift_mean=float(args.split(",")[1]),
+                promo_uplift_sd=float(args.split(",")[2]),
+                promo_cost_per_unit=float(args.split(",")[3]),
+                seed=0
+            ),
+            description="Simulate a category promotion with an uncertain uplift. Returns 5th/50th/95th percentiles of units, net revenue and net impact. Input 'category,uplift_mean,uplift_sd,promo_cost_per_unit' (e.g., 'Snacks,0.2,0.05,1.5')."
+        ),
+        Tool(
+            name="DemandForecast",
+            func=lambda args: forecast_demand(
+                df,
+                horizon=int(args.split(",")[0]),
+                sku_ids=[int(args.split(",")[1])] if len(args.split(",")) > 1 else None
+            ),
+            description="Use this to forecast daily units sold per SKU and store for the coming days (ridge regression on weekday, season, promotions, holidays and price; no promotions assumed ahead). Input the horizon in days, optionally with a SKU: 'horizon' or 'horizon,sku_id' (e.g., '14' or '14,101')."
+        ),
+        Tool(
+            name="ProjectedStockouts",
+            func=lambda horizon: project_stock_outs(df, horizon=int(horizon)),
+            description="Use this to find the SKU/store pairs whose current inventory will run out within the coming days at the forecast demand, assuming no replenishment. Input the horizon in days (e.g., '14')."
+        ),
+        # Braces are doubled: the descriptions end up in a prompt template
+        Tool(
+            name="ScenarioGrid",
+            func=lambda args: run_scenario_grid(df, args),
+            description="Simulate many scenarios in one call instead of repeating SimulatePriceChange or SimulatePromotion. "
+                        "Input a JSON object. For prices: {{\"sku_ids\": [101, 102], \"price_changes\": [-0.1, 0.1], \"elasticities\": [-0.8, -1.5]}}. "
+                        "For promotions: {{\"categories\": [\"Snacks\"], \"uplifts\": [0.1, 0.2], \"costs\": [1.0, 1.5]}}. "
+                        "Any list may be a range instead, e.g. {{\"start\": -0.2, \"stop\": 0.2, \"step\": 0.05}}."
         )
     ]
 
-    system_message = """You are an expert Decision Support Agent for a Consumer Packaged Goods (CPG) company.
-Your goal is to help business heads understand sales data, detect anomalies, and simulate business scenarios to generate actionable strategy memos.
-Use the tools provided to answer the user's questions based on the synthetic data. Always summarize your findings clearly and concisely.
-If simulating a scenario, provide a brief interpretation of the financial impact."""
+    # Memoize every tool on (dataset fingerprint, tool name, normalized input)
+    tool_cache = tool_cache if tool_cache is not None else ToolResultCache()
+    tool_cache.bind(dataset_fingerprint(df))
+    # ... and summarize the (possibly cached) result under the token budget.
+    # Every call is timed as a span of the current turn (see src.telemetry); the inner trace records the rows it computed from
+    result_store = result_store if result_store is not None else ResultStore()
+    for tool in tools:
+        computed = trace_scan(tool.func, df)
+        tool.func = trace_tool(tool.name, result_store.wrap(tool.name, tool_cache.wrap(tool.name, computed), *TOP_ROWS.get(tool.name, ())))
+
+    tools.append(Tool(
+        name="ResultPage",
+        func=trace_tool("ResultPage", result_store.page_tool_input, cached=False),
+        description="Use this to read more of a large tool result that was truncated. Input 'handle,page' using the handle from the truncation notice (e.g., 'R3,2' for page 2 of result R3)."
+    ))
+
+    if executor is not None:
+        for tool in tools:
+            tool.coroutine = _on_executor(executor, tool.func)
+
+    if mode == 'plan':
+        return PlannerAgent(tools, llm, memory, SYSTEM_MESSAGE, executor=executor, verbose=verbose)
+
+    # The agent classes are the heaviest LangChain import, so they load with the first agent
+    from langchain.agents.agent_types import AgentType
+    from langchain.agents.initialize import initialize_agent
 
     # Initialize the agent
     agent = initialize_agent(
         tools=tools,
         llm=llm,
         agent=AgentType.CHAT_CONVERSATIONAL_REACT_DESCRIPTION,
-        verbose=True,
+        verbose=verbose,
         memory=memory,
         agent_kwargs={
-            "system_message": system_message
+            "system_message": SYSTEM_MESSAGE
         }
     )
 
     return agent
 
-def run_agent(agent, query: str):
+def run_scenario_grid(df, args: str):
+    """
+    Parses the ScenarioGrid tool input and runs the matching batch simulation.
+    """
+    spec = json.loads(args)
+
+    if 'sku_ids' in spec:
+        axes = [_grid_values(spec['sku_ids']), _grid_values(spec.get('price_changes', [0.0])), _grid_values(spec.get('elasticities', [-1.5]))]
+        _check_grid_size(axes)
+        return simulate_price_grid(df, sku_ids=[int(sku_id) for sku_id in axes[0]], price_changes=axes[1], elasticities=axes[2])
+    if 'categories' in spec:
+        axes = [_grid_values(spec['categories']), _grid_values(spec.get('uplifts', [0.0])), _grid_values(spec.get('costs', [0.0]))]
+        _check_grid_size(axes)
+        return simulate_promotion_grid(df, categories=axes[0], promo_uplifts=axes[1], promo_costs_per_unit=axes[2])
+    raise ValueError("ScenarioGrid input needs either 'sku_ids' or 'categories'.")
+
+def _grid_values(value):
+    """
+    A list of grid values from a scalar, a list, or an inclusive {"start", "stop", "step"} range.
+    A range needs a positive step, stop >= start, and at most MAX_GRID_CELLS values.
+    """
+    if isinstance(value, dict):
+        start, stop, step = (float(value[key]) for key in ('start', 'stop', 'step'))
+        if not step > 0 or not stop >= start:
+            raise ValueError(f"ScenarioGrid range {value} needs step > 0 and stop >= start.")
+        steps = (stop - start) / step
+        if not steps + 1 <= MAX_GRID_CELLS:
+            raise ValueError(f"ScenarioGrid range {value} has {steps + 1:,.0f} values; at most {MAX_GRID_CELLS:,} scenarios fit in one call. Use a larger step.")
+        steps = int(round(steps))
+        return list(np.round(start + step * np.arange(steps + 1), 10))
+    return value if isinstance(value, list) else [value]
+
+def _check_grid_size(axes):
+    cells = int(np.prod([len(axis) for axis in axes]))
+    if cells > MAX_GRID_CELLS:
+        raise ValueError(f"ScenarioGrid input asks for {cells:,} scenarios; at most {MAX_GRID_CELLS:,} fit in one call. Use fewer values or a larger step.")
+
+def _on_executor(executor, func):
+    """
+    An async version of the tool function `func` that runs it on `executor`.
+    """
+    async def run(tool_input):
+        # In a copy of the caller's context, so the call is traced in the caller's turn
+        return await asyncio.get_running_loop().run_in_executor(executor, contextvars.copy_context().run, func, tool_input)
+
+    return run
+
+def run_agent(agent, query: str, session_id=None):
+    """
+    Runs a query through the initialized agent, recording the turn in `telemetry`.
+    """
+    with telemetry.turn(query, session_id):
+        return agent.run(query)
+
+async def arun_agent(agent, query: str, session_id=None):
     """
-    Runs a query through the initialized agent.
+    Runs a query through the initialized agent without blocking the event loop, recording the turn in `telemetry`.
     """
-    return agent.run(query)
+    with telemetry.turn(query, session_id):
+        return await agent.arun(query)
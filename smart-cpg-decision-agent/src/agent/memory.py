@@ -1,11 +1,120 @@
-from langchain.memory import ConversationBufferMemory
+import re
+from typing import Any, Dict, List
+from pydantic import Field
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+from src.agent.result_store import estimate_tokens
 
-def get_memory(memory_key="chat_history"):
+# Result handles quoted in a message, e.g. "result handle: R3"
+HANDLE_PATTERN = re.compile(r"handle: (R\d+)")
+
+class BoundedSummaryMemory(BaseChatMemory):
+    """
+    Conversation memory with a token budget, so the history sent with every LLM call stays flat
+    instead of growing with the conversation.
+
+    The last `window_turns` turns are kept verbatim, as long as they fit in `max_tokens`. Older
+    turns are folded into a running summary (one short line per turn, oldest lines dropped once
+    the summary reaches `summary_max_tokens`); the summary is extractive, so it costs no extra
+    LLM calls. A message over `max_message_tokens` (e.g. an answer quoting a large table) is
+    stored as its opening lines and a reference to the result handles it quotes.
+
+    `history_tokens` records the size of the history returned for each turn.
+    """
+    memory_key: str = "chat_history"
+    max_tokens: int = 1500
+    window_turns: int = 4
+    max_message_tokens: int = 300
+    summary_max_tokens: int = 300
+    summary: List[str] = Field(default_factory=list)
+    summarized_turns: int = 0
+    history_tokens: List[int] = Field(default_factory=list)
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        messages = list(self.chat_memory.messages)
+        if self.summary:
+            omitted = self.summarized_turns - len(self.summary)
+            header = f"Summary of the earlier conversation ({omitted} older turns omitted):" if omitted else "Summary of the earlier conversation:"
+            messages.insert(0, SystemMessage(content="\n".join([header, *self.summary])))
+
+        self.history_tokens.append(sum(estimate_tokens(str(message.content)) for message in messages))
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {self.memory_key: get_buffer_string(messages)}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        self.chat_memory.add_messages([
+            HumanMessage(content=self._compact(input_str)),
+            AIMessage(content=self._compact(output_str)),
+        ])
+        self._fold_old_turns()
+
+    async def asave_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        # The history is in memory, so there is nothing to await
+        self.save_context(inputs, outputs)
+
+    def clear(self) -> None:
+        super().clear()
+        self.summary = []
+        self.summarized_turns = 0
+
+    def metrics(self):
+        """
+        History size per turn in estimated tokens, e.g. for a UI panel or a regression test.
+        """
+        tokens = self.history_tokens
+        return {
+            "turns": len(tokens),
+            "last_history_tokens": tokens[-1] if tokens else 0,
+            "max_history_tokens": max(tokens, default=0),
+            "mean_history_tokens": sum(tokens) / len(tokens) if tokens else 0.0,
+            "summarized_turns": self.summarized_turns,
+        }
+
+    def _compact(self, text: str) -> str:
+        if estimate_tokens(text) <= self.max_message_tokens:
+            return text
+
+        kept = text[:self.max_message_tokens * 2].rsplit("\n", 1)[0]
+        handles = sorted(set(HANDLE_PATTERN.findall(text)))
+        reference = f"; full result: {', '.join(handles)}" if handles else ""
+        return f"{kept}\n[{estimate_tokens(text) - estimate_tokens(kept)} more tokens omitted{reference}]"
+
+    def _fold_old_turns(self):
+        messages = list(self.chat_memory.messages)
+        while len(messages) > 2 and (
+            len(messages) > 2 * self.window_turns
+            or sum(estimate_tokens(str(message.content)) for message in messages) > self.max_tokens
+        ):
+            question, answer = messages[:2]
+            messages = messages[2:]
+            self.summary.append(f"- User: {_first_line(question.content, 100)} -> Agent: {_first_line(answer.content, 160)}")
+            self.summarized_turns += 1
+
+        while len(self.summary) > 1 and estimate_tokens("\n".join(self.summary)) > self.summary_max_tokens:
+            self.summary.pop(0)
+
+        if len(messages) < len(self.chat_memory.messages):
+            self.chat_memory.clear()
+            self.chat_memory.add_messages(messages)
+
+def _first_line(text, max_chars):
+    line = str(text).strip().split("\n", 1)[0]
+    return line if len(line) <= max_chars else line[:max_chars - 3] + "..."
+
+def get_memory(memory_key="chat_history", max_tokens=1500, window_turns=4):
     """
-    Returns a standard ConversationBufferMemory for the agent loop.
-    This maintains the context of the conversation.
+    Returns the agent's conversation memory: a BoundedSummaryMemory that keeps the last
+    `window_turns` turns within `max_tokens` and summarizes the rest.
     """
-    return ConversationBufferMemory(
+    return BoundedSummaryMemory(
         memory_key=memory_key,
-        return_messages=True
+        return_messages=True,
+        max_tokens=max_tokens,
+        window_turns=window_turns
     )
@@ -0,0 +1,154 @@
+import asyncio
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import HumanMessage, SystemMessage
+
+PLANNER_INSTRUCTIONS = """
+To answer the user, first decide which tool calls you need. The calls run at the same time, so
+none of them can use another's result. Respond with only a JSON list of tool calls, each an
+object with the tool name and its input, e.g.
+[{{"tool": "SalesSpikes", "input": "2.0"}}, {{"tool": "StockShortages", "input": "50"}}]
+Respond with [] if the question needs no tool.
+
+TOOLS
+------
+{tools}"""
+
+SYNTHESIS_INSTRUCTIONS = "Answer the question above from these tool results. Summarize your findings clearly and concisely."
+
+class PlannerAgent:
+    """
+    Answers a question with one planning LLM call, the planned tool calls run concurrently, and
+    one synthesis LLM call, instead of the ReAct loop's LLM round trip before every tool call.
+    Suited to composite questions ("a full health check for Snacks") whose tool calls are
+    independent of each other.
+
+    The planner sees the tool descriptions and replies with a JSON list of calls (see
+    parse_plan); they run on `executor` (e.g. the ThreadPoolExecutor AgentSessions shares
+    between sessions; a temporary pool otherwise) over the shared read-only dataset. A call that
+    raises is reported to the synthesis step as an error instead of failing the whole turn.
+
+    It has the `run`/`arun` interface, `tools` and `memory` of a LangChain agent, so AgentSessions
+    and the front ends use either kind. `last_plan` and `last_timings` (seconds spent planning,
+    running the tools and synthesizing) describe the latest turn.
+    """
+    def __init__(self, tools, llm, memory, system_message: str, executor=None, max_calls=8, verbose=False):
+        self.tools = list(tools)
+        self._tools_by_name = {tool.name: tool for tool in tools}
+        self.llm = llm
+        self.memory = memory
+        self.system_message = system_message
+        self.executor = executor
+        self.max_calls = max_calls
+        self.verbose = verbose
+        self.last_plan = []
+        self.last_timings = {}
+
+        # Plain strings, not a prompt template: undo the brace escaping of the tool descriptions
+        tool_list = "\n".join(
+            f"> {tool.name}: {tool.description.replace('{{', '{').replace('}}', '}')}" for tool in tools
+        )
+        self._planner_message = system_message + PLANNER_INSTRUCTIONS.format(tools=tool_list)
+
+    def run(self, query: str) -> str:
+        history = self._history()
+        start = time.perf_counter()
+        plan = self._parse(self.llm.invoke(self._plan_messages(query, history)).content)
+        planned = time.perf_counter()
+
+        if self.executor is not None:
+            results = self._run_on(self.executor, plan)
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, len(plan)), thread_name_prefix="cpg-plan") as executor:
+                results = self._run_on(executor, plan)
+        executed = time.perf_counter()
+
+        answer = self.llm.invoke(self._synthesis_messages(query, history, plan, results)).content
+        return self._finish(query, answer, plan, start, planned, executed)
+
+    async def arun(self, query: str) -> str:
+        history = self._history()
+        start = time.perf_counter()
+        plan = self._parse((await self.llm.ainvoke(self._plan_messages(query, history))).content)
+        planned = time.perf_counter()
+
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, contextvars.copy_context().run, self._call, call) for call in plan
+        ))
+        executed = time.perf_counter()
+
+        answer = (await self.llm.ainvoke(self._synthesis_messages(query, history, plan, results))).content
+        return self._finish(query, answer, plan, start, planned, executed)
+
+    def _history(self):
+        return self.memory.load_memory_variables({})[self.memory.memory_key]
+
+    def _plan_messages(self, query, history):
+        return [SystemMessage(content=self._planner_message), *history, HumanMessage(content=query)]
+
+    def _synthesis_messages(self, query, history, plan, results):
+        sections = [f"### {tool}({tool_input})\n{result}" for (tool, tool_input), result in zip(plan, results)]
+        body = "\n\n".join(sections) if sections else "No tool was called."
+        return [
+            SystemMessage(content=self.system_message),
+            *history,
+            HumanMessage(content=query),
+            HumanMessage(content=f"TOOL RESULTS\n---------------------\n{body}\n---------------------\n{SYNTHESIS_INSTRUCTIONS}"),
+        ]
+
+    def _parse(self, text):
+        plan = parse_plan(text, self._tools_by_name, self.max_calls)
+        if self.verbose:
+            print(f"Plan: {', '.join(f'{tool}({tool_input})' for tool, tool_input in plan) or 'no tool calls'}")
+        return plan
+
+    def _run_on(self, executor, plan):
+        # Each call in a copy of this context, so it is traced in the current turn
+        futures = [executor.submit(contextvars.copy_context().run, self._call, call) for call in plan]
+        return [future.result() for future in futures]
+
+    def _call(self, call):
+        tool, tool_input = call
+        try:
+            return str(self._tools_by_name[tool].func(tool_input))
+        except Exception as e:
+            return f"Error: {type(e).__name__}: {e}"
+
+    def _finish(self, query, answer, plan, start, planned, executed):
+        self.memory.save_context({"input": query}, {"output": answer})
+        self.last_plan = plan
+        self.last_timings = {
+            "plan": planned - start,
+            "tools": executed - planned,
+            "synthesis": time.perf_counter() - executed,
+        }
+        return answer
+
+def parse_plan(text: str, tool_names, max_calls=8):
+    """
+    The (tool, input) calls in a planner response: a JSON list of {"tool": ..., "input": ...}
+    objects, optionally inside a code fence or surrounded by prose. The ReAct keys "action" and
+    "action_input" are accepted as well. Unknown tools and repeated calls are dropped and at most
+    `max_calls` are kept.
+    """
+    start, end = text.find('['), text.rfind(']')
+    try:
+        calls = json.loads(text[start:end + 1]) if 0 <= start < end else None
+    except json.JSONDecodeError:
+        calls = None
+    if not isinstance(calls, list):
+        raise ValueError(f"Could not parse a plan of tool calls from the response: {text[:200]!r}")
+
+    plan = []
+    for call in calls:
+        if not isinstance(call, dict):
+            continue
+        tool = call.get('tool', call.get('action'))
+        tool_input = call.get('input', call.get('action_input', ''))
+        step = (tool, tool_input if isinstance(tool_input, str) else json.dumps(tool_input))
+        if tool in tool_names and step not in plan:
+            plan.append(step)
+    return plan[:max_calls]
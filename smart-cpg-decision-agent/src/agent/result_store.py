@@ -0,0 +1,156 @@
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# Rough tokens-per-character ratio of tabular text for the usual tokenizers
+CHARS_PER_TOKEN = 4
+
+# Columns worth counting when a result is too large to show in full
+GROUP_COLUMNS = ('category', 'store_region', 'promo_type', 'store_id', 'sku_id')
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+class ResultStore:
+    """
+    Keeps the full results of agent tool calls server side and hands the agent a compact,
+    token-budgeted summary instead.
+
+    A result whose text fits within `token_budget` is returned as is. A larger one is stored under a
+    handle (e.g. "R3") and summarized as its top rows, grouped counts, summary statistics and a
+    truncation notice; the agent pages through the rest with the ResultPage tool. Only the
+    `max_results` most recent results are kept.
+    """
+    def __init__(self, token_budget=800, top_k=10, max_results=32):
+        self.token_budget = token_budget
+        self.top_k = top_k
+        self.max_results = max_results
+        self._results = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def wrap(self, tool_name: str, func, sort_by=None, ascending=False):
+        """
+        Returns `func` with its result summarized. `sort_by` picks the rows shown first, e.g. the
+        largest spikes or the lowest inventory.
+        """
+        def summarized(raw_input):
+            return self.summarize(func(raw_input), tool_name, sort_by=sort_by, ascending=ascending)
+
+        return summarized
+
+    def summarize(self, result, tool_name='Tool', sort_by=None, ascending=False):
+        if not isinstance(result, pd.DataFrame):
+            return result
+
+        # Only render small results in full: to_string() on a large frame is itself slow
+        if len(result) <= self.page_rows(result):
+            full_text = result.to_string()
+            if estimate_tokens(full_text) <= self.token_budget:
+                return full_text
+
+        handle = self.put(result)
+        ranked = result
+        if sort_by in result.columns:
+            ranked = result.sort_values(sort_by, ascending=ascending, kind='stable')
+
+        header = f"{tool_name} returned {len(result):,} rows x {len(result.columns)} columns (result handle: {handle})."
+        sections = [section for section in (_grouped_counts(result), _summary_stats(result)) if section]
+
+        # Show as many top rows as the budget allows, then drop optional sections if it is still too tight
+        k = min(self.top_k, len(result))
+        while True:
+            text = _render(header, ranked, k, sections, handle, self.page_rows(result))
+            if estimate_tokens(text) <= self.token_budget:
+                return text
+            if k > 1:
+                k //= 2
+            elif sections:
+                sections.pop()
+            else:
+                return text
+
+    def put(self, frame: pd.DataFrame) -> str:
+        """
+        Stores `frame` and returns its handle. The same frame object (e.g. a cached tool result) keeps its handle.
+        """
+        with self._lock:
+            for handle, stored in self._results.items():
+                if stored is frame:
+                    self._results.move_to_end(handle)
+                    return handle
+
+            handle = f"R{self._next_id}"
+            self._next_id += 1
+            self._results[handle] = frame
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            return handle
+
+    def get(self, handle: str) -> pd.DataFrame:
+        with self._lock:
+            if handle not in self._results:
+                raise KeyError(f"Unknown or expired result handle '{handle}'.")
+            return self._results[handle]
+
+    def page_rows(self, frame: pd.DataFrame):
+        """
+        Rows per ResultPage page: as many rows of `frame` as fit in the token budget, measured on its first rows.
+        """
+        sample = frame.head(10).to_string()
+        row_chars = len(sample) / (sample.count('\n') + 1)
+        return max(1, int(self.token_budget * CHARS_PER_TOKEN * 0.9 // row_chars) - 1)
+
+    def page(self, handle: str, page: int = 1) -> str:
+        """
+        Renders page `page` (1-based) of the stored result `handle`.
+        """
+        frame = self.get(handle)
+        size = self.page_rows(frame)
+        n_pages = max(1, -(-len(frame) // size))
+        if not 1 <= page <= n_pages:
+            raise ValueError(f"Result {handle} has {n_pages} pages.")
+
+        rows = frame.iloc[(page - 1) * size:page * size]
+        text = f"Result {handle}, page {page} of {n_pages} (rows {(page - 1) * size + 1:,}-{(page - 1) * size + len(rows):,} of {len(frame):,}):\n{rows.to_string()}"
+        if page < n_pages:
+            text += f"\nCall ResultPage with '{handle},{page + 1}' for the next page."
+        return text
+
+    def page_tool_input(self, args: str) -> str:
+        """
+        Parses the ResultPage tool input 'handle,page' (page defaults to 1).
+        """
+        parts = [part.strip().strip('"\'') for part in str(args).split(',')]
+        try:
+            return self.page(parts[0], int(parts[1]) if len(parts) > 1 and parts[1] else 1)
+        except (KeyError, ValueError) as e:
+            return str(e).strip('"')
+
+def _grouped_counts(frame: pd.DataFrame, top=5):
+    lines = []
+    for column in GROUP_COLUMNS:
+        if column in frame.columns:
+            counts = frame[column].value_counts(sort=True).head(top)
+            counts = counts[counts > 0]
+            lines.append(f"  {column}: " + ", ".join(f"{value} ({count:,})" for value, count in counts.items()))
+    return "Rows by group (top 5):\n" + "\n".join(lines) if lines else ''
+
+def _summary_stats(frame: pd.DataFrame):
+    measures = [
+        column for column in frame.select_dtypes('number').columns
+        if not column.endswith(('_id', '_flag'))
+    ]
+    if not measures:
+        return ''
+    stats = frame[measures].agg(['min', 'mean', 'max']).T.round(2)
+    return "Summary statistics:\n" + stats.to_string()
+
+def _render(header, ranked, k, sections, handle, page_rows):
+    n_pages = -(-len(ranked) // page_rows)
+    notice = (
+        f"Output truncated: showing {k} of {len(ranked):,} rows. "
+        f"Call ResultPage with '{handle},1' to read the full result ({n_pages} pages)."
+    )
+    parts = [header, f"Top {k} rows:\n{ranked.head(k).to_string()}", *sections, notice]
+    return "\n\n".join(parts)
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from src.agent.tool_cache import ToolResultCache
+
+class AgentSessions:
+    """
+    One agent per user session over a single shared, read-only dataset.
+
+    Each session gets its own agent, and with it its own conversation memory and result store, so
+    concurrent users never see each other's history. The dataset, the tool-result cache and the
+    tool thread pool are shared: tool calls from all sessions run on `max_workers` threads while
+    the event loop keeps serving the other sessions' LLM calls.
+
+    Turns within one session run one at a time, in order, since they share that session's memory.
+
+    Front ends rarely say when a session ends (a closed browser tab), so at most `max_sessions` are
+    kept: the least recently used session is dropped beyond that, as is any session idle for
+    `idle_seconds` (None keeps idle sessions). A session in the middle of a turn is never dropped.
+    """
+    def __init__(self, dataset, tool_cache=None, llm_factory=None, max_workers=None, max_sessions=100,
+                 idle_seconds=3600, **agent_kwargs):
+        self.dataset = dataset
+        self.tool_cache = tool_cache if tool_cache is not None else ToolResultCache()
+        self.llm_factory = llm_factory
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1),
+                                           thread_name_prefix="cpg-tools")
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.agent_kwargs = agent_kwargs
+        # {session_id: _Session}, least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """
+        Returns the agent of `session_id`, creating it on first use.
+        """
+        session = self._session(session_id)
+        # Built outside the sessions lock, so a slow build only holds up its own session
+        with session.build_lock:
+            if session.agent is None:
+                # LangChain loads with the first agent, not with this module
+                from src.agent.agent_core import create_cpg_agent
+
+                session.agent = create_cpg_agent(
+                    self.dataset,
+                    tool_cache=self.tool_cache,
+                    llm=self.llm_factory() if self.llm_factory else None,
+                    executor=self.executor,
+                    **self.agent_kwargs
+                )
+        return session.agent
+
+    async def arun(self, session_id, query: str) -> str:
+        """
+        Answers `query` in `session_id`'s conversation without blocking other sessions.
+        """
+        from src.agent.agent_core import arun_agent
+
+        session = self._session(session_id)
+        agent = self.get(session_id)
+        with self._lock:
+            # asyncio locks cannot be shared between event loops
+            turn_lock = session.loop_locks.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+            session.turns += 1
+        try:
+            async with turn_lock:
+                return await arun_agent(agent, query, session_id)
+        finally:
+            with self._lock:
+                session.turns -= 1
+
+    def run(self, session_id, query: str) -> str:
+        """
+        Blocking wrapper around `arun` for callers without an event loop (a CLI prompt, a Streamlit script run).
+        Each call runs on a new event loop, so the turns of a session are ordered by a thread lock here.
+        """
+        session = self._session(session_id)
+        with session.turn_lock:
+            return asyncio.run(self.arun(session_id, query))
+
+    def end(self, session_id):
+        """
+        Drops the agent and history of `session_id`.
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def _session(self, session_id):
+        """
+        The state of `session_id`, created on first use and marked as just used; evicts idle and
+        least recently used sessions beyond `max_sessions`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session()
+            self._sessions.move_to_end(session_id)
+            session.last_used = now
+
+            idle = [] if self.idle_seconds is None else [
+                key for key, other in self._sessions.items() if now - other.last_used > self.idle_seconds
+            ]
+            overflow = [key for key in self._sessions if key != session_id][:max(0, len(self._sessions) - self.max_sessions)]
+            for key in dict.fromkeys(idle + overflow):
+                if not self._sessions[key].busy:
+                    del self._sessions[key]
+            return session
+
+class _Session:
+    """
+    The agent of one session (built on first use) and the locks that order its turns.
+    """
+    def __init__(self):
+        self.agent = None
+        self.build_lock = threading.Lock()
+        self.turn_lock = threading.Lock()
+        # {event loop: asyncio.Lock} for turns started with arun
+        self.loop_locks = weakref.WeakKeyDictionary()
+        self.turns = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def busy(self):
+        return self.turns > 0 or self.turn_lock.locked() or self.build_lock.locked()
@@ -0,0 +1,100 @@
+import json
+
+# Natural-language spellings the LLM uses for the CategoryTrends period
+PERIOD_NAMES = {
+    'day': 'D', 'daily': 'D',
+    'week': 'W', 'weekly': 'W',
+    'month': 'M', 'monthly': 'M',
+    'quarter': 'Q', 'quarterly': 'Q',
+}
+
+# ... and for the StorePerformance metric
+METRIC_NAMES = {
+    'revenue': 'revenue', 'sales': 'revenue',
+    'units': 'units_sold', 'units_sold': 'units_sold', 'units sold': 'units_sold', 'volume': 'units_sold',
+}
+
+# ... and for the FailedPromotions baseline options
+PROMOTION_OPTIONS = {
+    'holiday': 'holiday', 'holidays': 'holiday',
+    'promo_type': 'promo_type', 'promo type': 'promo_type', 'type': 'promo_type',
+}
+
+def _clean(raw):
+    """
+    Strips whitespace and the quotes LLMs often wrap tool inputs in.
+    """
+    return str(raw).strip().strip('"\'`').strip()
+
+def _canonical_number(raw):
+    value = float(_clean(raw))
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def normalize_period(raw):
+    value = _clean(raw)
+    return PERIOD_NAMES.get(value.lower(), value.upper())
+
+def normalize_metric(raw):
+    value = _clean(raw).lower()
+    return METRIC_NAMES.get(value, value)
+
+def normalize_category(raw):
+    value = _clean(raw)
+    return 'all' if value.lower() in ('', 'all', 'none') else value
+
+def normalize_number(raw):
+    return repr(float(_clean(raw)))
+
+def normalize_integer(raw):
+    return str(int(float(_clean(raw))))
+
+def normalize_csv(raw):
+    """
+    Comma-separated arguments with numbers in canonical form, e.g. " 101, 0.10 ,-1.5" -> "101,0.1,-1.5".
+    """
+    parts = []
+    for part in _clean(raw).split(','):
+        try:
+            parts.append(_canonical_number(part))
+        except ValueError:
+            parts.append(_clean(part))
+    return ','.join(parts)
+
+def normalize_promotion_options(raw):
+    """
+    The recognised FailedPromotions options, sorted, e.g. "Promo Type, holidays" -> "holiday,promo_type";
+    anything else (the LLM often passes "none" or the question) is dropped.
+    """
+    options = {PROMOTION_OPTIONS.get(_clean(part).lower()) for part in _clean(raw).split(',')}
+    return ','.join(sorted(options - {None}))
+
+def normalize_json(raw):
+    return json.dumps(json.loads(_clean(raw)), sort_keys=True)
+
+TOOL_INPUT_NORMALIZERS = {
+    'CategoryTrends': normalize_period,
+    'StorePerformance': normalize_metric,
+    'SeasonalityAnalysis': normalize_category,
+    'SalesSpikes': normalize_number,
+    'StockShortages': normalize_integer,
+    'FailedPromotions': normalize_promotion_options,
+    'SimulatePriceChange': normalize_csv,
+    'SimulatePromotion': normalize_csv,
+    'PriceChangeUncertainty': normalize_csv,
+    'PromotionUncertainty': normalize_csv,
+    'ScenarioGrid': normalize_json,
+    'DemandForecast': normalize_csv,
+    'ProjectedStockouts': normalize_integer,
+}
+
+def normalize_tool_input(tool_name: str, raw):
+    """
+    Canonical form of a tool input, so equivalent spellings ("W", " w ", "weekly") share one cache key
+    and reach the tool in a form it accepts. Inputs that fail to normalize are only stripped, and the
+    tool reports the error itself.
+    """
+    normalize = TOOL_INPUT_NORMALIZERS.get(tool_name, _clean)
+    try:
+        return normalize(raw)
+    except (ValueError, TypeError):
+        return _clean(raw)
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from src.agent.tool_args import normalize_tool_input
+
+class ToolResultCache:
+    """
+    Size-bounded LRU cache of agent tool outputs, keyed on (dataset fingerprint, tool name, normalized input).
+
+    The fingerprint ties every entry to the data it was computed from: binding the cache to a new
+    fingerprint (a reload that changed the data) drops all stale entries. With `persist_dir`, entries are
+    also written to disk, one pickle per entry, so a restarted process starts warm.
+    """
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, persist_dir=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.persist_dir = persist_dir
+        self.fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+            self._load_from_disk()
+
+    def bind(self, fingerprint: str):
+        """
+        Points the cache at the dataset with `fingerprint`, evicting entries computed from any other data.
+        """
+        with self._lock:
+            if fingerprint == self.fingerprint:
+                return
+            self.fingerprint = fingerprint
+            for key in [key for key in self._entries if key[0] != fingerprint]:
+                self._evict(key)
+
+    def wrap(self, tool_name: str, func):
+        """
+        Returns `func` memoized under `tool_name`. The input is normalized before both the lookup
+        and the call, so the tool always receives the canonical form.
+        """
+        def cached(raw_input):
+            normalized = normalize_tool_input(tool_name, raw_input)
+            key = (self.fingerprint, tool_name, normalized)
+
+            hit, value = self.get(key)
+            if hit:
+                return value
+
+            value = func(normalized)
+            self.put(key, value)
+            return value
+
+        return cached
+
+    def get(self, key):
+        """
+        Returns (True, value) on a hit and (False, None) on a miss.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return True, self._entries[key][0]
+
+    def put(self, key, value):
+        payload = pickle.dumps((key, value))
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            if len(payload) > self.max_bytes:
+                return
+
+            self._entries[key] = (value, len(payload))
+            self._bytes += len(payload)
+            if self.persist_dir:
+                self._write(key, payload)
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+
+    def stats(self):
+        """
+        Hit/miss counters and current size, e.g. for a UI panel.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _evict(self, key):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+        if self.persist_dir:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.persist_dir, f"{digest}.pkl")
+
+    def _write(self, key, payload: bytes):
+        # Write then rename, so a crash never leaves a truncated entry behind
+        path = self._path(key)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(payload)
+        os.replace(path + '.tmp', path)
+
+    def _load_from_disk(self):
+        """
+        Restores persisted entries, least recently written first so the LRU order survives restarts.
+        """
+        paths = [os.path.join(self.persist_dir, name) for name in os.listdir(self.persist_dir) if name.endswith('.pkl')]
+        for path in sorted(paths, key=os.path.getmtime):
+            try:
+                with open(path, 'rb') as f:
+                    payload = f.read()
+                key, value = pickle.loads(payload)
+            except Exception:
+                os.remove(path)
+                continue
+            self._entries[key] = (value, len(payload))
+            self._bytes += len(payload)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
@@ -0,0 +1,56 @@
+import pandas as pd
+
+# Trend periods the tools answer from precomputed calendar keys, with the pandas aliases that map onto them
+PERIOD_ALIASES = {
+    'D': 'D',
+    'W': 'W', 'W-SUN': 'W',
+    'M': 'M', 'ME': 'M',
+    'Q': 'Q', 'QE': 'Q', 'QE-DEC': 'Q',
+}
+
+# Column holding the label of each period. Labels match pd.Grouper: the last day of the period.
+PERIOD_COLUMNS = {
+    'D': 'date',
+    'W': 'week_end',
+    'M': 'month_end',
+    'Q': 'quarter_end',
+}
+
+def period_labels(dates: pd.Series, period: str):
+    """
+    Labels each date with the last day of its period ('D', 'W', 'M' or 'Q'),
+    matching the bin labels of pd.Grouper(freq=period).
+    """
+    dates = dates.dt.normalize()
+    if period == 'D':
+        return dates
+    if period == 'W':
+        # Weeks end on Sunday (dayofweek 6)
+        return dates + pd.to_timedelta(6 - dates.dt.dayofweek, unit='D')
+    return dates.dt.to_period(period).dt.end_time.dt.normalize()
+
+def calendar_keys(dates: pd.Series):
+    """
+    Derives every calendar key the tools group by from a parsed `date` column.
+    """
+    keys = {PERIOD_COLUMNS[period]: period_labels(dates, period) for period in ('W', 'M', 'Q')}
+    keys['month'] = dates.dt.month.astype('int8')
+    return keys
+
+def period_key(frame: pd.DataFrame, period: str):
+    """
+    Returns the period labels ('D', 'W', 'M' or 'Q') of every row of `frame`: its precomputed
+    calendar column when present, or a Series derived on the fly (without touching the frame).
+    """
+    column = PERIOD_COLUMNS[period]
+    if column != 'date' and column in frame.columns:
+        return frame[column]
+    return period_labels(pd.to_datetime(frame['date']), period)
+
+def month_key(frame: pd.DataFrame):
+    """
+    Returns the calendar month (1-12) of every row of `frame`, precomputed when present.
+    """
+    if 'month' in frame.columns:
+        return frame['month']
+    return pd.to_datetime(frame['date']).dt.month.rename('month')
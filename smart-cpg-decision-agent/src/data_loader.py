@@ -1,42 +1,479 @@
+import hashlib
+import json
+import os
+import numpy as np
 import pandas as pd
-try:
-    from pyspark.sql import SparkSession
-    from pyspark.sql.functions import col
-except ImportError:
-    pass
+
+# Target dtypes for the compact, columnar representation of the sales data.
+# Integer columns fall back to the smallest integer type that fits if the values outgrow the target.
+COMPACT_SCHEMA = {
+    'date': 'datetime64[ns]',
+    'store_id': 'int16',
+    'sku_id': 'int32',
+    'units_sold': 'int32',
+    'inventory_level': 'int32',
+    'promo_flag': 'int8',
+    'holiday_flag': 'int8',
+    'price': 'float32',
+    'revenue': 'float32',
+    'category': 'category',
+    'store_region': 'category',
+    'promo_type': 'category',
+    'store_size': 'category',
+}
+
+# Spark has no categorical type, so low-cardinality strings stay strings there
+SPARK_COMPACT_TYPES = {
+    'datetime64[ns]': 'date',
+    'int8': 'tinyint',
+    'int16': 'smallint',
+    'int32': 'int',
+    'float32': 'float',
+    'category': 'string',
+}
+
+# DuckDB stores integers and strings compressed already; compacting there parses dates and narrows money columns
+DUCKDB_COMPACT_TYPES = {
+    'datetime64[ns]': 'DATE',
+    'float32': 'FLOAT',
+}
+
+# Backends DataLoader.load_data can return the data for
+BACKENDS = ('pandas', 'spark', 'duckdb')
+
+# Row filters accepted by DataLoader.load_data, e.g. {'start_date': '2023-01-01', 'category': 'Snacks', 'sku_id': [101, 102]}
+FILTER_KEYS = ('start_date', 'end_date', 'category', 'store_id', 'sku_id')
+
+# Derived partition column of the hive layout written by write_partitioned_dataset
+YEAR_MONTH = 'year_month'
+
+def compact_frame(df: pd.DataFrame):
+    """
+    Casts a pandas sales frame to COMPACT_SCHEMA: categoricals for low-cardinality strings,
+    downcast integer ids and flags, float32 money columns and a parsed datetime `date`.
+    Columns not in the schema are left untouched. Returns a new frame; the input is not modified.
+    """
+    compact = {}
+    for column in df.columns:
+        series = df[column]
+        dtype = COMPACT_SCHEMA.get(column)
+
+        if dtype is None:
+            compact[column] = series
+        elif dtype == 'datetime64[ns]':
+            compact[column] = pd.to_datetime(series)
+        elif dtype.startswith('int'):
+            compact[column] = _downcast_int(series, dtype)
+        else:
+            compact[column] = series.astype(dtype)
+
+    return pd.DataFrame(compact, index=df.index)
+
+def _downcast_int(series: pd.Series, dtype: str):
+    """
+    Casts an integer column to `dtype` when its values fit, otherwise to the smallest integer type that does.
+    Columns with missing values are left as they are.
+    """
+    if series.isna().any():
+        return series
+
+    limits = np.iinfo(dtype)
+    if series.empty or (series.min() >= limits.min and series.max() <= limits.max):
+        return series.astype(dtype)
+    return pd.to_numeric(series, downcast='integer')
 
 class DataLoader:
-    def __init__(self, use_spark=True):
-        self.use_spark = use_spark
+    """
+    Loads the sales data for one of three backends: Spark DataFrames (the default, for Databricks),
+    pandas frames (use_spark=False), or DuckDBTables (backend='duckdb'), which leave the data on
+    disk and run the tools as SQL over it. `database` is a DuckDB file to persist loaded data in,
+    so later runs query its native columnar tables instead of re-reading the source; without it
+    the tools scan the parquet/csv source itself.
+    """
+    def __init__(self, use_spark=True, backend=None, database=None):
+        self.backend = backend or ('spark' if use_spark else 'pandas')
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{self.backend}'. Use one of {list(BACKENDS)}.")
+        self.use_spark = self.backend == 'spark'
+        self.database = database
+        self.last_memory_report = None
+        self.last_fingerprint = None
         if self.use_spark:
+            from pyspark.sql import SparkSession
             self.spark = SparkSession.builder \
                 .appName("CPG_Decision_Agent_DataLoader") \
                 .getOrCreate()
+        if self.backend == 'duckdb':
+            import duckdb
+            self.duckdb = duckdb.connect(database or ':memory:')
 
-    def load_data(self, filepath: str):
+    def load_data(self, filepath: str, compact=False, columns=None, filters=None):
         """
-        Loads the CPG sales data from a parquet or csv file.
+        Loads the CPG sales data from a parquet file, a hive-partitioned parquet directory or a csv file.
         Supports both Spark DataFrames (for Databricks) and Pandas (for local prototyping).
+
+        `columns` restricts the load to those columns and `filters` (keys in FILTER_KEYS) to the matching
+        rows. For parquet both are pushed down to the reader, so only the matching files, row groups and
+        columns are read.
+
+        With compact=True the data is cast to COMPACT_SCHEMA. For pandas, the memory
+        before and after is recorded in `last_memory_report`.
+
+        Every load records a fingerprint of the source files and load options in `last_fingerprint`;
+        it changes whenever the data on disk does, which invalidates cached tool results. Pass it on
+        with the frame (PreparedDataset(df, fingerprint=...)) only while the frame is unchanged: a
+        subset or a projection is different data.
+
+        With backend='duckdb' nothing is read yet: the result is a DuckDBTable the tools query in place
+        (see _load_duckdb), fingerprinted the same way.
         """
-        is_parquet = filepath.endswith('.parquet')
+        filters = _validate_filters(filters)
+        is_parquet = filepath.endswith('.parquet') or os.path.isdir(filepath)
+
+        if self.backend == 'duckdb':
+            self.last_fingerprint = source_fingerprint(filepath, compact=compact, columns=columns, filters=filters)
+            return self._load_duckdb(filepath, is_parquet, compact, columns, filters, self.last_fingerprint)
 
         if self.use_spark:
             if is_parquet:
-                return self.spark.read.parquet(filepath)
+                sdf = self.spark.read.parquet(filepath)
             else:
-                return self.spark.read.csv(filepath, header=True, inferSchema=True)
+                sdf = self.spark.read.csv(filepath, header=True, inferSchema=True)
+            sdf = _spark_filter(sdf, filters)
+            sdf = sdf.select(*columns) if columns else sdf.drop(YEAR_MONTH)
+            return self._compact_spark(sdf) if compact else sdf
         else:
             if is_parquet:
-                return pd.read_parquet(filepath)
+                df = _read_parquet(filepath, columns, filters)
             else:
-                return pd.read_csv(filepath)
+                usecols = None if columns is None else list(dict.fromkeys(list(columns) + _filter_columns(filters)))
+                df = pd.read_csv(filepath, usecols=usecols)
+                df = df[_pandas_filter_mask(df, filters)] if filters else df
+                df = df[list(columns)] if columns else df
+            df = self._compact_pandas(df) if compact else df
+
+            self.last_fingerprint = source_fingerprint(filepath, compact=compact, columns=columns, filters=filters)
+            return df
+
+    def load_new(self, filepath: str, watermark=None, compact=False):
+        """
+        Incremental load for append-only data. Returns (new rows, updated watermark), where the new rows
+        are None if nothing arrived since `watermark` (as returned by the previous call, or None to load
+        everything). Append them with PreparedDataset.append.
+
+        For a parquet directory the watermark records the files already ingested, and only files added
+        since (e.g. a new year_month partition or a new file in one) are read. For a single file the
+        watermark is the latest date loaded, and only later rows are read (pushed down for parquet).
+        The watermark is a plain dict; see read_watermark / write_watermark to keep it between runs.
+        The new rows' fingerprint is recorded in `last_fingerprint` (for PreparedDataset.append).
+        """
+        if self.backend != 'pandas':
+            raise ValueError("Incremental loading builds an in-memory PreparedDataset and requires the pandas backend")
+        watermark = dict(watermark or {})
+
+        if os.path.isdir(filepath):
+            files = _data_files(filepath)
+            new_files = [path for path in files if path not in set(watermark.get('files', []))]
+            if not new_files:
+                return None, watermark
+            df = _read_parquet(filepath, None, {}, files=[os.path.join(filepath, path) for path in new_files])
+            df = self._compact_pandas(df) if compact else df
+            watermark['files'] = sorted(set(watermark.get('files', [])) | set(new_files))
+        else:
+            since = watermark.get('max_date')
+            filters = {'start_date': pd.Timestamp(since) + pd.Timedelta(days=1)} if since else None
+            df = self.load_data(filepath, compact=compact, filters=filters)
+            if len(df) == 0:
+                return None, watermark
+
+        latest = pd.to_datetime(df['date']).max().strftime('%Y-%m-%d')
+        watermark['max_date'] = max(latest, watermark.get('max_date') or latest)
+        self.last_fingerprint = source_fingerprint(filepath, compact=compact, watermark=watermark)
+        return df, watermark
+
+    def iter_batches(self, filepath: str, batch_rows=1_000_000, columns=None, filters=None):
+        """
+        Reads the data as a stream of pandas frames of up to `batch_rows` rows, for files larger than
+        memory: parquet is read a row group at a time (with the projection and filters pushed down),
+        csv in chunks. Only one batch is held in memory at a time.
+        """
+        if self.backend != 'pandas':
+            raise ValueError("Batched reading is for the pandas path; Spark and DuckDB already stream from disk")
+        filters = _validate_filters(filters)
+
+        if filepath.endswith('.parquet') or os.path.isdir(filepath):
+            import pyarrow.dataset as pads
+            dataset, columns, expression = _parquet_scan(filepath, columns, filters)
+            # Sequential, with no readahead or pre-buffering, so memory stays at about one batch
+            scanner = dataset.scanner(columns=columns, filter=expression, batch_size=batch_rows, use_threads=False,
+                                      batch_readahead=0, fragment_readahead=0,
+                                      fragment_scan_options=pads.ParquetFragmentScanOptions(pre_buffer=False))
+            for batch in scanner.to_batches():
+                yield batch.to_pandas()
+        else:
+            usecols = None if columns is None else list(dict.fromkeys(list(columns) + _filter_columns(filters)))
+            for chunk in pd.read_csv(filepath, usecols=usecols, chunksize=batch_rows):
+                chunk = chunk[_pandas_filter_mask(chunk, filters)] if filters else chunk
+                yield chunk[list(columns)] if columns else chunk
+
+    def load_for_tools(self, filepath: str, tool_names, compact=False, filters=None):
+        """
+        Loads only the columns the given tools declare in TOOL_COLUMNS (e.g. ['simulate_price_change']),
+        with the rows trimmed by `filters`.
+        """
+        from src.tools import required_columns
+        return self.load_data(filepath, compact=compact, columns=required_columns(*tool_names), filters=filters)
+
+    def _compact_pandas(self, df: pd.DataFrame):
+        """
+        Applies the compact schema to a pandas frame and records the bytes saved.
+        """
+        original_bytes = int(df.memory_usage(deep=True).sum())
+        df = compact_frame(df)
+        compact_bytes = int(df.memory_usage(deep=True).sum())
+
+        self.last_memory_report = {
+            "original_bytes": original_bytes,
+            "compact_bytes": compact_bytes,
+            "bytes_saved": original_bytes - compact_bytes,
+        }
+        return df
 
-    def load_data_from_table(self, table_name: str):
+    def _compact_spark(self, sdf):
+        """
+        Applies the compact schema to a Spark DataFrame through column casts.
+        """
+        from pyspark.sql.functions import col
+        return sdf.select([
+            col(name).cast(SPARK_COMPACT_TYPES[COMPACT_SCHEMA[name]]).alias(name)
+            if name in COMPACT_SCHEMA else col(name)
+            for name in sdf.columns
+        ])
+
+    def _load_duckdb(self, filepath: str, is_parquet: bool, compact, columns, filters, fingerprint: str):
+        """
+        A DuckDBTable over the source with the projection, filters and compact casts applied in SQL.
+        DuckDB pushes them down into the scan, pruning hive partitions and parquet row groups.
+
+        With a `database` file the selection is materialized there once per fingerprint, as a table
+        named after the source and fingerprint; older tables of the same source are dropped.
+        """
+        from src.tools.duckdb_backend import DuckDBTable
+
+        path = filepath.replace("'", "''")
+        if is_parquet:
+            glob = os.path.join(path, '**', '*.parquet') if os.path.isdir(filepath) else path
+            reader = f"read_parquet('{glob}', hive_partitioning = {str(os.path.isdir(filepath)).lower()})"
+        else:
+            # Dates stay strings, like pandas.read_csv, unless compacted
+            reader = f"read_csv('{path}', header = true, types = {{'date': 'VARCHAR'}})"
+
+        source_names = [row[0] for row in self.duckdb.execute(f"DESCRIBE SELECT * FROM {reader}").fetchall()]
+        names = list(columns) if columns else [name for name in source_names if name != YEAR_MONTH]
+        select = ', '.join(
+            f'CAST("{name}" AS {DUCKDB_COMPACT_TYPES[COMPACT_SCHEMA[name]]}) AS "{name}"'
+            if compact and COMPACT_SCHEMA.get(name) in DUCKDB_COMPACT_TYPES else f'"{name}"'
+            for name in names
+        )
+        query = f"SELECT {select} FROM {reader} {_duckdb_filter(filters, YEAR_MONTH in source_names)}"
+
+        if self.database is None:
+            return DuckDBTable(self.duckdb, f"({query})", fingerprint)
+
+        prefix = f"sales_{hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:8]}_"
+        table = prefix + fingerprint[:12]
+        existing = [row[0] for row in self.duckdb.execute(
+            "SELECT table_name FROM information_schema.tables WHERE starts_with(table_name, ?)", [prefix]
+        ).fetchall()]
+        if table not in existing:
+            self.duckdb.execute(f"CREATE TABLE {table} AS {query}")
+        for stale in set(existing) - {table}:
+            self.duckdb.execute(f"DROP TABLE {stale}")
+        return DuckDBTable(self.duckdb, table, fingerprint)
+
+    def load_data_from_table(self, table_name: str, compact=False):
         """
         Loads the data directly from a Databricks catalog table.
         e.g., 'default.cpg_sales_data'
         """
         if self.use_spark:
-            return self.spark.table(table_name)
+            sdf = self.spark.table(table_name)
+            return self._compact_spark(sdf) if compact else sdf
         else:
             raise ValueError("Loading from a Databricks table requires use_spark=True")
+
+def source_fingerprint(filepath: str, **options):
+    """
+    Hash of the files under `filepath` (path, size, modification time) and the load options.
+    """
+    paths = [filepath]
+    if os.path.isdir(filepath):
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(filepath) for name in names)
+
+    digest = hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+def read_watermark(path: str):
+    """
+    The watermark saved by write_watermark, or None if there is none yet.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_watermark(watermark, path: str):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(watermark, f)
+    os.replace(tmp_path, path)
+
+def _data_files(directory: str):
+    """
+    Data files under a parquet dataset directory, relative to it, skipping hidden and marker files (_SUCCESS, .crc).
+    """
+    return sorted(
+        os.path.relpath(os.path.join(root, name), directory)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if not name.startswith(('.', '_'))
+    )
+
+def write_partitioned_dataset(df: pd.DataFrame, path: str, partition_cols=('category', YEAR_MONTH)):
+    """
+    Writes the sales data as a hive-partitioned parquet dataset (e.g. category=Snacks/year_month=2023-01/).
+    A `year_month` column is derived from `date` when it is used as a partition column.
+    """
+    if YEAR_MONTH in partition_cols:
+        df = df.assign(**{YEAR_MONTH: pd.to_datetime(df['date']).dt.strftime('%Y-%m')})
+    df.to_parquet(path, partition_cols=list(partition_cols), index=False)
+
+def _validate_filters(filters):
+    """
+    Checks the filter keys and drops filters set to None.
+    """
+    filters = {key: value for key, value in (filters or {}).items() if value is not None}
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unsupported filters {sorted(unknown)}. Use any of {list(FILTER_KEYS)}.")
+    return filters
+
+def _filter_columns(filters):
+    """
+    Columns the filters need to read.
+    """
+    return ['date' if key.endswith('_date') else key for key in filters]
+
+def _as_list(value):
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+def _read_parquet(filepath: str, columns, filters, files=None):
+    """
+    Reads a parquet file or hive-partitioned directory through a pyarrow dataset, so the column
+    projection and the row filters prune files, row groups and columns before anything is decoded.
+    `files` restricts the read to those files of the directory.
+    """
+    dataset, columns, expression = _parquet_scan(filepath, columns, filters, files)
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+def _parquet_scan(filepath: str, columns, filters, files=None):
+    """
+    The pyarrow dataset behind `filepath` with the projected columns and the filter expression.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+
+    if files is None:
+        dataset = pads.dataset(filepath, format='parquet', partitioning='hive')
+    else:
+        dataset = pads.dataset(files, format='parquet', partitioning='hive', partition_base_dir=filepath)
+    schema = dataset.schema
+
+    expression = None
+    for key, value in filters.items():
+        if key.endswith('_date'):
+            bound = pd.Timestamp(value)
+            lower = key == 'start_date'
+            conditions = [_compare(pads.field('date'), _date_scalar(bound, schema.field('date').type, pa), lower)]
+            if YEAR_MONTH in schema.names:
+                # Prune whole year_month partitions before touching their files
+                conditions.append(_compare(pads.field(YEAR_MONTH), bound.strftime('%Y-%m'), lower))
+        else:
+            conditions = [pads.field(key).isin(_as_list(value))]
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+    if columns is None:
+        columns = [name for name in schema.names if name != YEAR_MONTH]
+    return dataset, list(columns), expression
+
+def _compare(field, value, lower: bool):
+    return field >= value if lower else field <= value
+
+def _date_scalar(bound: pd.Timestamp, field_type, pa):
+    """
+    Converts a date bound to a scalar comparable with the `date` column as stored (string, date or timestamp).
+    """
+    if pa.types.is_timestamp(field_type):
+        return pa.scalar(bound, type=field_type)
+    if pa.types.is_date(field_type):
+        return pa.scalar(bound.date(), type=field_type)
+    return bound.strftime('%Y-%m-%d')
+
+def _pandas_filter_mask(df: pd.DataFrame, filters):
+    """
+    Boolean row mask for the filters, for readers without pushdown (csv).
+    """
+    mask = pd.Series(True, index=df.index)
+    for key, value in filters.items():
+        if key.endswith('_date'):
+            dates = pd.to_datetime(df['date'])
+            bound = pd.Timestamp(value)
+            mask &= dates >= bound if key == 'start_date' else dates <= bound
+        else:
+            mask &= df[key].isin(_as_list(value))
+    return mask
+
+def _duckdb_filter(filters, partitioned: bool):
+    """
+    A SQL WHERE clause for the filters, with the values as literals so the query can be kept as a
+    subquery or a table definition. The `year_month` partition bound lets DuckDB skip whole
+    partitions of a hive-partitioned directory.
+    """
+    conditions = []
+    for key, value in filters.items():
+        if key.endswith('_date'):
+            bound = pd.Timestamp(value)
+            operator = '>=' if key == 'start_date' else '<='
+            conditions.append(f'CAST("date" AS DATE) {operator} DATE {_sql_literal(bound.strftime("%Y-%m-%d"))}')
+            if partitioned:
+                conditions.append(f'CAST({YEAR_MONTH} AS VARCHAR) {operator} {_sql_literal(bound.strftime("%Y-%m"))}')
+        else:
+            conditions.append(f'list_contains({_sql_literal(_as_list(value))}, "{key}")')
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+def _sql_literal(value):
+    if isinstance(value, list):
+        return '[' + ', '.join(_sql_literal(item) for item in value) + ']'
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value.item() if hasattr(value, 'item') else value)
+
+def _spark_filter(sdf, filters):
+    """
+    Applies the filters to a Spark DataFrame; Spark pushes them down to the parquet scan and prunes partitions.
+    """
+    from pyspark.sql.functions import col
+    for key, value in filters.items():
+        if key.endswith('_date'):
+            bound = pd.Timestamp(value)
+            lower = key == 'start_date'
+            sdf = sdf.filter(_compare(col('date'), bound.strftime('%Y-%m-%d'), lower))
+            if YEAR_MONTH in sdf.columns:
+                sdf = sdf.filter(_compare(col(YEAR_MONTH), bound.strftime('%Y-%m'), lower))
+        else:
+            sdf = sdf.filter(col(key).isin(_as_list(value)))
+    return sdf
@@ -0,0 +1,136 @@
+import copy
+import hashlib
+import threading
+import pandas as pd
+from src.rollups import RollupCube, concat_aligned
+from src.tools.duckdb_backend import is_duckdb_table
+from src.tools.spark_backend import is_spark_frame
+
+class PreparedDataset:
+    """
+    Read-only view of the sales data that the agent tools share.
+
+    The `date` column is parsed once, when the dataset is built, and the trend and store
+    aggregates are materialized into `rollups` (see RollupCube) along with their calendar keys.
+    Tools read from these frames and never write to them; new data arrives through `append`.
+
+    `fingerprint` identifies the data for result caches: the one given (e.g. DataLoader.last_fingerprint
+    for the frame it just loaded), or else dataset_fingerprint of the rows.
+
+    `derived` holds structures tools build lazily from the data and reuse across calls (e.g. the
+    sales panel and forecasts of src.tools.forecasting); it is emptied whenever the data changes.
+
+    The frame, rollups, fingerprint and `derived` form one version of the data, which `append` and
+    `refresh_rollups` replace in a single reference swap while other threads keep running tools. A
+    tool that reads more than one of them (e.g. the rows and their series codes) takes a `snapshot`
+    first, so it sees them all from the same version.
+    """
+    def __init__(self, df: pd.DataFrame, fingerprint=None):
+        frame = df.assign(date=pd.to_datetime(df['date']))
+        self._version = _DatasetVersion(fingerprint or dataset_fingerprint(df), frame, RollupCube(frame))
+        # Serializes appends; readers never wait for it
+        self._lock = threading.Lock()
+
+    @property
+    def df(self):
+        return self._version.df
+
+    @df.setter
+    def df(self, frame: pd.DataFrame):
+        # Replaces the rows as a new version with a fingerprint of its own, so cached results of the
+        # old rows go stale; the rollups stay as they were until refresh_rollups
+        with self._lock:
+            current = self._version
+            chained = f"{current.fingerprint}={dataset_fingerprint(frame)}"
+            self._version = _DatasetVersion(hashlib.sha1(chained.encode('utf-8')).hexdigest(), frame, current.rollups)
+
+    @property
+    def rollups(self):
+        return self._version.rollups
+
+    @property
+    def fingerprint(self):
+        return self._version.fingerprint
+
+    @property
+    def derived(self):
+        return self._version.derived
+
+    def snapshot(self):
+        """
+        A PreparedDataset fixed on the current version of the data: later appends do not change it.
+        """
+        view = object.__new__(PreparedDataset)
+        view._version = self._version
+        view._lock = self._lock
+        return view
+
+    def append(self, new_rows: pd.DataFrame, fingerprint=None):
+        """
+        Appends newly ingested rows (e.g. from DataLoader.load_new) and folds them into the rollups
+        and running statistics, without re-aggregating the existing rows. The row-level frame is
+        re-concatenated (a copy, no recomputation) and renumbered from 0.
+
+        The new frame and rollups are built beside the current ones and published together, so tools
+        running meanwhile read either the old data or the new data, never a mix. `fingerprint`
+        identifies the new rows (e.g. DataLoader.last_fingerprint after load_new); by default they are hashed.
+        """
+        if len(new_rows) == 0:
+            return
+
+        with self._lock:
+            current = self._version
+            new_rows = new_rows.assign(date=pd.to_datetime(new_rows['date']))
+            df = concat_aligned([current.df, new_rows], ignore_index=True)
+            # update() reassigns every rollup, so a shallow copy leaves the published cube untouched
+            rollups = copy.copy(current.rollups)
+            rollups.update(df.iloc[len(current.df):])
+
+            # Chain the fingerprints, so cached results for the old data go stale
+            chained = f"{current.fingerprint}+{fingerprint or dataset_fingerprint(new_rows)}"
+            self._version = _DatasetVersion(hashlib.sha1(chained.encode('utf-8')).hexdigest(), df, rollups)
+
+    def refresh_rollups(self):
+        """
+        Rebuilds the materialized rollups from the current data.
+        """
+        with self._lock:
+            current = self._version
+            self._version = _DatasetVersion(current.fingerprint, current.df, RollupCube(current.df))
+
+    def __len__(self):
+        return len(self.df)
+
+class _DatasetVersion:
+    """
+    One published version of a PreparedDataset; never modified after it is published, except for
+    the structures tools cache in `derived`.
+    """
+    __slots__ = ('fingerprint', 'df', 'rollups', 'derived')
+
+    def __init__(self, fingerprint: str, df: pd.DataFrame, rollups: RollupCube):
+        self.fingerprint = fingerprint
+        self.df = df
+        self.rollups = rollups
+        self.derived = {}
+
+def as_frame(data):
+    """
+    Returns the underlying pandas DataFrame of a PreparedDataset, or `data` itself if it already is one.
+    """
+    return data.df if isinstance(data, PreparedDataset) else data
+
+def dataset_fingerprint(data):
+    """
+    A string identifying the content of `data`: the fingerprint of a PreparedDataset, the source
+    fingerprint a DuckDBTable keeps (files, sizes, modification times and load options), Spark's
+    semantic hash of the plan, or for a pandas frame a hash of its rows. A frame's `attrs` are not
+    trusted: pandas copies them onto every subset and projection of the frame.
+    """
+    if isinstance(data, PreparedDataset):
+        return data.fingerprint
+    if is_duckdb_table(data):
+        return f"duckdb-{data.fingerprint}"
+    if is_spark_frame(data):
+        return f"spark-{data.semanticHash()}"
+    return f"rows-{pd.util.hash_pandas_object(data, index=False).sum():x}-{len(data)}"
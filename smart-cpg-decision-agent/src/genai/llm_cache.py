@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from langchain_core.caches import BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+class SQLiteResponseCache(BaseCache):
+    """
+    Exact-match LLM response cache in a SQLite file, shared by every model it is attached to
+    (`llm.cache = ...`, see llm_interface.get_llm).
+
+    LangChain keys a lookup on the serialized messages (`prompt`) and on the model name and
+    parameters (`llm_string`); both are hashed into the entry key. Entries older than `ttl`
+    seconds are ignored and removed, and past `max_entries` the least recently used are evicted.
+
+    The file doubles as a recording of the conversation: `lookup_prompt` finds a response by
+    the messages alone, whatever model produced it, which is what the replay backend uses.
+    """
+    def __init__(self, path: str, ttl=None, max_entries=10_000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, prompt_key TEXT, generations TEXT, created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_prompt ON responses (prompt_key)")
+        self._conn.commit()
+
+    def lookup(self, prompt: str, llm_string: str):
+        return self._lookup("key", _hash(llm_string, prompt))
+
+    def lookup_prompt(self, prompt: str):
+        """
+        The most recent response recorded for `prompt` by any model, or None.
+        """
+        return self._lookup("prompt_key", _hash(prompt))
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (_hash(llm_string, prompt), _hash(prompt), _dump_generations(return_val), now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def _lookup(self, column: str, key: str):
+        with self._lock:
+            if self.ttl is not None:
+                self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+
+            row = self._conn.execute(
+                f"SELECT key, generations FROM responses WHERE {column} = ? ORDER BY created DESC LIMIT 1", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                self._conn.commit()
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), row[0]))
+            self._conn.commit()
+        return _load_generations(row[1])
+
+def _hash(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def _dump_generations(generations) -> str:
+    return json.dumps([
+        {"message": message_to_dict(generation.message)} if isinstance(generation, ChatGeneration) else {"text": generation.text}
+        for generation in generations
+    ])
+
+def _load_generations(payload: str):
+    return [
+        ChatGeneration(message=messages_from_dict([entry["message"]])[0]) if "message" in entry else Generation(text=entry["text"])
+        for entry in json.loads(payload)
+    ]
@@ -1,11 +1,45 @@
 import os
+import threading
+import time
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from src.telemetry import trace_llm
 
-def get_llm():
+# Shared response caches, one per SQLite file, so every agent built by get_llm uses the same connection
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_llm(cache=None, stats=None):
     """
     Returns an instance of an LLM based on environment variables.
     Supports HuggingFace and Google Gemini (Google AI Studio).
     Defaults to a simple mock or HuggingFace if keys are missing.
+
+    LLM_BACKEND selects a local backend instead of a provider:
+    - 'stub': StubChatModel, a deterministic offline agent (LLM_STUB_LATENCY adds simulated seconds per call).
+    - 'replay': replays the responses recorded in the LLM_CACHE_PATH file; unrecorded prompts raise.
+
+    Responses are cached in `cache` (a LangChain BaseCache), or, if LLM_CACHE_PATH is set, in that
+    SQLite file (see SQLiteResponseCache; LLM_CACHE_TTL sets a time-to-live in seconds). Per-call
+    latency is recorded in `stats` (an LLMCallStats, by default the module-wide `call_stats`), and
+    each call is traced in the current turn with its token counts (see src.telemetry).
     """
+    backend = os.getenv("LLM_BACKEND", "").lower()
+    cache = cache if cache is not None else get_response_cache()
+
+    if backend == "replay":
+        from src.genai.stub_llm import ReplayChatModel
+        if cache is None:
+            raise ValueError("LLM_BACKEND=replay needs LLM_CACHE_PATH to point at a recorded response cache.")
+        return _instrument(ReplayChatModel(recordings=cache), None, stats)
+
+    if backend == "stub":
+        from src.genai.stub_llm import StubChatModel
+        return _instrument(StubChatModel(latency=float(os.getenv("LLM_STUB_LATENCY", "0"))), cache, stats)
+
+    return _instrument(_provider_llm(), cache, stats)
+
+def _provider_llm():
     # Check for Google Gemini (Google AI Studio)
     google_api_key = os.getenv("GOOGLE_API_KEY")
     if google_api_key:
@@ -40,4 +74,71 @@ def get_llm():
             print("Please install langchain-openai to use OpenAI.")
 
     # If no keys are found, raise an error or return a mock
-    raise ValueError("No valid LLM API key found in environment variables. Please set GOOGLE_API_KEY, HUGGINGFACEHUB_API_TOKEN, or OPENAI_API_KEY.")
+    raise ValueError("No valid LLM API key found in environment variables. Please set GOOGLE_API_KEY, HUGGINGFACEHUB_API_TOKEN, or OPENAI_API_KEY, or LLM_BACKEND=stub to run offline.")
+
+def get_response_cache():
+    """
+    The SQLiteResponseCache at LLM_CACHE_PATH, or None if it is not set.
+    """
+    path = os.getenv("LLM_CACHE_PATH")
+    if not path:
+        return None
+
+    from src.genai.llm_cache import SQLiteResponseCache
+    ttl = os.getenv("LLM_CACHE_TTL")
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = SQLiteResponseCache(path, ttl=float(ttl) if ttl else None)
+        return _caches[path]
+
+def _instrument(llm, cache, stats):
+    if cache is not None:
+        llm.cache = cache
+    llm.callbacks = [stats if stats is not None else call_stats]
+    # ... and every call is a span of the current turn, with its token counts
+    return trace_llm(llm)
+
+class LLMCallStats(BaseCallbackHandler):
+    """
+    Records the wall time of every LLM call, cache hits included, for latency reports.
+    """
+    def __init__(self):
+        self.latencies = []
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array(self.latencies)
+        if not len(latencies):
+            return {"calls": 0, "mean_s": 0.0, "p50_s": 0.0, "p95_s": 0.0}
+        p50, p95 = np.percentile(latencies, [50, 95])
+        return {"calls": len(latencies), "mean_s": float(latencies.mean()), "p50_s": float(p50), "p95_s": float(p95)}
+
+    def _finish(self, run_id):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            with self._lock:
+                self.latencies.append(time.perf_counter() - started)
+
+# Latency of every call made by an LLM from get_llm, unless given other stats
+call_stats = LLMCallStats()
+
+def llm_metrics():
+    """
+    Per-call latency summary and, if LLM_CACHE_PATH is set, the response cache hit rate.
+    """
+    cache = get_response_cache()
+    return {"latency": call_stats.summary(), "cache": cache.stats() if cache is not None else None}
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import time
+from typing import Any, List
+from pydantic import Field
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Keyword in the user's question -> (tool, input) the stub asks for
+STUB_ROUTES = [
+    ('spike', ('SalesSpikes', '2.0')),
+    ('run out', ('ProjectedStockouts', '14')),
+    ('forecast', ('DemandForecast', '14')),
+    ('stock', ('StockShortages', '50')),
+    ('promotion', ('FailedPromotions', '')),
+    ('store', ('StorePerformance', 'revenue')),
+    ('season', ('SeasonalityAnalysis', 'all')),
+    ('price', ('SimulatePriceChange', '101,0.1,-1.5')),
+]
+DEFAULT_ROUTE = ('CategoryTrends', 'W')
+
+# A composite question ("health check") asks for all of these, one after another or in one plan
+HEALTH_CHECK_ROUTES = [
+    ('CategoryTrends', 'W'),
+    ('SeasonalityAnalysis', 'all'),
+    ('SalesSpikes', '2.0'),
+    ('StockShortages', '50'),
+    ('FailedPromotions', ''),
+]
+
+def stub_routes(question: str):
+    """
+    The (tool, input) calls the stub makes for `question`, in order.
+    """
+    question = question.lower()
+    if 'health' in question:
+        return HEALTH_CHECK_ROUTES
+    return [next((route for keyword, route in STUB_ROUTES if keyword in question), DEFAULT_ROUTE)]
+
+class StubChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for tests and benchmarks; no network and no API key.
+
+    It speaks the conversational ReAct format: on a new question it calls one tool picked by a
+    keyword in the question (see STUB_ROUTES), or each of HEALTH_CHECK_ROUTES in turn for a
+    health check, and once it has seen their responses it gives a final answer quoting the first
+    line of the last one. Asked for a plan (see planner.PlannerAgent) it returns the same calls as
+    one JSON list, and given the plan's results it answers quoting the first line of each.
+    `latency` seconds of simulated model time are spent per call, sleeping in the sync path and
+    awaiting in the async one.
+
+    `prompt_tokens` records the estimated size of every prompt it receives (4 characters a token);
+    each response reports it, and its own size, as its token usage.
+    """
+    latency: float = 0.0
+    prompt_tokens: List[int] = Field(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    @property
+    def _identifying_params(self):
+        return {"latency": self.latency}
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
+
+    def _respond(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt_tokens = sum(len(str(message.content)) for message in messages) // 4
+        self.prompt_tokens.append(prompt_tokens)
+
+        last = str(messages[-1].content)
+        if "JSON list of tool calls" in str(messages[0].content):
+            plan = [{"tool": tool, "input": tool_input} for tool, tool_input in stub_routes(last)]
+            return _chat_result(f"```json\n{json.dumps(plan)}\n```", prompt_tokens)
+        if last.startswith("TOOL RESULTS"):
+            # One "### Tool(input)" header per result, followed by the result
+            firsts = [(section.split("\n") + [""])[1].strip() for section in last.split("\n### ")[1:]]
+            return _chat_result(f"Based on the data: {'; '.join(firsts) or 'no results'}", prompt_tokens)
+
+        # The question is the last user message; the tool responses of this turn follow it
+        turn = max(i for i, message in enumerate(messages)
+                   if isinstance(message, HumanMessage) and not str(message.content).startswith("TOOL RESPONSE"))
+        routes = stub_routes(str(messages[turn].content).rsplit("USER'S INPUT", 1)[-1])
+        responses = sum(str(message.content).startswith("TOOL RESPONSE") for message in messages[turn + 1:])
+        if responses < len(routes):
+            action = routes[responses]
+        else:
+            observation = last.split("---------------------\n", 1)[-1].strip().splitlines()
+            action = ("Final Answer", f"Based on the data: {observation[0] if observation else 'no results'}")
+
+        blob = json.dumps({"action": action[0], "action_input": action[1]})
+        return _chat_result(f"```json\n{blob}\n```", prompt_tokens)
+
+def _chat_result(content: str, prompt_tokens: int) -> ChatResult:
+    # Reported like a provider's usage, so token accounting works offline
+    usage = {"input_tokens": prompt_tokens, "output_tokens": len(content) // 4, "total_tokens": prompt_tokens + len(content) // 4}
+    return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content, usage_metadata=usage))])
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Replays the responses recorded in an SQLiteResponseCache (`recordings`), so a session
+    recorded once against a real provider can be rerun offline for regression and latency
+    benchmarks. Responses are matched on the exact messages; an unrecorded prompt raises.
+    """
+    recordings: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        generations = self.recordings.lookup_prompt(dumps(messages))
+        if generations is None:
+            raise ValueError(f"No recorded response for this prompt in {self.recordings.path}.")
+        return ChatResult(generations=generations)
@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+from src.calendar_keys import calendar_keys
+
+# The per-series key of the anomaly tools
+SERIES_KEYS = ['sku_id', 'store_id']
+
+class RollupCube:
+    """
+    Materialized aggregates of the row-level sales data that the trend and store tools answer from.
+
+    - `daily_category`: units and revenue per (date, category), with the week/month/quarter keys
+      of each day precomputed. Coarser trends and the monthly seasonality are re-aggregated from it.
+    - `stores`: units and revenue per (store_id, store_region).
+    - `sku_stats` / `category_stats`: sufficient statistics for the what-if simulations, indexed by
+      sku_id / category (row count, units, revenue, price sum and count, promo/non-promo splits).
+    - `series_stats`: running units statistics per (sku_id, store_id) for the anomaly tools (see
+      series_stats), with `series_codes` mapping every row to its position in `series_stats`.
+    - `promo_baselines`: the non-promo mean units of each series, overall and on regular/holiday
+      days, in `series_stats` order, so a row's baseline is a gather by its series code.
+
+    All but `series_codes` are tiny compared to the raw rows, so queries cost the same regardless of
+    the history size. Call `refresh` after the underlying data changes, or `update` with appended rows.
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.refresh(df)
+
+    def refresh(self, df: pd.DataFrame):
+        """
+        Rebuilds every rollup from the row-level frame (with a parsed `date` column).
+        """
+        daily_category = df.groupby(['date', 'category'], observed=True).agg(
+            total_units_sold=('units_sold', 'sum'),
+            total_revenue=('revenue', 'sum')
+        ).reset_index()
+        self.daily_category = daily_category.assign(**calendar_keys(daily_category['date']))
+
+        self.stores = df.groupby(['store_id', 'store_region'], observed=True).agg(
+            total_revenue=('revenue', 'sum'),
+            total_units_sold=('units_sold', 'sum')
+        ).reset_index()
+
+        self.sku_stats = sufficient_stats(df, 'sku_id')
+        self.category_stats = sufficient_stats(df, 'category')
+
+        self.series_stats = series_stats(df)
+        self.series_codes = series_codes(df, self.series_stats)
+        self.promo_baselines = promo_baselines(self.series_stats)
+
+        self.source_rows = len(df)
+
+    def update(self, new_rows: pd.DataFrame):
+        """
+        Folds rows appended to the data (with a parsed `date` column) into every rollup. Only the new
+        rows are aggregated; the result is the same as a `refresh` over the old and new rows together,
+        except that series first seen in `new_rows` are appended after the existing ones in `series_stats`.
+        """
+        daily_category = new_rows.groupby(['date', 'category'], observed=True).agg(
+            total_units_sold=('units_sold', 'sum'),
+            total_revenue=('revenue', 'sum')
+        ).reset_index()
+        daily_category = _add_sums(self.daily_category[daily_category.columns], daily_category, ['date', 'category'])
+        self.daily_category = daily_category.assign(**calendar_keys(daily_category['date']))
+
+        stores = new_rows.groupby(['store_id', 'store_region'], observed=True).agg(
+            total_revenue=('revenue', 'sum'),
+            total_units_sold=('units_sold', 'sum')
+        ).reset_index()
+        self.stores = _add_sums(self.stores, stores, ['store_id', 'store_region'])
+
+        self.sku_stats = _add_sums(self.sku_stats, sufficient_stats(new_rows, 'sku_id'))
+        self.category_stats = _add_sums(self.category_stats, sufficient_stats(new_rows, 'category'))
+
+        self.series_stats = merge_series_stats(self.series_stats, series_stats(new_rows))
+        self.series_codes = np.concatenate([self.series_codes, series_codes(new_rows, self.series_stats)])
+        self.promo_baselines = promo_baselines(self.series_stats)
+
+        self.source_rows += len(new_rows)
+
+def sufficient_stats(df: pd.DataFrame, key: str):
+    """
+    Per-`key` sums the simulations need, indexed by `key` for O(1) lookups.
+    Mean price is price_sum / price_count, matching Series.mean (which skips missing prices).
+    """
+    promo = df['promo_flag'] == 1
+    non_promo = df['promo_flag'] == 0
+    units = df['units_sold'].astype('float64')
+    revenue = df['revenue'].astype('float64')
+
+    parts = pd.DataFrame({
+        key: df[key],
+        'rows': 1,
+        'units_sold': units,
+        'revenue': revenue,
+        'price_sum': df['price'].astype('float64'),
+        'price_count': df['price'].notna().astype('int64'),
+        'promo_units': units.where(promo, 0.0),
+        'promo_revenue': revenue.where(promo, 0.0),
+        'non_promo_units': units.where(non_promo, 0.0),
+        'non_promo_revenue': revenue.where(non_promo, 0.0),
+    })
+    return parts.groupby(key, observed=True).sum()
+
+def series_stats(df: pd.DataFrame):
+    """
+    Units statistics per (sku_id, store_id), indexed by the pair: the count, mean and sum of
+    squared deviations (`m2`) of units sold, which give the spike limits, and the count and sum of
+    units on non-promo days, which give the promotion baselines (with a `holiday_flag` column, also
+    their holiday-day share). All merge exactly across batches (see merge_series_stats).
+    """
+    units = df['units_sold'].astype('float64')
+    non_promo = df['promo_flag'] == 0
+
+    parts = {
+        'units': units,
+        'non_promo_units': units.where(non_promo),
+    }
+    if 'holiday_flag' in df.columns:
+        parts['non_promo_holiday_units'] = units.where(non_promo & (df['holiday_flag'] == 1))
+    grouped = pd.DataFrame(parts).groupby([df[key] for key in SERIES_KEYS], observed=True)
+
+    n = grouped['units'].count()
+    stats = pd.DataFrame({
+        'n': n,
+        'mean': grouped['units'].mean(),
+        'm2': grouped['units'].var(ddof=0) * n,
+        'non_promo_n': grouped['non_promo_units'].count(),
+        'non_promo_units': grouped['non_promo_units'].sum(),
+    })
+    if 'non_promo_holiday_units' in parts:
+        stats['non_promo_holiday_n'] = grouped['non_promo_holiday_units'].count()
+        stats['non_promo_holiday_units'] = grouped['non_promo_holiday_units'].sum()
+    stats.index.names = SERIES_KEYS
+    return stats
+
+def merge_series_stats(old: pd.DataFrame, new: pd.DataFrame):
+    """
+    Combines the series statistics of two batches of rows (Chan et al.'s parallel update of the
+    mean and m2). Existing series keep their positions; series only in `new` are appended.
+    """
+    index = old.index.append(new.index.difference(old.index))
+    a = old.reindex(index).fillna(0.0)
+    b = new.reindex(index).fillna(0.0)
+
+    n = a['n'] + b['n']
+    safe_n = n.where(n > 0, 1.0)
+    delta = b['mean'] - a['mean']
+    merged = pd.DataFrame({
+        'n': n,
+        'mean': (a['mean'] + delta * b['n'] / safe_n).where(n > 0),
+        'm2': a['m2'] + b['m2'] + delta ** 2 * a['n'] * b['n'] / safe_n,
+    }, index=index)
+    # The remaining columns are plain counts and sums
+    for column in old.columns.drop(['n', 'mean', 'm2']):
+        merged[column] = a[column] + b[column]
+    return merged
+
+def series_codes(df: pd.DataFrame, stats: pd.DataFrame):
+    """
+    The position of every row's series in `stats` (int32, -1 for a series it does not contain).
+    """
+    return stats.index.get_indexer(_series_index(df)).astype('int32')
+
+def promo_baselines(stats: pd.DataFrame):
+    """
+    Non-promo mean units per series, in `stats` order: `all` non-promo days, and, when the stats have
+    the holiday split, `regular` and `holiday` days alone. NaN where a series has no such days.
+    """
+    def mean(units, n):
+        return units / n.where(n > 0)
+
+    baselines = pd.DataFrame({'all': mean(stats['non_promo_units'], stats['non_promo_n'])})
+    if 'non_promo_holiday_n' in stats.columns:
+        holiday_n, holiday_units = stats['non_promo_holiday_n'], stats['non_promo_holiday_units']
+        baselines['regular'] = mean(stats['non_promo_units'] - holiday_units, stats['non_promo_n'] - holiday_n)
+        baselines['holiday'] = mean(holiday_units, holiday_n)
+    return baselines
+
+def series_std(stats: pd.DataFrame):
+    """
+    Sample standard deviation of units per series (NaN below two observations, like Series.std).
+    """
+    return np.sqrt(stats['m2'] / (stats['n'] - 1)).where(stats['n'] > 1)
+
+def _series_index(df: pd.DataFrame):
+    return pd.MultiIndex.from_arrays([df[key] for key in SERIES_KEYS])
+
+def _add_sums(old: pd.DataFrame, new: pd.DataFrame, keys=None):
+    """
+    Adds two aggregates of summable columns, either keyed by `keys` columns or by their index.
+    """
+    if keys is None:
+        return concat_aligned([old, new]).groupby(level=0, observed=True).sum()
+    return concat_aligned([old, new], ignore_index=True).groupby(keys, observed=True).sum().reset_index()
+
+def concat_aligned(frames, **kwargs):
+    """
+    pd.concat that keeps categorical columns (and a categorical index) categorical: frames whose
+    categories differ are first cast to the union of their categories, in order of appearance.
+    """
+    def union(parts):
+        if not all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            return None
+        categories = pd.Index([]).append([part.dtype.categories for part in parts]).unique()
+        return pd.CategoricalDtype(categories)
+
+    frames = list(frames)
+    for column in frames[0].columns:
+        dtype = union([frame[column] for frame in frames])
+        if dtype is not None:
+            frames = [frame.assign(**{column: frame[column].astype(dtype)}) for frame in frames]
+
+    dtype = union([frame.index for frame in frames])
+    if dtype is not None and not kwargs.get('ignore_index'):
+        frames = [frame.set_axis(frame.index.astype(dtype)) for frame in frames]
+
+    return pd.concat(frames, **kwargs)
@@ -0,0 +1,259 @@
+"""
+Synthetic CPG sales data at any scale, with the 13 columns of the production data.
+
+One row per (date, store, SKU). Demand follows a per-store and per-SKU base level, a weekly
+pattern, a yearly season per category, holidays and promotion lifts (a Discount also lowers the
+price), and anomalies are injected at configurable rates: sales spikes, stock-outs and failed
+promotions. Every day is drawn from its own random stream, seeded by `seed` and the date, so the
+data is the same however the days are split into chunks, and chunks can be generated in parallel.
+
+    python -m src.synthetic data/cpg_sales --stores 1000 --skus 1000 --days 100 --workers 8
+    python -m src.synthetic data/cpg_sales_data.parquet --stores 50 --skus 200 --days 730
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+CATEGORIES = ['Beverages', 'Snacks', 'Dairy', 'Bakery', 'Frozen', 'Household', 'Personal Care', 'Produce']
+REGIONS = ['North', 'South', 'East', 'West']
+PROMO_TYPES = ['Discount', 'BOGO', 'Display']
+STORE_SIZES = ['Small', 'Medium', 'Large']
+
+# Demand multipliers: promotion lift by type (as in PROMO_TYPES), store size, holiday and day of week (Monday first)
+PROMO_LIFT = np.array([0.4, 0.8, 0.25])
+STORE_SIZE_SCALE = np.array([0.6, 1.0, 1.5])
+HOLIDAY_LIFT = 0.25
+WEEKDAY_SCALE = np.array([0.9, 0.9, 0.95, 1.0, 1.1, 1.25, 1.15])
+# Price cut of a Discount promotion, and the demand a failed promotion keeps
+DISCOUNT_DEPTH = 0.2
+FAILED_PROMO_SCALE = 0.4
+
+# Label of each injected anomaly in the optional `injected_anomaly` column
+ANOMALY_LABELS = ['', 'spike', 'stockout', 'failed_promo']
+
+# Rows generated at once when writing; each chunk is one row group per partition file
+CHUNK_ROWS = 5_000_000
+
+class SalesCatalog:
+    """
+    The static side of the synthetic data, drawn once from `seed`: each SKU's category, price and
+    demand level, and each store's region and size.
+    """
+    def __init__(self, n_stores, n_skus, seed=42):
+        rng = np.random.default_rng([seed, 0])
+        self.n_stores = n_stores
+        self.n_skus = n_skus
+        self.seed = seed
+        self.sku_category = rng.integers(0, len(CATEGORIES), n_skus)
+        self.sku_price = rng.uniform(1.0, 20.0, n_skus).round(2)
+        self.store_region = rng.integers(0, len(REGIONS), n_stores)
+        self.store_size = rng.integers(0, len(STORE_SIZES), n_stores)
+        # Expected units per day of each (store, SKU) outside promotions, holidays and seasons
+        sku_level = rng.lognormal(0.0, 0.5, n_skus)
+        self.base_demand = 20 * np.outer(STORE_SIZE_SCALE[self.store_size], sku_level / sku_level.mean())
+        self.season_amplitude = rng.uniform(0.0, 0.3, len(CATEGORIES))
+        self.season_phase = rng.uniform(0.0, 2 * np.pi, len(CATEGORIES))
+
+def generate_sales_frame(n_stores=50, n_skus=200, n_days=365, seed=42, start='2022-01-01', promo_rate=0.1,
+                         spike_rate=0.001, stockout_rate=0.002, failed_promo_rate=0.05, labels=False):
+    """
+    The synthetic sales of `n_stores` x `n_skus` over `n_days` days from `start`, as a pandas frame
+    in date, store, SKU order. A `promo_rate` share of the rows is on promotion; `spike_rate` of the
+    rows are sales spikes (4-6x the units), `stockout_rate` run out of stock (inventory below 5 and
+    the units capped by it) and `failed_promo_rate` of the promotions sell well below the baseline.
+    With `labels`, an `injected_anomaly` column names the anomaly injected into each row.
+    """
+    catalog = SalesCatalog(n_stores, n_skus, seed)
+    dates = pd.date_range(start, periods=n_days, freq='D')
+    rates = dict(promo_rate=promo_rate, spike_rate=spike_rate, stockout_rate=stockout_rate, failed_promo_rate=failed_promo_rate)
+    # Through arrow, which builds the string columns from their codes far faster than pandas does
+    return _chunk_table(catalog, dates, rates, labels).to_pandas()
+
+def write_sales_dataset(path: str, n_stores=50, n_skus=200, n_days=365, seed=42, start='2022-01-01',
+                        partition_cols=('category', 'year_month'), workers=None, chunk_rows=CHUNK_ROWS, **rates):
+    """
+    Writes the data of generate_sales_frame (same arguments and rates) to `path` without holding it
+    in memory: a hive-partitioned parquet directory as write_partitioned_dataset lays it out, or,
+    with no `partition_cols`, a single parquet file. Days are generated in chunks of about
+    `chunk_rows` rows that never span a month; for a directory, `workers` processes (default: one
+    per CPU) generate and write the chunks in parallel. Returns the number of rows written.
+    """
+    catalog = SalesCatalog(n_stores, n_skus, seed)
+    dates = pd.date_range(start, periods=n_days, freq='D')
+    chunks = _day_chunks(dates, max(1, chunk_rows // (n_stores * n_skus)))
+
+    if not partition_cols:
+        import pyarrow.parquet as pq
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        writer = None
+        try:
+            for chunk in chunks:
+                table = _chunk_table(catalog, chunk, rates)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return len(dates) * n_stores * n_skus
+
+    os.makedirs(path, exist_ok=True)
+    jobs = [(catalog, chunk, rates, path, list(partition_cols), i) for i, chunk in enumerate(chunks)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) == 1:
+        rows = [_write_chunk(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            rows = list(executor.map(_write_chunk, *zip(*jobs)))
+    return sum(rows)
+
+def _day_chunks(dates: pd.DatetimeIndex, max_days: int):
+    """
+    Splits `dates` into runs of at most `max_days` consecutive days within one calendar month.
+    """
+    months = dates.year * 12 + dates.month
+    boundaries = np.flatnonzero(np.diff(months)) + 1
+    chunks = []
+    for month in np.split(np.arange(len(dates)), boundaries):
+        chunks.extend(dates[month[i:i + max_days]] for i in range(0, len(month), max_days))
+    return chunks
+
+def _write_chunk(catalog, dates, rates, path, partition_cols, chunk_id):
+    import pyarrow.dataset as pads
+
+    table = _chunk_table(catalog, dates, rates)
+    if 'year_month' in partition_cols:
+        table = table.append_column('year_month', _repeat_labels(dates.strftime('%Y-%m'), catalog.n_stores * catalog.n_skus))
+    pads.write_dataset(
+        table, path, format='parquet', partitioning=partition_cols, partitioning_flavor='hive',
+        basename_template=f"part-{chunk_id:05d}-{{i}}.parquet", existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=len(table)
+    )
+    return len(table)
+
+def _chunk_table(catalog, dates, rates, labels=False):
+    """
+    The rows of `dates` as a pyarrow table with plain string columns, built from codes without
+    formatting a string per row.
+    """
+    import pyarrow as pa
+
+    columns = _generate_days(catalog, dates, **rates)
+    n_days, per_day = len(dates), catalog.n_stores * catalog.n_skus
+    store_codes = np.tile(np.repeat(np.arange(catalog.n_stores, dtype=np.int32), catalog.n_skus), n_days)
+    sku_codes = np.tile(np.arange(catalog.n_skus, dtype=np.int32), catalog.n_stores * n_days)
+    table = pa.table({
+        'date': _repeat_labels(dates.strftime('%Y-%m-%d'), per_day),
+        'store_id': store_codes + 1,
+        'store_region': _decode(REGIONS, catalog.store_region[store_codes]),
+        'sku_id': sku_codes + 101,
+        'category': _decode(CATEGORIES, catalog.sku_category[sku_codes]),
+        'units_sold': columns['units_sold'],
+        'revenue': columns['revenue'],
+        'promo_flag': columns['promo_flag'],
+        'promo_type': _decode(['None', *PROMO_TYPES], columns['promo_code']),
+        'price': columns['price'],
+        'inventory_level': columns['inventory_level'],
+        'store_size': _decode(STORE_SIZES, catalog.store_size[store_codes]),
+        'holiday_flag': np.repeat(columns['day_holiday'], per_day),
+    })
+    if labels:
+        table = table.append_column('injected_anomaly', _decode(ANOMALY_LABELS, columns['anomaly']))
+    return table
+
+def _decode(labels, codes):
+    import pyarrow as pa
+
+    return pa.DictionaryArray.from_arrays(pa.array(codes.astype(np.int32)), pa.array(labels)).cast(pa.string())
+
+def _repeat_labels(labels, times):
+    return _decode(list(labels), np.repeat(np.arange(len(labels)), times))
+
+def _generate_days(catalog, dates, promo_rate=0.1, spike_rate=0.001, stockout_rate=0.002, failed_promo_rate=0.05):
+    """
+    The random columns of every row of `dates`, each day drawn from its own stream (seed, date).
+    """
+    per_day = catalog.n_stores * catalog.n_skus
+    n_rows = len(dates) * per_day
+    units = np.empty(n_rows, dtype=np.int32)
+    price = np.empty(n_rows)
+    promo_code = np.empty(n_rows, dtype=np.int8)
+    inventory = np.empty(n_rows, dtype=np.int32)
+    anomaly = np.empty(n_rows, dtype=np.int8)
+    # The holiday flag of the original generator: two days every 91 days of the year
+    day_holiday = np.isin(dates.dayofyear % 91, [0, 1]).astype(np.int8)
+
+    season = 2 * np.pi * dates.dayofyear.to_numpy() / 365.25
+    for day, date in enumerate(dates):
+        rng = np.random.default_rng([catalog.seed, 1, date.toordinal()])
+        rows = slice(day * per_day, (day + 1) * per_day)
+
+        category_scale = 1 + catalog.season_amplitude * np.sin(season[day] + catalog.season_phase)
+        day_scale = WEEKDAY_SCALE[date.dayofweek] * (1 + HOLIDAY_LIFT * day_holiday[day])
+        expected = (catalog.base_demand * (day_scale * category_scale[catalog.sku_category])).ravel()
+
+        draws = rng.random((4, per_day), dtype=np.float32)
+        promo = draws[0] < promo_rate
+        promo_type = rng.integers(0, len(PROMO_TYPES), per_day)
+        failed = promo & (draws[1] < failed_promo_rate)
+        expected = np.where(promo, expected * (1 + PROMO_LIFT[promo_type]), expected)
+        expected[failed] *= FAILED_PROMO_SCALE / (1 + PROMO_LIFT[promo_type[failed]])
+        day_units = rng.poisson(expected)
+
+        spikes = draws[2] < spike_rate
+        day_units[spikes] *= rng.integers(4, 7, spikes.sum())
+        day_inventory = rng.integers(0, 1000, per_day)
+        stockouts = draws[3] < stockout_rate
+        day_inventory[stockouts] = rng.integers(0, 5, stockouts.sum())
+        day_units[stockouts] = np.minimum(day_units[stockouts], day_inventory[stockouts])
+
+        day_price = np.tile(catalog.sku_price, catalog.n_stores)
+        price[rows] = np.where(promo & (promo_type == 0), (day_price * (1 - DISCOUNT_DEPTH)).round(2), day_price)
+        units[rows] = day_units
+        promo_code[rows] = np.where(promo, promo_type + 1, 0)
+        inventory[rows] = day_inventory
+        anomaly[rows] = np.select([stockouts, spikes, failed], [2, 1, 3], 0)
+
+    return {
+        'units_sold': units,
+        'revenue': (units * price).round(2),
+        'promo_flag': (promo_code > 0).astype(np.int8),
+        'promo_code': promo_code,
+        'price': price,
+        'inventory_level': inventory,
+        'anomaly': anomaly,
+        'day_holiday': day_holiday,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic CPG sales data as partitioned parquet (or one file ending in .parquet).")
+    parser.add_argument("path", type=str)
+    parser.add_argument("--stores", type=int, default=50)
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--start", type=str, default='2022-01-01')
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--promo_rate", type=float, default=0.1)
+    parser.add_argument("--spike_rate", type=float, default=0.001)
+    parser.add_argument("--stockout_rate", type=float, default=0.002)
+    parser.add_argument("--failed_promo_rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = write_sales_dataset(
+        args.path, args.stores, args.skus, args.days, seed=args.seed, start=args.start,
+        partition_cols=() if args.path.endswith('.parquet') else ('category', 'year_month'), workers=args.workers,
+        promo_rate=args.promo_rate, spike_rate=args.spike_rate, stockout_rate=args.stockout_rate,
+        failed_promo_rate=args.failed_promo_rate
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {rows:,} rows to {args.path} in {elapsed:.1f}s ({rows / elapsed / 1e6:.1f}M rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+import pandas as pd
+from langchain_core.callbacks import BaseCallbackHandler
+from src.dataset import PreparedDataset
+
+# The turn being answered and the tool span in progress; asyncio tasks, LangChain callbacks and the
+# tool pools (which submit through contextvars.copy_context) all see the values of the caller
+_current_turn = contextvars.ContextVar("cpg_turn", default=None)
+_current_span = contextvars.ContextVar("cpg_span", default=None)
+
+# Tool spans in progress while tracemalloc is on; the peak is only reset when none is running
+_memory_lock = threading.Lock()
+_memory_spans = 0
+
+class Span:
+    """
+    One timed tool or LLM call, in the shape of an OpenTelemetry span: `attributes` holds the
+    measurements (dataset rows, result size, memory, tokens, ...).
+    """
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id=None, **attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+        self._started = time.perf_counter()
+
+    def finish(self, error=None):
+        self.end_ns = time.time_ns()
+        self.attributes['duration_s'] = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_s(self):
+        return self.attributes.get('duration_s', 0.0)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": {key: value for key, value in self.attributes.items() if value is not None},
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+class Turn:
+    """
+    The spans of one conversation turn: a root span for the question and a child span for every
+    tool and LLM call made to answer it, from any thread.
+    """
+    def __init__(self, query: str, session_id=None):
+        self.root = Span("turn", "turn", secrets.token_hex(16), session_id=None if session_id is None else str(session_id), query=query[:200])
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, kind: str, **attributes):
+        return Span(name, kind, self.root.trace_id, self.root.span_id, **attributes)
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """
+        The turn's totals: wall time, LLM calls, time and tokens, tool calls, time, cache hits, the
+        dataset rows of the computed calls and the largest peak memory delta. Tool time adds up calls
+        that ran concurrently; dataset rows add up the size of the data each call was given, not the
+        rows it read (a tool answering from the rollups reads far fewer).
+        """
+        with self._lock:
+            spans = list(self.spans)
+        llm = [span.attributes for span in spans if span.kind == 'llm']
+        tools = [span.attributes for span in spans if span.kind == 'tool']
+        return {
+            "trace_id": self.root.trace_id,
+            "session_id": self.root.attributes['session_id'],
+            "query": self.root.attributes['query'],
+            "wall_s": self.root.duration_s,
+            "llm_calls": len(llm),
+            "llm_s": sum(attributes['duration_s'] for attributes in llm),
+            "prompt_tokens": sum(attributes.get('prompt_tokens') or 0 for attributes in llm),
+            "completion_tokens": sum(attributes.get('completion_tokens') or 0 for attributes in llm),
+            "tool_calls": len(tools),
+            "tool_s": sum(attributes['duration_s'] for attributes in tools),
+            "cache_hits": sum(bool(attributes.get('cache_hit')) for attributes in tools),
+            "dataset_rows": sum(attributes.get('dataset_rows') or 0 for attributes in tools),
+            "peak_memory_bytes": max((attributes.get('peak_memory_bytes') or 0 for attributes in tools), default=0),
+            "errors": sum(span.error is not None for span in spans) + (self.root.error is not None),
+        }
+
+    def span_rows(self) -> pd.DataFrame:
+        """
+        One row per tool and LLM call in start order, for a timing table.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_ns)
+        return pd.DataFrame([
+            {"kind": span.kind, "name": span.name, "start_s": (span.start_ns - self.root.start_ns) / 1e9, **span.attributes, "error": span.error}
+            for span in spans
+        ])
+
+class Telemetry:
+    """
+    Collects the spans of every conversation turn answered under `turn()` and keeps the last
+    `max_turns` for a timing panel or a profile printout. With `path`, each finished turn is
+    appended to that file as JSON lines, one OpenTelemetry-style span per line (the turn first).
+
+    Spans come from the tools wrapped by trace_tool and the LLMs instrumented with trace_llm;
+    they attach to the turn of the context they run in, so concurrent sessions stay apart.
+    """
+    def __init__(self, path=None, max_turns=200):
+        self.path = path
+        self.turns = deque(maxlen=max_turns)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def turn(self, query: str, session_id=None):
+        turn = Turn(query, session_id)
+        token = _current_turn.set(turn)
+        error = None
+        try:
+            yield turn
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_turn.reset(token)
+            turn.root.finish(error)
+            turn.root.attributes.update({key: value for key, value in turn.summary().items() if key not in turn.root.attributes and key not in ('trace_id', 'wall_s')})
+            self._record(turn)
+
+    def last_turn(self, session_id=None):
+        """
+        The latest finished turn, of `session_id` if given, or None.
+        """
+        with self._lock:
+            turns = list(self.turns)
+        session_id = None if session_id is None else str(session_id)
+        return next((turn for turn in reversed(turns) if session_id is None or turn.root.attributes['session_id'] == session_id), None)
+
+    def hot_spots(self) -> pd.DataFrame:
+        """
+        Calls, total, mean and max seconds of every tool and LLM over the kept turns, slowest total first.
+        """
+        with self._lock:
+            turns = list(self.turns)
+        rows = [{"kind": span.kind, "name": span.name, "seconds": span.duration_s} for turn in turns for span in turn.spans]
+        if not rows:
+            return pd.DataFrame(columns=['kind', 'name', 'calls', 'total_s', 'mean_s', 'max_s'])
+        return (
+            pd.DataFrame(rows)
+            .groupby(['kind', 'name'])['seconds']
+            .agg(calls='count', total_s='sum', mean_s='mean', max_s='max')
+            .reset_index()
+            .sort_values('total_s', ascending=False, ignore_index=True)
+        )
+
+    def _record(self, turn: Turn):
+        with self._lock:
+            self.turns.append(turn)
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, 'a') as f:
+                    for span in [turn.root, *sorted(turn.spans, key=lambda span: span.start_ns)]:
+                        f.write(json.dumps(span.to_dict(), default=str) + "\n")
+
+# Process-wide collector used by the agent runners; CPG_TRACE_FILE names a JSON lines file to append spans to
+telemetry = Telemetry(path=os.getenv("CPG_TRACE_FILE"))
+
+def trace_memory(enabled=True):
+    """
+    Turns the per-tool peak memory measurement (tracemalloc) on or off. It slows down allocation
+    heavy tools, so it is off unless profiling. Tool calls that run concurrently share one peak.
+    """
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def trace_tool(tool_name: str, func, cached=True):
+    """
+    Returns the agent tool function `func` recording a span per call in the current turn: wall time,
+    input, the size of what the agent was handed, an error, and with trace_memory the peak memory
+    allocated above the level at the start of the call. Calls outside a turn are not recorded.
+
+    `cached` says `func` is served from a result cache around a trace_scan: a call is then counted
+    as a cache hit unless trace_scan records that the tool ran.
+    """
+    def traced(tool_input):
+        turn = _current_turn.get()
+        if turn is None:
+            return func(tool_input)
+
+        span = turn.start_span(tool_name, "tool", input=str(tool_input)[:200], cache_hit=cached)
+        token = _current_span.set(span)
+        memory_start = _start_memory()
+        error = None
+        try:
+            result = func(tool_input)
+            span.attributes['output_chars'] = len(str(result))
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            span.attributes['peak_memory_bytes'] = _stop_memory(memory_start)
+            _current_span.reset(token)
+            span.finish(error)
+            turn.add(span)
+
+    return traced
+
+def trace_scan(func, data):
+    """
+    Returns the tool computation `func` (under the result cache) recording on the current tool span
+    that it ran rather than being served from the cache, the rows of the dataset `data` it was given
+    (in-memory data only; DuckDB and Spark count on their side) and the rows and bytes of its raw
+    result. The dataset rows are the size of the input, not what the tool read from it.
+    """
+    def traced(tool_input):
+        span = _current_span.get()
+        result = func(tool_input)
+        if span is not None:
+            span.attributes.update(cache_hit=False, dataset_rows=_rows(data), **_result_size(result))
+        return result
+
+    return traced
+
+def trace_llm(llm):
+    """
+    Adds the span recorder to `llm`'s callbacks (once), so its calls are timed and their tokens counted.
+    """
+    callbacks = list(llm.callbacks or [])
+    if llm_spans not in callbacks:
+        llm.callbacks = [*callbacks, llm_spans]
+    return llm
+
+class LLMSpanRecorder(BaseCallbackHandler):
+    """
+    Records a span per LLM call in the current turn, with its prompt and completion tokens: those
+    the provider reports, or an estimate from the text (4 characters a token) if it reports none.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, serialized, sum(len(str(message.content)) for batch in messages for message in batch))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, serialized, sum(len(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        entry = self._pop(run_id)
+        if entry is None:
+            return
+        turn, span = entry
+        prompt_tokens, completion_tokens = _reported_tokens(response)
+        if prompt_tokens is None:
+            text = "".join(generation.text for generations in response.generations for generation in generations)
+            prompt_tokens, completion_tokens = span.attributes.pop('prompt_chars') // 4, len(text) // 4
+            span.attributes['tokens_estimated'] = True
+        span.attributes.pop('prompt_chars', None)
+        span.attributes.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        span.finish()
+        turn.add(span)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        entry = self._pop(run_id)
+        if entry is not None:
+            turn, span = entry
+            span.attributes.pop('prompt_chars', None)
+            span.finish(error)
+            turn.add(span)
+
+    def _start(self, run_id, serialized, prompt_chars):
+        turn = _current_turn.get()
+        if turn is None:
+            return
+        span = turn.start_span((serialized or {}).get('name') or "llm", "llm", prompt_chars=prompt_chars)
+        with self._lock:
+            self._spans[run_id] = (turn, span)
+
+    def _pop(self, run_id):
+        with self._lock:
+            return self._spans.pop(run_id, None)
+
+# Stateless apart from calls in flight, so one recorder serves every LLM
+llm_spans = LLMSpanRecorder()
+
+def format_turn(turn: Turn) -> str:
+    """
+    A plain-text profile of `turn`: its totals and a line per tool and LLM call.
+    """
+    summary = turn.summary()
+    lines = [
+        f"Turn {summary['wall_s']:.3f}s: {summary['llm_calls']} LLM calls {summary['llm_s']:.3f}s "
+        f"({summary['prompt_tokens']:,} prompt / {summary['completion_tokens']:,} completion tokens), "
+        f"{summary['tool_calls']} tool calls {summary['tool_s']:.3f}s ({summary['cache_hits']} cached, "
+        f"{summary['dataset_rows']:,} dataset rows, peak +{summary['peak_memory_bytes'] / 2**20:.1f} MiB)"
+    ]
+    for span in sorted(turn.spans, key=lambda span: span.start_ns):
+        attributes = span.attributes
+        if span.kind == 'llm':
+            name, detail = span.name, f"{attributes.get('prompt_tokens', 0):,} -> {attributes.get('completion_tokens', 0):,} tokens"
+        else:
+            name = f"{span.name}({attributes['input']})"
+            if span.error:
+                detail = ""
+            elif attributes['cache_hit']:
+                detail = "cached"
+            else:
+                dataset = f"{attributes['dataset_rows']:,} dataset rows -> " if attributes.get('dataset_rows') is not None else ""
+                result = f"{attributes['result_rows']:,} rows" if 'result_rows' in attributes else f"{attributes.get('output_chars', 0):,} chars"
+                detail = dataset + result
+            if attributes.get('peak_memory_bytes'):
+                detail += f", peak +{attributes['peak_memory_bytes'] / 2**20:.1f} MiB"
+        error = f"  {span.error}" if span.error else ""
+        start = (span.start_ns - turn.root.start_ns) / 1e9
+        lines.append(f"  {start:7.3f}s +{span.duration_s:.3f}s  {span.kind:<4} {name:<32} {detail}{error}")
+    return "\n".join(lines)
+
+def _reported_tokens(response):
+    usage = (response.llm_output or {}).get('token_usage') or {}
+    if usage.get('prompt_tokens') is not None:
+        return usage['prompt_tokens'], usage.get('completion_tokens', 0)
+
+    prompt_tokens = completion_tokens = None
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, 'message', None), 'usage_metadata', None)
+            if metadata:
+                prompt_tokens = (prompt_tokens or 0) + metadata['input_tokens']
+                completion_tokens = (completion_tokens or 0) + metadata['output_tokens']
+    return prompt_tokens, completion_tokens
+
+def _rows(data):
+    if isinstance(data, (PreparedDataset, pd.DataFrame)):
+        return len(data)
+    return None
+
+def _result_size(result):
+    if isinstance(result, pd.DataFrame):
+        return {"result_rows": len(result), "result_bytes": int(result.memory_usage(deep=True).sum())}
+    return {"result_bytes": len(str(result))}
+
+def _start_memory():
+    global _memory_spans
+    if not tracemalloc.is_tracing():
+        return None
+    with _memory_lock:
+        if _memory_spans == 0:
+            tracemalloc.reset_peak()
+        _memory_spans += 1
+        return tracemalloc.get_traced_memory()[0]
+
+def _stop_memory(start):
+    global _memory_spans
+    if start is None:
+        return None
+    with _memory_lock:
+        _memory_spans -= 1
+        return max(0, tracemalloc.get_traced_memory()[1] - start)
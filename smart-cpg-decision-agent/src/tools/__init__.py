@@ -0,0 +1,25 @@
+# Columns each tool reads, so loaders can project the data down to what a question needs
+TOOL_COLUMNS = {
+    'calculate_category_trends': ['date', 'category', 'units_sold', 'revenue'],
+    'compare_stores_performance': ['store_id', 'store_region', 'units_sold', 'revenue'],
+    'analyze_seasonality': ['date', 'category', 'revenue'],
+    'detect_sales_spikes': ['date', 'store_id', 'sku_id', 'units_sold'],
+    'detect_stock_shortages': ['date', 'store_id', 'sku_id', 'inventory_level'],
+    # holiday_flag and promo_type feed the holiday_adjusted and by_promo_type options
+    'flag_anomalous_promotions': ['date', 'store_id', 'sku_id', 'units_sold', 'promo_flag', 'holiday_flag', 'promo_type'],
+    'simulate_price_change': ['sku_id', 'units_sold', 'revenue', 'price'],
+    'simulate_promotion': ['category', 'units_sold', 'revenue', 'price', 'promo_flag'],
+    'forecast_demand': ['date', 'store_id', 'sku_id', 'units_sold', 'promo_flag', 'holiday_flag', 'price'],
+    'project_stock_outs': ['date', 'store_id', 'sku_id', 'units_sold', 'promo_flag', 'holiday_flag', 'price', 'inventory_level'],
+}
+
+def required_columns(*tool_names):
+    """
+    Union of the columns the given tools read, in a stable order.
+    """
+    columns = []
+    for name in tool_names:
+        if name not in TOOL_COLUMNS:
+            raise ValueError(f"Unknown tool '{name}'. Known tools: {list(TOOL_COLUMNS)}")
+        columns.extend(TOOL_COLUMNS[name])
+    return list(dict.fromkeys(columns))
@@ -1,58 +1,232 @@
 import pandas as pd
 import numpy as np
+from src.dataset import PreparedDataset, as_frame
+from src.rollups import SERIES_KEYS, merge_series_stats, promo_baselines, series_codes, series_stats, series_std
+from src.tools import duckdb_backend, spark_backend
+from src.tools.duckdb_backend import is_duckdb_table
+from src.tools.spark_backend import is_spark_frame
 
-def detect_sales_spikes(df: pd.DataFrame, threshold=2.0):
+def detect_sales_spikes(df: pd.DataFrame, threshold=2.0, window=None):
     """
     Detects abnormal spikes in sales volume where the daily units sold
     exceed the mean units sold + (threshold * standard deviation).
-    This function groups by SKU and Store to isolate specific anomalies.
+    The baseline is computed per SKU and Store to isolate specific anomalies.
+
+    By default the baseline is the full history of each SKU/Store pair. Pass
+    `window` (in days) to measure each day against the trailing N-day history
+    instead, excluding the day itself.
     """
-    # Group by SKU and Store to calculate mean and std deviation
-    grouped = df.groupby(['sku_id', 'store_id'])
+    if is_spark_frame(df):
+        return spark_backend.detect_sales_spikes(df, threshold=threshold, window=window)
+    if is_duckdb_table(df):
+        return duckdb_backend.detect_sales_spikes(df, threshold=threshold, window=window)
+    if isinstance(df, PreparedDataset) and window is None:
+        # Limits from the maintained per-series statistics, gathered onto the rows by series code
+        # (both from one snapshot, so an append meanwhile cannot pair new rows with old codes)
+        df = df.snapshot()
+        stats = df.rollups.series_stats
+        limits = (stats['mean'] + threshold * series_std(stats)).to_numpy()
+        row_limits = _gather(limits, df.rollups.series_codes)
+        spikes = df.df[df.df['units_sold'].to_numpy() > row_limits]
+        return spikes.sort_values(by='date', kind='stable')
 
-    anomalies = []
+    df = as_frame(df)
+    if window is None:
+        # Per-group mean/std broadcast back onto every row, no per-group frames
+        units = df.groupby(['sku_id', 'store_id'])['units_sold']
+        mean_sales = units.transform('mean')
+        std_sales = units.transform('std')
+    else:
+        mean_sales, std_sales = _rolling_baseline(df, window)
 
-    for name, group in grouped:
-        mean_sales = group['units_sold'].mean()
-        std_sales = group['units_sold'].std()
+    # Calculate the threshold limit and find rows where units_sold > limit
+    limit = mean_sales + (threshold * std_sales)
+    spikes = df[df['units_sold'] > limit]
 
-        # Calculate the threshold limit
-        limit = mean_sales + (threshold * std_sales)
+    return spikes.sort_values(by='date', kind='stable')
 
-        # Find rows where units_sold > limit
-        spike_rows = group[group['units_sold'] > limit]
+def _gather(values, codes):
+    """
+    `values[codes]`, with NaN where the code is -1 (rows with a missing key).
+    """
+    return np.where(codes >= 0, values[codes], np.nan)
 
-        if not spike_rows.empty:
-            anomalies.append(spike_rows)
+def _rolling_baseline(df: pd.DataFrame, window):
+    """
+    Trailing `window`-day mean and standard deviation of units sold per SKU and Store,
+    aligned positionally with the rows of `df`. The current day is excluded from its own baseline.
+    """
+    frame = pd.DataFrame({
+        'sku_id': df['sku_id'].to_numpy(),
+        'store_id': df['store_id'].to_numpy(),
+        'date': pd.to_datetime(df['date']).to_numpy(),
+        'units_sold': df['units_sold'].to_numpy(dtype='float64'),
+        'position': np.arange(len(df)),
+    })
+    frame = frame.dropna(subset=['sku_id', 'store_id'])
+    frame = frame.sort_values(by=['sku_id', 'store_id', 'date'], kind='stable')
 
-    if anomalies:
-        return pd.concat(anomalies).sort_values(by='date')
-    else:
-        return pd.DataFrame()
+    # Rolling results come back in the (already sorted) frame order
+    rolling = frame.groupby(['sku_id', 'store_id'], sort=False).rolling(
+        f'{int(window)}D', on='date', closed='left', min_periods=2
+    )['units_sold']
+
+    mean_sales = np.full(len(df), np.nan)
+    std_sales = np.full(len(df), np.nan)
+    mean_sales[frame['position'].to_numpy()] = rolling.mean().to_numpy()
+    std_sales[frame['position'].to_numpy()] = rolling.std().to_numpy()
+
+    return mean_sales, std_sales
 
 def detect_stock_shortages(df: pd.DataFrame, critical_level=50):
     """
     Detects when a store's inventory for a SKU drops below a critical level.
     """
+    if is_spark_frame(df):
+        return spark_backend.detect_stock_shortages(df, critical_level=critical_level)
+    if is_duckdb_table(df):
+        return duckdb_backend.detect_stock_shortages(df, critical_level=critical_level)
+    df = as_frame(df)
     shortages = df[df['inventory_level'] < critical_level]
     return shortages.sort_values(by=['date', 'store_id', 'sku_id'])
 
-def flag_anomalous_promotions(df: pd.DataFrame):
+def flag_anomalous_promotions(df: pd.DataFrame, by_promo_type=False, holiday_adjusted=False, lift_ratio=False, min_lift=1.0):
     """
     Finds instances where a promotion was active but sales were below average for that SKU/Store,
     indicating a failed promotion.
+
+    The baseline is the SKU/Store's mean units on non-promo days (`baseline_avg_units`). Options:
+    - `holiday_adjusted`: promo days on holidays are measured against the non-promo holiday mean and
+      other days against the non-holiday mean (falling back to the overall mean where a series has none).
+    - `by_promo_type`: a promotion must also match the typical lift of its promo_type (the mean
+      units/baseline ratio of that type across all series); adds `expected_units`.
+    - `min_lift`: flag days selling under `min_lift` x the expected units, e.g. 1.2 for promotions that
+      failed to add 20%; a dict sets it per promo_type (types not in it use 1.0).
+    - `lift_ratio`: adds the `lift` column, units sold / baseline.
+
+    Baselines are looked up per row by series code (on a PreparedDataset from its maintained
+    `promo_baselines`), so only the flagged rows are copied.
     """
-    # Calculate baseline (non-promo) average per SKU and Store
-    baseline = df[df['promo_flag'] == 0].groupby(['sku_id', 'store_id'])['units_sold'].mean().reset_index()
-    baseline.rename(columns={'units_sold': 'baseline_avg_units'}, inplace=True)
+    if is_spark_frame(df):
+        return spark_backend.flag_anomalous_promotions(df, by_promo_type=by_promo_type, holiday_adjusted=holiday_adjusted,
+                                                       lift_ratio=lift_ratio, min_lift=min_lift)
+    if is_duckdb_table(df):
+        return duckdb_backend.flag_anomalous_promotions(df, by_promo_type=by_promo_type, holiday_adjusted=holiday_adjusted,
+                                                        lift_ratio=lift_ratio, min_lift=min_lift)
+    if isinstance(df, PreparedDataset):
+        df = df.snapshot()
+        frame, codes, baselines = df.df, df.rollups.series_codes, df.rollups.promo_baselines
+    else:
+        frame = as_frame(df)
+        stats = series_stats(frame)
+        codes, baselines = series_codes(frame, stats), promo_baselines(stats)
+
+    promo = np.flatnonzero((frame['promo_flag'] == 1).to_numpy())
+    promo_codes = codes[promo]
+    baseline = _gather(baselines['all'].to_numpy(), promo_codes)
+    if holiday_adjusted:
+        holiday = (frame['holiday_flag'].to_numpy()[promo] == 1)
+        adjusted = np.where(holiday, _gather(baselines['holiday'].to_numpy(), promo_codes), _gather(baselines['regular'].to_numpy(), promo_codes))
+        baseline = np.where(np.isnan(adjusted), baseline, adjusted)
 
-    # Filter promo days
-    promo_days = df[df['promo_flag'] == 1]
+    units = frame['units_sold'].to_numpy(dtype='float64', na_value=np.nan)[promo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = units / baseline
 
-    # Merge with baseline
-    merged = pd.merge(promo_days, baseline, on=['sku_id', 'store_id'], how='left')
+    expected = baseline
+    promo_types = None
+    if by_promo_type or isinstance(min_lift, dict):
+        type_codes, promo_types = pd.factorize(frame['promo_type'].array.take(promo))
+    if by_promo_type:
+        expected = baseline * _gather(_typical_lift(lift, type_codes, len(promo_types)), type_codes)
+
+    if isinstance(min_lift, dict):
+        # The trailing 1.0 is picked by code -1 (a missing promo_type)
+        thresholds = np.array([min_lift.get(promo_type, 1.0) for promo_type in promo_types] + [1.0])
+        min_lift = thresholds[type_codes]
+    failed = units < min_lift * expected
+
+    # Numbered by position among the promo rows, like the merge of promo rows and baselines it replaces
+    failed_promos = frame.iloc[promo[failed]].set_axis(np.flatnonzero(failed))
+    failed_promos = failed_promos.assign(baseline_avg_units=baseline[failed])
+    if by_promo_type:
+        failed_promos['expected_units'] = expected[failed]
+    if lift_ratio:
+        failed_promos['lift'] = lift[failed]
+    return failed_promos.sort_values(by='date', kind='stable')
+
+def _typical_lift(lift, type_codes, n_types):
+    """
+    Mean lift per promo type code, over the promo days with a finite lift.
+    """
+    valid = np.isfinite(lift) & (type_codes >= 0)
+    totals = np.bincount(type_codes[valid], weights=lift[valid], minlength=n_types)
+    counts = np.bincount(type_codes[valid], minlength=n_types)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return totals / counts
+
+def detect_sales_spikes_streaming(filepath: str, output_path: str, threshold=2.0, batch_rows=1_000_000, filters=None, loader=None):
+    """
+    detect_sales_spikes (full-history baseline) for data larger than memory, read in batches through
+    DataLoader.iter_batches. Pass 1 accumulates the per-SKU/Store mean and variance batch by batch
+    (see rollups.merge_series_stats); pass 2 re-reads the data and writes the spike rows to the
+    parquet file `output_path` as they are found, in input order rather than sorted by date.
+
+    Memory holds one batch plus the per-series statistics, whatever the size of the input.
+    Returns the number of rows scanned and spikes written.
+    """
+    loader = loader if loader is not None else _streaming_loader()
+
+    stats = None
+    for batch in loader.iter_batches(filepath, batch_rows, columns=SERIES_KEYS + ['units_sold', 'promo_flag'], filters=filters):
+        batch_stats = series_stats(batch)
+        stats = batch_stats if stats is None else merge_series_stats(stats, batch_stats)
+
+    limits = (stats['mean'] + threshold * series_std(stats)).to_numpy()
+
+    def spikes(batch):
+        return batch[batch['units_sold'].to_numpy() > _gather(limits, series_codes(batch, stats))]
+
+    return _write_matches(loader.iter_batches(filepath, batch_rows, filters=filters), spikes, output_path)
+
+def detect_stock_shortages_streaming(filepath: str, output_path: str, critical_level=50, batch_rows=1_000_000, filters=None, loader=None):
+    """
+    detect_stock_shortages for data larger than memory: a single pass over the batches of
+    DataLoader.iter_batches, writing the shortage rows to the parquet file `output_path` in input order.
+    Returns the number of rows scanned and shortages written.
+    """
+    loader = loader if loader is not None else _streaming_loader()
+    return _write_matches(
+        loader.iter_batches(filepath, batch_rows, filters=filters),
+        lambda batch: batch[batch['inventory_level'] < critical_level],
+        output_path
+    )
+
+def _streaming_loader():
+    from src.data_loader import DataLoader
+    return DataLoader(use_spark=False)
+
+def _write_matches(batches, select, output_path: str):
+    """
+    Writes select(batch) for every batch to one parquet file, with the schema of the first batch.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
 
-    # Find anomalies: Promo units sold < baseline avg units
-    failed_promos = merged[merged['units_sold'] < merged['baseline_avg_units']]
+    writer = None
+    scanned = written = 0
+    try:
+        for batch in batches:
+            matches = select(batch)
+            if writer is None:
+                schema = pa.Schema.from_pandas(batch, preserve_index=False)
+                writer = pq.ParquetWriter(output_path, schema)
+            if len(matches):
+                writer.write_table(pa.Table.from_pandas(matches, schema=schema, preserve_index=False))
+            scanned += len(batch)
+            written += len(matches)
+    finally:
+        if writer is not None:
+            writer.close()
 
-    return failed_promos.sort_values(by='date')
+    return {"rows_scanned": scanned, "anomalies": written, "output_path": output_path}
@@ -0,0 +1,252 @@
+import pandas as pd
+
+# SQL expressions labelling each date with the last day of its period, matching src.calendar_keys
+PERIOD_EXPRESSIONS = {
+    'D': 'CAST("date" AS DATE)',
+    'W': 'CAST("date" AS DATE) + CAST((7 - isodow(CAST("date" AS DATE))) % 7 AS INTEGER)',
+    'M': 'last_day(CAST("date" AS DATE))',
+    'Q': "last_day(date_trunc('quarter', CAST(\"date\" AS DATE)) + INTERVAL 2 MONTH)",
+}
+
+# Metrics compare_stores_performance can rank by; they are spliced into the SQL, so only these are accepted
+STORE_METRICS = ('revenue', 'units_sold')
+
+# Keys the simulations aggregate by
+STATS_KEYS = ('sku_id', 'category')
+
+class DuckDBTable:
+    """
+    Sales data left on disk and queried in place by DuckDB, as returned by DataLoader(backend='duckdb').
+
+    `source` is what queries select from: a subquery over the parquet/csv files (scanned with the
+    projection and filters pushed down, on all cores) or a table persisted in a DuckDB database file.
+    Every query runs on its own cursor of `connection`, so tools can be called from several threads,
+    and only its (aggregated or filtered) result is brought into pandas.
+    """
+    def __init__(self, connection, source: str, fingerprint: str):
+        self.connection = connection
+        self.source = source
+        self.fingerprint = fingerprint
+
+    def query(self, sql: str, params=None) -> pd.DataFrame:
+        """
+        Runs `sql`, with `{sales}` standing for the data, and returns the result as a pandas frame.
+        """
+        cursor = self.connection.cursor()
+        try:
+            return cursor.execute(sql.format(sales=self.source), params or []).df()
+        finally:
+            cursor.close()
+
+    @property
+    def columns(self):
+        return list(self.query("SELECT * FROM {sales} LIMIT 0").columns)
+
+    def to_pandas(self) -> pd.DataFrame:
+        return self.query("SELECT * FROM {sales}")
+
+    def __len__(self):
+        return int(self.query("SELECT COUNT(*) AS n FROM {sales}")['n'].iloc[0])
+
+def is_duckdb_table(df):
+    """
+    True if `df` is a DuckDBTable.
+    """
+    return isinstance(df, DuckDBTable)
+
+def calculate_category_trends(table, period: str):
+    """
+    DuckDB version of trend_analysis.calculate_category_trends for a canonical period ('D', 'W', 'M' or 'Q').
+    """
+    trends = table.query(f"""
+        SELECT CAST({PERIOD_EXPRESSIONS[period]} AS DATE) AS "date", category,
+               SUM(units_sold) AS total_units_sold, SUM(revenue) AS total_revenue
+        FROM {{sales}}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """)
+
+    trends['date'] = pd.to_datetime(trends['date'])
+    return trends
+
+def compare_stores_performance(table, metric='revenue'):
+    """
+    DuckDB version of trend_analysis.compare_stores_performance.
+    """
+    if metric not in STORE_METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Use one of {list(STORE_METRICS)}.")
+
+    return table.query(f"""
+        SELECT store_id, store_region, SUM(revenue) AS total_revenue, SUM(units_sold) AS total_units_sold
+        FROM {{sales}}
+        GROUP BY store_id, store_region
+        ORDER BY total_{metric} DESC
+    """)
+
+def analyze_seasonality(table, category=None):
+    """
+    DuckDB version of trend_analysis.analyze_seasonality.
+    """
+    return table.query(f"""
+        SELECT month(CAST("date" AS DATE)) AS month, SUM(revenue) AS total_revenue
+        FROM {{sales}}
+        {"WHERE category = ?" if category else ""}
+        GROUP BY 1
+        ORDER BY total_revenue DESC
+    """, [category] if category else None)
+
+def detect_sales_spikes(table, threshold=2.0, window=None):
+    """
+    DuckDB version of anomaly_detection.detect_sales_spikes. The per-series baseline is a window
+    aggregate, so only the spike rows are fetched.
+    """
+    frame = ""
+    if window is not None:
+        # Trailing `window` days, excluding the current day
+        frame = f'ORDER BY CAST("date" AS DATE) RANGE BETWEEN INTERVAL {int(window)} DAYS PRECEDING AND INTERVAL 1 DAYS PRECEDING'
+
+    return table.query(f"""
+        SELECT * EXCLUDE (_limit) FROM (
+            SELECT *, AVG(units_sold) OVER series + ? * STDDEV_SAMP(units_sold) OVER series AS _limit
+            FROM {{sales}}
+            WINDOW series AS (PARTITION BY sku_id, store_id {frame})
+        )
+        WHERE units_sold > _limit
+        ORDER BY "date"
+    """, [float(threshold)])
+
+def detect_stock_shortages(table, critical_level=50):
+    """
+    DuckDB version of anomaly_detection.detect_stock_shortages.
+    """
+    return table.query("""
+        SELECT * FROM {sales}
+        WHERE inventory_level < ?
+        ORDER BY "date", store_id, sku_id
+    """, [critical_level])
+
+def flag_anomalous_promotions(table, by_promo_type=False, holiday_adjusted=False, lift_ratio=False, min_lift=1.0):
+    """
+    DuckDB version of anomaly_detection.flag_anomalous_promotions. The baselines are small hash-joined tables.
+    """
+    params = []
+    holiday_join = ""
+    baseline = "b.baseline_avg_units"
+    if holiday_adjusted:
+        holiday_join = """
+            LEFT JOIN (
+                SELECT sku_id, store_id, CASE WHEN holiday_flag = 1 THEN 1 ELSE 0 END AS _holiday, AVG(units_sold) AS _day_baseline
+                FROM sales WHERE promo_flag = 0 GROUP BY 1, 2, 3
+            ) h ON h.sku_id = p.sku_id AND h.store_id = p.store_id AND h._holiday = CASE WHEN p.holiday_flag = 1 THEN 1 ELSE 0 END
+        """
+        baseline = f"COALESCE(h._day_baseline, {baseline})"
+
+    # A zero or missing baseline gives a null lift, which AVG skips
+    expected = "baseline_avg_units"
+    if by_promo_type:
+        expected = "baseline_avg_units * AVG(lift) OVER (PARTITION BY promo_type)"
+
+    threshold = "?"
+    if isinstance(min_lift, dict):
+        threshold = "CASE " + "WHEN promo_type = ? THEN ? " * len(min_lift) + "ELSE 1.0 END"
+        params.extend(value for item in min_lift.items() for value in item)
+    else:
+        params.append(float(min_lift))
+
+    # Keep the pandas column order: promo row columns, then the baseline and the optional columns
+    extra = ", expected_units" * by_promo_type + ", lift" * lift_ratio
+    return table.query(f"""
+        WITH sales AS (SELECT * FROM {{sales}}),
+        promo_days AS (
+            SELECT p.*, {baseline} AS baseline_avg_units
+            FROM sales p
+            LEFT JOIN (
+                SELECT sku_id, store_id, AVG(units_sold) AS baseline_avg_units
+                FROM sales WHERE promo_flag = 0 GROUP BY 1, 2
+            ) b ON b.sku_id = p.sku_id AND b.store_id = p.store_id
+            {holiday_join}
+            WHERE p.promo_flag = 1
+        ),
+        lifted AS (
+            SELECT *, units_sold / NULLIF(baseline_avg_units, 0) AS lift FROM promo_days
+        ),
+        expected AS (
+            SELECT *, {expected} AS expected_units, {threshold} AS _min_lift FROM lifted
+        )
+        SELECT * EXCLUDE (expected_units, lift, _min_lift){extra}
+        FROM expected
+        WHERE units_sold < _min_lift * expected_units
+        ORDER BY "date"
+    """, params)
+
+def sku_totals(table, sku_id: int):
+    """
+    Total revenue, total units and average price of a SKU, or None if the SKU has no rows.
+    """
+    row = table.query("""
+        SELECT COUNT(*) AS n, SUM(revenue) AS revenue, SUM(units_sold) AS units_sold, AVG(price) AS price
+        FROM {sales} WHERE sku_id = ?
+    """, [int(sku_id)]).iloc[0]
+
+    if row['n'] == 0:
+        return None
+    return row['revenue'], row['units_sold'], row['price']
+
+def category_totals(table, category: str):
+    """
+    Non-promo units, non-promo revenue and average price of a category, or None if the category has no rows.
+    """
+    row = table.query("""
+        SELECT COUNT(*) AS n,
+               SUM(CASE WHEN promo_flag = 0 THEN units_sold ELSE 0 END) AS units_sold,
+               SUM(CASE WHEN promo_flag = 0 THEN revenue ELSE 0 END) AS revenue,
+               AVG(price) AS price
+        FROM {sales} WHERE category = ?
+    """, [category]).iloc[0]
+
+    if row['n'] == 0:
+        return None
+    return row['units_sold'], row['revenue'], row['price']
+
+def sufficient_stats(table, key: str, values):
+    """
+    DuckDB version of rollups.sufficient_stats restricted to the given `key` values, fetched as a small pandas frame.
+    """
+    if key not in STATS_KEYS:
+        raise ValueError(f"Unknown key '{key}'. Use one of {list(STATS_KEYS)}.")
+
+    stats = table.query(f"""
+        SELECT {key},
+               COUNT(*) AS "rows",
+               SUM(CAST(units_sold AS DOUBLE)) AS units_sold,
+               SUM(CAST(revenue AS DOUBLE)) AS revenue,
+               SUM(CAST(price AS DOUBLE)) AS price_sum,
+               COUNT(price) AS price_count,
+               SUM(CASE WHEN promo_flag = 1 THEN CAST(units_sold AS DOUBLE) ELSE 0.0 END) AS promo_units,
+               SUM(CASE WHEN promo_flag = 1 THEN CAST(revenue AS DOUBLE) ELSE 0.0 END) AS promo_revenue,
+               SUM(CASE WHEN promo_flag = 0 THEN CAST(units_sold AS DOUBLE) ELSE 0.0 END) AS non_promo_units,
+               SUM(CASE WHEN promo_flag = 0 THEN CAST(revenue AS DOUBLE) ELSE 0.0 END) AS non_promo_revenue
+        FROM {{sales}}
+        WHERE list_contains(?, {key})
+        GROUP BY {key}
+    """, [list(values)])
+
+    return stats.set_index(key)
+
+def log_price_sums(table, sku_ids=None):
+    """
+    DuckDB version of scenario_simulation._log_price_sums: per-SKU log-log regression sums, fetched as a small pandas frame.
+    """
+    sku_filter = "AND list_contains(?, sku_id)" if sku_ids is not None else ""
+    sums = table.query(f"""
+        SELECT sku_id, COUNT(*) AS n, SUM(x) AS sum_x, SUM(y) AS sum_y,
+               SUM(x * x) AS sum_xx, SUM(x * y) AS sum_xy, SUM(y * y) AS sum_yy
+        FROM (
+            SELECT sku_id, ln(CAST(price AS DOUBLE)) AS x, ln(CAST(units_sold AS DOUBLE)) AS y
+            FROM {{sales}}
+            WHERE price > 0 AND units_sold > 0 {sku_filter}
+        )
+        GROUP BY sku_id
+    """, [[int(sku_id) for sku_id in sku_ids]] if sku_ids is not None else None)
+
+    return sums.set_index('sku_id').sort_index()
@@ -0,0 +1,337 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.dataset import PreparedDataset, as_frame
+from src.rollups import SERIES_KEYS
+from src.tools.duckdb_backend import is_duckdb_table
+from src.tools.spark_backend import is_spark_frame
+
+# Models forecast_demand fits, one per (sku_id, store_id) series
+FORECAST_MODELS = ('seasonal_naive', 'exp_smoothing', 'ridge')
+
+# Columns the forecasts read; all but the keys, date and units are optional
+FORECAST_COLUMNS = ['date', 'sku_id', 'store_id', 'units_sold', 'promo_flag', 'holiday_flag', 'price', 'inventory_level']
+
+# Length of the seasonal cycle in days
+SEASON = 7
+# Exponential smoothing: each series keeps the level smoothing of this grid that fits its history best
+SMOOTHING_ALPHAS = (0.05, 0.1, 0.2, 0.4)
+SMOOTHING_GAMMA = 0.1
+# Ridge penalty on every coefficient but the intercept
+RIDGE_PENALTY = 0.1
+
+# Upper bound on (series x days x features) fitted at once, to keep memory bounded
+MAX_CELLS_PER_CHUNK = 4_000_000
+
+class SalesPanel:
+    """
+    The sales of every (sku_id, store_id) series on a dense series x day grid, the layout the
+    forecasting models are fitted on in batches.
+
+    `units` and `price` are NaN and `promo` 0 where a series has no row for a day; `holiday` is the
+    flag of each day. `inventory` is each series' inventory_level on its last observed day (NaN
+    without the column). Rows of the grid follow `series`, a (sku_id, store_id) MultiIndex.
+    """
+    def __init__(self, frame: pd.DataFrame, series=None, codes=None):
+        if series is None:
+            frame = frame.dropna(subset=SERIES_KEYS)
+            keys = pd.MultiIndex.from_arrays([frame[key] for key in SERIES_KEYS])
+            series = keys.unique().sort_values()
+            codes = series.get_indexer(keys)
+        known = codes >= 0
+
+        days = pd.to_datetime(frame['date']).to_numpy().astype('datetime64[D]')
+        first, last = days[known].min(), days[known].max()
+        day = (days - first).astype('int64')
+        self.series = series
+        self.dates = pd.date_range(pd.Timestamp(first), pd.Timestamp(last), freq='D')
+
+        n_series, n_days = len(series), len(self.dates)
+        rows, day = codes[known], day[known]
+        self.units = np.full((n_series, n_days), np.nan, dtype=np.float32)
+        self.units[rows, day] = _column(frame, 'units_sold', known, np.nan)
+        self.price = np.full((n_series, n_days), np.nan, dtype=np.float32)
+        self.price[rows, day] = _column(frame, 'price', known, np.nan)
+        self.promo = np.zeros((n_series, n_days), dtype=np.int8)
+        self.promo[rows, day] = _column(frame, 'promo_flag', known, 0)
+        self.holiday = np.zeros(n_days, dtype=np.int8)
+        np.maximum.at(self.holiday, day, _column(frame, 'holiday_flag', known, 0).astype(np.int8))
+
+        # The last observed day of each series, and its inventory then
+        observed = ~np.isnan(self.units)
+        self.last_day = n_days - 1 - observed[:, ::-1].argmax(axis=1)
+        self.inventory = np.full(n_series, np.nan)
+        at_last = day == self.last_day[rows]
+        self.inventory[rows[at_last]] = _column(frame, 'inventory_level', known, np.nan)[at_last]
+
+    def future_dates(self, horizon: int):
+        return pd.date_range(self.dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+
+    def __len__(self):
+        return len(self.series)
+
+def forecast_demand(df: pd.DataFrame, horizon=14, model='ridge', sku_ids=None, store_ids=None, n_jobs=1):
+    """
+    Forecasts the daily units sold of every (sku_id, store_id) series for the `horizon` days after
+    the last date in the data. Models, all fitted across the series at once in NumPy batches:
+    - `seasonal_naive`: each series repeats its last week.
+    - `exp_smoothing`: additive weekly exponential smoothing (level + day-of-week season), with the
+      level smoothing of each series picked from SMOOTHING_ALPHAS by its in-sample error.
+    - `ridge`: a ridge regression per series on a trend, day of week, yearly Fourier terms,
+      promo_flag, holiday_flag and log price relative to the last price. The future is assumed to
+      have no promotions, the last price, and the holidays of the same days a year earlier.
+
+    The series are fitted in chunks of at most MAX_CELLS_PER_CHUNK cells; n_jobs > 1 spreads the
+    chunks over a pool of spawned worker processes. For a PreparedDataset the forecasts of all series are cached on the
+    dataset, so later calls (other horizons up to the cached one, other SKUs or stores, projected
+    stock-outs) only select from them. Returns date, sku_id, store_id and forecast_units, optionally
+    only for `sku_ids` and/or `store_ids`.
+    """
+    df = _snapshot(df)
+    panel = _sales_panel(df)
+    values = _forecast(df, panel, model, horizon, n_jobs)
+
+    selected = np.ones(len(panel), dtype=bool)
+    if sku_ids is not None:
+        selected &= panel.series.get_level_values('sku_id').isin(sku_ids)
+    if store_ids is not None:
+        selected &= panel.series.get_level_values('store_id').isin(store_ids)
+    series = panel.series[selected]
+
+    return pd.DataFrame({
+        'date': np.tile(panel.future_dates(horizon), len(series)),
+        'sku_id': np.repeat(series.get_level_values('sku_id'), horizon),
+        'store_id': np.repeat(series.get_level_values('store_id'), horizon),
+        'forecast_units': values[selected].ravel().round(2),
+    })
+
+def project_stock_outs(df: pd.DataFrame, horizon=14, model='ridge', critical_level=0, n_jobs=1):
+    """
+    Projects each series' inventory forward from its last observed inventory_level, drawing it down
+    by the forecast demand (see forecast_demand) and assuming no replenishment, and lists the series
+    whose projected inventory falls below `critical_level` within `horizon` days: the date it does,
+    the days until then, and the units of forecast demand the current stock leaves uncovered.
+    Sorted by the stock-out date, most uncovered units first.
+    """
+    df = _snapshot(df)
+    panel = _sales_panel(df)
+    if np.isnan(panel.inventory).all():
+        raise ValueError("Projecting stock-outs needs the inventory_level column.")
+    demand = np.cumsum(_forecast(df, panel, model, horizon, n_jobs), axis=1, dtype=np.float64)
+
+    below = panel.inventory[:, None] - demand < critical_level
+    out = below.any(axis=1)
+    first_day = below.argmax(axis=1)[out]
+
+    stock_outs = pd.DataFrame({
+        'sku_id': panel.series.get_level_values('sku_id')[out],
+        'store_id': panel.series.get_level_values('store_id')[out],
+        'inventory_level': panel.inventory[out].astype('int64'),
+        'forecast_units': demand[out, -1].round(2),
+        'stockout_date': panel.future_dates(horizon)[first_day],
+        'days_until_stockout': first_day + 1,
+        'uncovered_units': (demand[out, -1] - panel.inventory[out]).clip(0).round(2),
+    })
+    return stock_outs.sort_values(['stockout_date', 'uncovered_units'], ascending=[True, False], kind='stable').reset_index(drop=True)
+
+def _snapshot(df):
+    """
+    A PreparedDataset fixed on its current version, so the panel, forecasts and cache all belong to the same data.
+    """
+    return df.snapshot() if isinstance(df, PreparedDataset) else df
+
+def _sales_panel(df):
+    """
+    The SalesPanel of `df`, built once per PreparedDataset (from its series codes) and cached on it.
+    Spark DataFrames and DuckDB tables are brought into pandas, projected to FORECAST_COLUMNS.
+    """
+    if isinstance(df, PreparedDataset):
+        panel = df.derived.get('sales_panel')
+        if panel is None:
+            panel = df.derived['sales_panel'] = SalesPanel(df.df, df.rollups.series_stats.index, df.rollups.series_codes)
+        return panel
+    if is_spark_frame(df):
+        return SalesPanel(df.select(*[column for column in FORECAST_COLUMNS if column in df.columns]).toPandas())
+    if is_duckdb_table(df):
+        columns = ', '.join(column for column in FORECAST_COLUMNS if column in df.columns)
+        return SalesPanel(df.query(f"SELECT {columns} FROM {{sales}}"))
+    return SalesPanel(as_frame(df))
+
+def _forecast(df, panel: SalesPanel, model: str, horizon: int, n_jobs: int):
+    """
+    The (series x horizon) forecasts of `model`, reusing a PreparedDataset's cached forecasts of at
+    least `horizon` days.
+    """
+    if model not in FORECAST_MODELS:
+        raise ValueError(f"Unknown forecast model '{model}'. Choose one of {', '.join(FORECAST_MODELS)}.")
+    horizon = int(horizon)
+    if horizon < 1:
+        raise ValueError("The forecast horizon must be at least one day.")
+
+    cached = df.derived.get(('forecast', model)) if isinstance(df, PreparedDataset) else None
+    if cached is not None and cached.shape[1] >= horizon:
+        return cached[:, :horizon]
+
+    if model == 'seasonal_naive':
+        values = _seasonal_naive(panel.units, horizon)
+    elif model == 'exp_smoothing':
+        values = _run_chunks(_smoothing_chunk, panel, horizon, len(SMOOTHING_ALPHAS), n_jobs)
+    else:
+        calendar = _ridge_calendar(panel, horizon).to_numpy(dtype=np.float64)
+        # The calendar features, then promo_flag and log price
+        values = _run_chunks(_ridge_chunk, panel, horizon, calendar.shape[1] + 2, n_jobs, calendar)
+    values = values.astype(np.float32)
+
+    if isinstance(df, PreparedDataset):
+        df.derived[('forecast', model)] = values
+    return values
+
+def _run_chunks(chunk_fn, panel: SalesPanel, horizon: int, width: int, n_jobs: int, calendar=None):
+    """
+    Splits the series into chunks of at most MAX_CELLS_PER_CHUNK (series x days x `width`) cells,
+    fits them sequentially or on a process pool, and stacks their forecasts in series order.
+    """
+    n_days = len(panel.dates)
+    chunk_rows = max(1, MAX_CELLS_PER_CHUNK // (n_days * width))
+    ref_price = panel.price[np.arange(len(panel)), panel.last_day]
+
+    tasks = [
+        (panel.units[start:start + chunk_rows], panel.promo[start:start + chunk_rows],
+         panel.price[start:start + chunk_rows], ref_price[start:start + chunk_rows], calendar, horizon)
+        for start in range(0, len(panel), chunk_rows)
+    ]
+    if n_jobs > 1 and len(tasks) > 1:
+        # Spawned rather than forked workers: the agent calls this from threads, and a fork taken while
+        # another thread holds a lock (logging, BLAS, the LLM client) can deadlock the child
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context('spawn')) as pool:
+            chunks = list(pool.map(chunk_fn, tasks))
+    else:
+        chunks = [chunk_fn(task) for task in tasks]
+    return np.concatenate(chunks) if chunks else np.empty((0, horizon))
+
+def _seasonal_naive(units, horizon: int):
+    """
+    Each series' last SEASON days repeated; a missing day takes the mean of that weekday over the
+    last four weeks, or 0.
+    """
+    recent = units[:, -4 * SEASON:]
+    # Weekday slot of each recent day: the last day is slot SEASON - 1, so the first forecast day is slot 0
+    slots = (np.arange(recent.shape[1]) - recent.shape[1]) % SEASON
+    observed = ~np.isnan(recent)
+
+    sums = np.zeros((len(units), SEASON))
+    counts = np.zeros((len(units), SEASON))
+    for slot in range(SEASON):
+        days = slots == slot
+        sums[:, slot] = np.where(observed[:, days], recent[:, days], 0.0).sum(axis=1)
+        counts[:, slot] = observed[:, days].sum(axis=1)
+    weekday_mean = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+    last_week = np.full((len(units), SEASON), np.nan)
+    last_week[:, slots[-SEASON:]] = recent[:, -SEASON:]
+    week = np.where(np.isnan(last_week), weekday_mean, last_week)
+    return week[:, np.arange(horizon) % SEASON]
+
+def _smoothing_chunk(task):
+    """
+    Additive weekly exponential smoothing of one chunk of series, every alpha of SMOOTHING_ALPHAS
+    at once; each series keeps the alpha with the lowest in-sample squared error. Top-level so it
+    can run in a worker process.
+    """
+    units, _, _, _, _, horizon = task
+    n_series, n_days = units.shape
+    alphas = np.asarray(SMOOTHING_ALPHAS)[:, None]
+
+    # Start from the first week: its mean level and the deviations of each day from it
+    first_week = units[:, :SEASON].astype(np.float64)
+    level = np.nansum(first_week, axis=1) / np.maximum((~np.isnan(first_week)).sum(axis=1), 1)
+    season = np.nan_to_num(first_week - level[:, None])
+    if season.shape[1] < SEASON:
+        season = np.pad(season, ((0, 0), (0, SEASON - season.shape[1])))
+
+    level = np.repeat(level[None, :], len(alphas), axis=0)
+    season = np.repeat(season[None, :, :], len(alphas), axis=0)
+    squared_error = np.zeros_like(level)
+
+    for day in range(n_days):
+        slot = day % SEASON
+        actual = units[:, day]
+        observed = ~np.isnan(actual)
+        error = np.where(observed, actual - level - season[:, :, slot], 0.0)
+        if day >= SEASON:
+            squared_error += error ** 2
+        level += alphas * error
+        season[:, :, slot] += SMOOTHING_GAMMA * (1 - alphas) * error
+
+    best = squared_error.argmin(axis=0)
+    series = np.arange(n_series)
+    slots = (n_days + np.arange(horizon)) % SEASON
+    forecast = level[best, series][:, None] + season[best, series][:, slots]
+    return np.clip(forecast, 0.0, None)
+
+def _ridge_calendar(panel: SalesPanel, horizon: int):
+    """
+    The features shared by every series, for the history and the `horizon` days after it: intercept,
+    trend, day of week (Monday is the baseline), yearly Fourier terms and the holiday flag. A future
+    day is a holiday if the same day a year earlier was.
+    """
+    dates = panel.dates.append(panel.future_dates(horizon)) if horizon else panel.dates
+    n_days = len(panel.dates)
+
+    holiday = np.zeros(len(dates))
+    holiday[:n_days] = panel.holiday
+    if horizon:
+        year_before = (panel.future_dates(horizon) - pd.DateOffset(years=1) - panel.dates[0]).days.to_numpy()
+        known = (year_before >= 0) & (year_before < n_days)
+        holiday[n_days:][known] = panel.holiday[year_before[known]]
+
+    day_of_year = 2 * np.pi * dates.dayofyear.to_numpy() / 365.25
+    features = {
+        'intercept': np.ones(len(dates)),
+        'trend': np.arange(len(dates)) / max(n_days, 1),
+        'year_sin': np.sin(day_of_year),
+        'year_cos': np.cos(day_of_year),
+        'holiday': holiday,
+    }
+    for weekday in range(1, 7):
+        features[f'weekday_{weekday}'] = (dates.dayofweek == weekday).astype(np.float64)
+    return pd.DataFrame(features)
+
+def _ridge_chunk(task):
+    """
+    Ridge regressions of one chunk of series, solved together: the normal equations of every series
+    are built with one batched matrix product and solved with one batched np.linalg.solve. Days a
+    series has no row for are left out of its fit. Top-level so it can run in a worker process.
+    """
+    units, promo, price, ref_price, calendar, horizon = task
+    n_series, n_days = units.shape
+    n_calendar = calendar.shape[1]
+
+    features = np.zeros((n_series, n_days + horizon, n_calendar + 2))
+    features[:, :, :n_calendar] = calendar
+    features[:, :n_days, n_calendar] = promo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_price = np.log(price / ref_price[:, None])
+    features[:, :n_days, n_calendar + 1] = np.nan_to_num(log_price, nan=0.0, posinf=0.0, neginf=0.0)
+
+    observed = ~np.isnan(units)
+    history = features[:, :n_days] * observed[:, :, None]
+    target = np.where(observed, units, 0.0)[:, :, None]
+
+    penalty = np.full(features.shape[2], RIDGE_PENALTY)
+    # The intercept is (almost) not penalized
+    penalty[0] = 1e-8
+    gram = np.matmul(history.transpose(0, 2, 1), history) + np.diag(penalty)
+    coefficients = np.linalg.solve(gram, np.matmul(history.transpose(0, 2, 1), target))
+
+    forecast = np.matmul(features[:, n_days:], coefficients)[:, :, 0]
+    return np.clip(forecast, 0.0, None)
+
+def _column(frame: pd.DataFrame, column: str, rows, default):
+    """
+    The values of `column` at `rows` as float64, or `default` if the frame lacks the column.
+    """
+    if column not in frame.columns:
+        return np.full(int(rows.sum()), default, dtype=np.float64)
+    return frame[column].to_numpy(dtype=np.float64, na_value=np.nan)[rows]
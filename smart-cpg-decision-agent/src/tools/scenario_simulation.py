@@ -1,4 +1,14 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+from src.dataset import PreparedDataset, as_frame
+from src.rollups import sufficient_stats
+from src.tools import duckdb_backend, spark_backend
+from src.tools.duckdb_backend import is_duckdb_table
+from src.tools.spark_backend import is_spark_frame
+
+# Upper bound on (rows x draws) simulated at once, to keep Monte Carlo memory bounded
+MAX_DRAWS_PER_CHUNK = 2_000_000
 
 def simulate_price_change(df: pd.DataFrame, sku_id: int, price_change_pct: float, elasticity=-1.5):
     """
@@ -8,15 +18,22 @@ def simulate_price_change(df: pd.DataFrame, sku_id: int, price_change_pct: float
 
     Returns a dataframe of the impacted sales.
     """
-    # Filter for the specific SKU
-    sku_data = df[df['sku_id'] == sku_id].copy()
+    if is_spark_frame(df):
+        # Aggregated on the cluster; only the totals are collected
+        totals = spark_backend.sku_totals(df, sku_id)
+    elif is_duckdb_table(df):
+        # Aggregated in SQL over the files; only the totals are fetched
+        totals = duckdb_backend.sku_totals(df, sku_id)
+    elif isinstance(df, PreparedDataset):
+        # Indexed lookup into the precomputed per-SKU statistics, no scan or copy
+        totals = _indexed_sku_totals(df.rollups.sku_stats, sku_id)
+    else:
+        totals = _sku_totals(as_frame(df), sku_id)
 
-    if sku_data.empty:
+    if totals is None:
         return f"No data found for SKU {sku_id}"
 
-    original_revenue = sku_data['revenue'].sum()
-    original_volume = sku_data['units_sold'].sum()
-    original_price_avg = sku_data['price'].mean()
+    original_revenue, original_volume, original_price_avg = totals
 
     # Calculate new price and volume based on elasticity
     new_price_avg = original_price_avg * (1 + price_change_pct)
@@ -48,18 +65,26 @@ def simulate_promotion(df: pd.DataFrame, category: str, promo_uplift_pct: float,
     Simulates running a new promotion across an entire category.
     Assumes a flat percentage uplift in volume and a flat cost per unit sold.
     """
-    cat_data = df[df['category'] == category].copy()
+    if is_spark_frame(df):
+        # Aggregated on the cluster; only the totals are collected
+        totals = spark_backend.category_totals(df, category)
+    elif is_duckdb_table(df):
+        # Aggregated in SQL over the files; only the totals are fetched
+        totals = duckdb_backend.category_totals(df, category)
+    elif isinstance(df, PreparedDataset):
+        # Indexed lookup into the precomputed per-category statistics, no scan or copy
+        totals = _indexed_category_totals(df.rollups.category_stats, category)
+    else:
+        totals = _category_totals(as_frame(df), category)
 
-    if cat_data.empty:
+    if totals is None:
         return f"No data found for category '{category}'"
 
     # Baseline calculations
-    baseline_volume = cat_data[cat_data['promo_flag'] == 0]['units_sold'].sum()
-    baseline_revenue = cat_data[cat_data['promo_flag'] == 0]['revenue'].sum()
+    baseline_volume, baseline_revenue, avg_price = totals
 
     # Simulate new promo volume
     simulated_volume = baseline_volume * (1 + promo_uplift_pct)
-    avg_price = cat_data['price'].mean()
 
     # Calculate revenue and costs
     gross_revenue = simulated_volume * avg_price
@@ -77,3 +102,323 @@ def simulate_promotion(df: pd.DataFrame, category: str, promo_uplift_pct: float,
         "simulated_net_revenue": round(net_revenue, 2),
         "net_revenue_impact": round(net_revenue - baseline_revenue, 2)
     }
+
+def simulate_price_grid(df: pd.DataFrame, sku_ids, price_changes, elasticities=(-1.5,)):
+    """
+    Simulates every combination of SKU, price change and elasticity in one vectorized pass,
+    using the same model as simulate_price_change.
+
+    Returns a tidy dataframe with one row per scenario. SKUs without data are left out.
+    """
+    stats = _stats_for(df, 'sku_id', sku_ids)
+    rows, price_change_pct, elasticity = _grid(len(stats), price_changes, elasticities)
+
+    original_revenue = stats['revenue'].to_numpy()[rows]
+    original_volume = stats['units_sold'].to_numpy()[rows]
+    original_price_avg = (stats['price_sum'] / stats['price_count']).to_numpy()[rows]
+
+    new_price_avg = original_price_avg * (1 + price_change_pct)
+    volume_change_pct = price_change_pct * elasticity
+    # Cap the volume drop to 0
+    new_volume = np.where(volume_change_pct <= -1, 0.0, original_volume * (1 + volume_change_pct))
+    new_revenue = new_volume * new_price_avg
+
+    return pd.DataFrame({
+        "sku_id": stats.index.to_numpy()[rows],
+        "price_change_pct": price_change_pct,
+        "elasticity": elasticity,
+        "original_avg_price": original_price_avg.round(2),
+        "new_avg_price": new_price_avg.round(2),
+        "original_total_units": original_volume.astype('int64'),
+        "simulated_total_units": new_volume.astype('int64'),
+        "original_revenue": original_revenue.round(2),
+        "simulated_revenue": new_revenue.round(2),
+        "revenue_impact": (new_revenue - original_revenue).round(2),
+    })
+
+def simulate_promotion_grid(df: pd.DataFrame, categories, promo_uplifts, promo_costs_per_unit):
+    """
+    Simulates every combination of category, volume uplift and cost per unit in one vectorized pass,
+    using the same model as simulate_promotion.
+
+    Returns a tidy dataframe with one row per scenario. Categories without data are left out.
+    """
+    stats = _stats_for(df, 'category', categories)
+    rows, promo_uplift_pct, promo_cost_per_unit = _grid(len(stats), promo_uplifts, promo_costs_per_unit)
+
+    baseline_volume = stats['non_promo_units'].to_numpy()[rows]
+    baseline_revenue = stats['non_promo_revenue'].to_numpy()[rows]
+    avg_price = (stats['price_sum'] / stats['price_count']).to_numpy()[rows]
+
+    simulated_volume = baseline_volume * (1 + promo_uplift_pct)
+    gross_revenue = simulated_volume * avg_price
+    total_promo_cost = simulated_volume * promo_cost_per_unit
+    net_revenue = gross_revenue - total_promo_cost
+
+    return pd.DataFrame({
+        "category": np.asarray(stats.index, dtype=object)[rows],
+        "promo_uplift_pct": promo_uplift_pct,
+        "promo_cost_per_unit": promo_cost_per_unit,
+        "baseline_units": baseline_volume.astype('int64'),
+        "simulated_units": simulated_volume.astype('int64'),
+        "baseline_revenue": baseline_revenue.round(2),
+        "simulated_gross_revenue": gross_revenue.round(2),
+        "total_promo_cost": total_promo_cost.round(2),
+        "simulated_net_revenue": net_revenue.round(2),
+        "net_revenue_impact": (net_revenue - baseline_revenue).round(2),
+    })
+
+def estimate_elasticities(df: pd.DataFrame, sku_ids=None, min_observations=10):
+    """
+    Estimates the price elasticity of each SKU from its history with a log-log regression:
+    log(units_sold) = a + elasticity * log(price).
+
+    Fitted for all SKUs at once from per-SKU sums. Returns a dataframe indexed by sku_id with
+    the elasticity, its standard error and the number of observations. SKUs with fewer than
+    `min_observations` positive rows or no price variation get NaN.
+    """
+    if is_spark_frame(df):
+        sums = spark_backend.log_price_sums(df, sku_ids)
+    elif is_duckdb_table(df):
+        sums = duckdb_backend.log_price_sums(df, sku_ids)
+    else:
+        frame = as_frame(df)
+        if sku_ids is not None:
+            frame = frame[frame['sku_id'].isin(list(sku_ids))]
+        sums = _log_price_sums(frame)
+
+    n = sums['n']
+    sxx = sums['sum_xx'] - sums['sum_x'] ** 2 / n
+    sxy = sums['sum_xy'] - sums['sum_x'] * sums['sum_y'] / n
+    syy = sums['sum_yy'] - sums['sum_y'] ** 2 / n
+
+    # Relative tolerance: a constant price leaves only rounding noise in sxx
+    valid = (n >= max(min_observations, 3)) & (sxx > 1e-9 * sums['sum_xx'].abs())
+    elasticity = (sxy / sxx).where(valid)
+    residual_var = ((syy - elasticity * sxy) / (n - 2)).clip(lower=0)
+
+    return pd.DataFrame({
+        'elasticity': elasticity,
+        'std_error': np.sqrt(residual_var / sxx).where(valid),
+        'observations': n.astype('int64'),
+    })
+
+def simulate_price_change_mc(df: pd.DataFrame, sku_ids, price_change_pct: float, elasticity_mean=-1.5,
+                             elasticity_sd=0.5, use_estimated=False, n_draws=10_000, seed=None,
+                             percentiles=(5, 50, 95), n_jobs=1):
+    """
+    Monte Carlo version of simulate_price_change: elasticity is drawn from a normal distribution
+    instead of being a single point, and percentile bands are returned for units, revenue and impact.
+
+    With use_estimated=True each SKU's distribution is centred on its estimate_elasticities fit
+    (standard error as spread); SKUs without a usable fit fall back to elasticity_mean/elasticity_sd.
+
+    Draws are fully vectorized and chunked to bound memory; n_jobs > 1 spreads the chunks over a
+    process pool. Results are reproducible for a given seed regardless of n_jobs.
+    """
+    stats = _stats_for(df, 'sku_id', sku_ids)
+    mean = np.full(len(stats), float(elasticity_mean))
+    sd = np.full(len(stats), float(elasticity_sd))
+
+    if use_estimated and len(stats):
+        fitted = estimate_elasticities(df, sku_ids=stats.index).reindex(stats.index)
+        usable = fitted['elasticity'].notna().to_numpy()
+        mean[usable] = fitted['elasticity'].to_numpy()[usable]
+        sd[usable] = fitted['std_error'].to_numpy()[usable]
+
+    inputs = {
+        'revenue': stats['revenue'].to_numpy(),
+        'units': stats['units_sold'].to_numpy(),
+        'price': (stats['price_sum'] / stats['price_count']).to_numpy(),
+        'mean': mean,
+        'sd': sd,
+    }
+    bands = _run_monte_carlo(_price_change_draws, inputs, float(price_change_pct), n_draws, seed, percentiles, n_jobs)
+
+    result = pd.DataFrame({
+        'sku_id': stats.index.to_numpy(),
+        'price_change_pct': price_change_pct,
+        'elasticity_mean': mean.round(3),
+        'elasticity_sd': sd.round(3),
+        'original_total_units': inputs['units'].astype('int64'),
+        'original_revenue': inputs['revenue'].round(2),
+    })
+    return pd.concat([result, bands], axis=1)
+
+def simulate_promotion_mc(df: pd.DataFrame, categories, promo_uplift_mean: float, promo_uplift_sd: float,
+                          promo_cost_per_unit: float, n_draws=10_000, seed=None, percentiles=(5, 50, 95), n_jobs=1):
+    """
+    Monte Carlo version of simulate_promotion: the volume uplift is drawn from a normal distribution
+    (floored at -100%) and percentile bands are returned for units, net revenue and net impact.
+    """
+    stats = _stats_for(df, 'category', categories)
+    inputs = {
+        'units': stats['non_promo_units'].to_numpy(),
+        'revenue': stats['non_promo_revenue'].to_numpy(),
+        'price': (stats['price_sum'] / stats['price_count']).to_numpy(),
+        'mean': np.full(len(stats), float(promo_uplift_mean)),
+        'sd': np.full(len(stats), float(promo_uplift_sd)),
+    }
+    bands = _run_monte_carlo(_promotion_draws, inputs, float(promo_cost_per_unit), n_draws, seed, percentiles, n_jobs)
+
+    result = pd.DataFrame({
+        'category': np.asarray(stats.index, dtype=object),
+        'promo_uplift_mean': promo_uplift_mean,
+        'promo_uplift_sd': promo_uplift_sd,
+        'promo_cost_per_unit': promo_cost_per_unit,
+        'baseline_units': inputs['units'].astype('int64'),
+        'baseline_revenue': inputs['revenue'].round(2),
+    })
+    return pd.concat([result, bands], axis=1)
+
+def _price_change_draws(inputs, price_change_pct, n_draws, rng):
+    """
+    Simulated units, revenue and revenue impact for every (SKU, draw), as (rows x draws) arrays.
+    """
+    elasticity = rng.normal(inputs['mean'][:, None], inputs['sd'][:, None], size=(len(inputs['mean']), n_draws))
+    volume_change_pct = price_change_pct * elasticity
+    # Cap the volume drop to 0
+    new_volume = np.where(volume_change_pct <= -1, 0.0, inputs['units'][:, None] * (1 + volume_change_pct))
+    new_revenue = new_volume * (inputs['price'] * (1 + price_change_pct))[:, None]
+
+    return {
+        'simulated_total_units': new_volume,
+        'simulated_revenue': new_revenue,
+        'revenue_impact': new_revenue - inputs['revenue'][:, None],
+    }
+
+def _promotion_draws(inputs, promo_cost_per_unit, n_draws, rng):
+    """
+    Simulated units, net revenue and net impact for every (category, draw), as (rows x draws) arrays.
+    """
+    uplift = rng.normal(inputs['mean'][:, None], inputs['sd'][:, None], size=(len(inputs['mean']), n_draws))
+    simulated_volume = inputs['units'][:, None] * np.maximum(1 + uplift, 0.0)
+    net_revenue = simulated_volume * (inputs['price'][:, None] - promo_cost_per_unit)
+
+    return {
+        'simulated_units': simulated_volume,
+        'simulated_net_revenue': net_revenue,
+        'net_revenue_impact': net_revenue - inputs['revenue'][:, None],
+    }
+
+def _monte_carlo_chunk(task):
+    """
+    Runs one chunk of rows and reduces the draws to percentiles. Top-level so it can run in a worker process.
+    """
+    draw_fn, inputs, parameter, n_draws, seed, percentiles = task
+    draws = draw_fn(inputs, parameter, n_draws, np.random.default_rng(seed))
+    return {metric: np.percentile(values, percentiles, axis=1).T for metric, values in draws.items()}
+
+def _run_monte_carlo(draw_fn, inputs, parameter, n_draws, seed, percentiles, n_jobs):
+    """
+    Splits the rows into chunks of at most MAX_DRAWS_PER_CHUNK draws, gives each chunk its own child seed
+    (so results do not depend on n_jobs), runs them sequentially or on a process pool, and returns a
+    dataframe of `<metric>_p<percentile>` columns aligned with the input rows.
+    """
+    n_rows = len(inputs['mean'])
+    chunk_rows = max(1, MAX_DRAWS_PER_CHUNK // n_draws)
+    # An empty input still runs one (empty) chunk so the output has its columns
+    starts = range(0, max(n_rows, 1), chunk_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+
+    tasks = [
+        (draw_fn, {name: values[start:start + chunk_rows] for name, values in inputs.items()}, parameter, n_draws, child, percentiles)
+        for start, child in zip(starts, seeds)
+    ]
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            chunks = list(pool.map(_monte_carlo_chunk, tasks))
+    else:
+        chunks = [_monte_carlo_chunk(task) for task in tasks]
+
+    bands = {}
+    for metric in chunks[0]:
+        values = np.concatenate([chunk[metric] for chunk in chunks])
+        for position, q in enumerate(percentiles):
+            bands[f'{metric}_p{q:g}'] = values[:, position].round(2)
+    return pd.DataFrame(bands)
+
+def _log_price_sums(frame: pd.DataFrame):
+    """
+    Per-SKU sums of x = log(price) and y = log(units_sold) over rows where both are positive.
+    """
+    positive = (frame['price'] > 0) & (frame['units_sold'] > 0)
+    x = np.log(frame['price'][positive].astype('float64'))
+    y = np.log(frame['units_sold'][positive].astype('float64'))
+
+    parts = pd.DataFrame({
+        'sku_id': frame['sku_id'][positive],
+        'n': 1,
+        'sum_x': x, 'sum_y': y,
+        'sum_xx': x * x, 'sum_xy': x * y, 'sum_yy': y * y,
+    })
+    return parts.groupby('sku_id').sum()
+
+def _stats_for(df, key: str, values):
+    """
+    Sufficient statistics (see rollups.sufficient_stats) for the requested `key` values, in request order.
+    """
+    values = list(dict.fromkeys(values))
+
+    if is_spark_frame(df):
+        stats = spark_backend.sufficient_stats(df, key, values)
+    elif is_duckdb_table(df):
+        stats = duckdb_backend.sufficient_stats(df, key, values)
+    elif isinstance(df, PreparedDataset):
+        stats = df.rollups.sku_stats if key == 'sku_id' else df.rollups.category_stats
+    else:
+        frame = as_frame(df)
+        stats = sufficient_stats(frame[frame[key].isin(values)], key)
+
+    return stats.loc[[value for value in values if value in stats.index]]
+
+def _grid(n_rows: int, first, second):
+    """
+    Cartesian product of stats rows x `first` x `second`, flattened into three aligned arrays.
+    """
+    rows, first, second = np.meshgrid(
+        np.arange(n_rows), np.asarray(first, dtype='float64'), np.asarray(second, dtype='float64'),
+        indexing='ij'
+    )
+    return rows.ravel(), first.ravel(), second.ravel()
+
+def _sku_totals(df: pd.DataFrame, sku_id: int):
+    """
+    Total revenue, total units and average price of a SKU, or None if the SKU has no rows.
+    """
+    # Filter for the specific SKU
+    sku_data = df[df['sku_id'] == sku_id]
+
+    if sku_data.empty:
+        return None
+    return sku_data['revenue'].sum(), sku_data['units_sold'].sum(), sku_data['price'].mean()
+
+def _category_totals(df: pd.DataFrame, category: str):
+    """
+    Non-promo units, non-promo revenue and average price of a category, or None if the category has no rows.
+    """
+    cat_data = df[df['category'] == category]
+
+    if cat_data.empty:
+        return None
+
+    non_promo = cat_data[cat_data['promo_flag'] == 0]
+    return non_promo['units_sold'].sum(), non_promo['revenue'].sum(), cat_data['price'].mean()
+
+def _indexed_sku_totals(sku_stats: pd.DataFrame, sku_id: int):
+    """
+    Same as _sku_totals, read from RollupCube.sku_stats.
+    """
+    if sku_id not in sku_stats.index:
+        return None
+    stats = sku_stats.loc[sku_id]
+    return stats['revenue'], stats['units_sold'], stats['price_sum'] / stats['price_count']
+
+def _indexed_category_totals(category_stats: pd.DataFrame, category: str):
+    """
+    Same as _category_totals, read from RollupCube.category_stats.
+    """
+    if category not in category_stats.index:
+        return None
+    stats = category_stats.loc[category]
+    return stats['non_promo_units'], stats['non_promo_revenue'], stats['price_sum'] / stats['price_count']
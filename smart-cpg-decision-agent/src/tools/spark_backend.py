@@ -0,0 +1,205 @@
+import pandas as pd
+
+# Spark expressions labelling each date with the last day of its period, matching src.calendar_keys
+PERIOD_EXPRESSIONS = {
+    'D': lambda F, d: d,
+    'W': lambda F, d: F.next_day(F.date_sub(d, 1), 'Sun'),
+    'M': lambda F, d: F.last_day(d),
+    'Q': lambda F, d: F.last_day(F.add_months(F.trunc(d, 'quarter'), 2)),
+}
+
+def _pyspark():
+    """
+    pyspark's functions module and Window, imported on first use so that importing the tools stays cheap.
+    """
+    from pyspark.sql import Window
+    from pyspark.sql import functions as F
+    return F, Window
+
+def is_spark_frame(df):
+    """
+    True if `df` is a Spark DataFrame (classic or Spark Connect), checked without importing pyspark.
+    """
+    return type(df).__module__.startswith('pyspark.sql')
+
+def calculate_category_trends(sdf, period: str):
+    """
+    Spark version of trend_analysis.calculate_category_trends for a canonical period ('D', 'W', 'M' or 'Q').
+    """
+    F, _ = _pyspark()
+    label = PERIOD_EXPRESSIONS[period](F, F.to_date('date'))
+    trends = sdf.groupBy(label.alias('date'), 'category').agg(
+        F.sum('units_sold').alias('total_units_sold'),
+        F.sum('revenue').alias('total_revenue')
+    ).orderBy('date', 'category').toPandas()
+
+    trends['date'] = pd.to_datetime(trends['date'])
+    return trends
+
+def compare_stores_performance(sdf, metric='revenue'):
+    """
+    Spark version of trend_analysis.compare_stores_performance.
+    """
+    F, _ = _pyspark()
+    return sdf.groupBy('store_id', 'store_region').agg(
+        F.sum('revenue').alias('total_revenue'),
+        F.sum('units_sold').alias('total_units_sold')
+    ).orderBy(F.col(f'total_{metric}').desc()).toPandas()
+
+def analyze_seasonality(sdf, category=None):
+    """
+    Spark version of trend_analysis.analyze_seasonality.
+    """
+    F, _ = _pyspark()
+    if category:
+        sdf = sdf.filter(F.col('category') == category)
+
+    return sdf.groupBy(F.month(F.to_date('date')).alias('month')).agg(
+        F.sum('revenue').alias('total_revenue')
+    ).orderBy(F.col('total_revenue').desc()).toPandas()
+
+def detect_sales_spikes(sdf, threshold=2.0, window=None):
+    """
+    Spark version of anomaly_detection.detect_sales_spikes. The per-series baseline is a window
+    aggregate, so only the spike rows are collected to the driver.
+    """
+    F, Window = _pyspark()
+    series = Window.partitionBy('sku_id', 'store_id')
+    if window is not None:
+        # Trailing `window` days, excluding the current day (range is in seconds)
+        day = F.to_timestamp(F.to_date('date')).cast('long')
+        series = series.orderBy(day).rangeBetween(-int(window) * 86400, -1)
+
+    units = F.col('units_sold').cast('double')
+    limit = F.avg(units).over(series) + threshold * F.stddev_samp(units).over(series)
+
+    return sdf.withColumn('_limit', limit) \
+        .filter(units > F.col('_limit')) \
+        .drop('_limit') \
+        .orderBy('date') \
+        .toPandas()
+
+def detect_stock_shortages(sdf, critical_level=50):
+    """
+    Spark version of anomaly_detection.detect_stock_shortages.
+    """
+    F, _ = _pyspark()
+    return sdf.filter(F.col('inventory_level') < critical_level) \
+        .orderBy('date', 'store_id', 'sku_id') \
+        .toPandas()
+
+def flag_anomalous_promotions(sdf, by_promo_type=False, holiday_adjusted=False, lift_ratio=False, min_lift=1.0):
+    """
+    Spark version of anomaly_detection.flag_anomalous_promotions. The (small) baseline tables are broadcast to the promo rows.
+    """
+    F, Window = _pyspark()
+    non_promo = sdf.filter(F.col('promo_flag') == 0)
+    baseline = non_promo.groupBy('sku_id', 'store_id') \
+        .agg(F.avg('units_sold').alias('baseline_avg_units'))
+
+    promo_days = sdf.filter(F.col('promo_flag') == 1)
+    merged = promo_days.join(F.broadcast(baseline), on=['sku_id', 'store_id'], how='left')
+
+    if holiday_adjusted:
+        is_holiday = F.when(F.col('holiday_flag') == 1, 1).otherwise(0).alias('_holiday')
+        holiday_baseline = non_promo.groupBy('sku_id', 'store_id', is_holiday) \
+            .agg(F.avg('units_sold').alias('_day_baseline'))
+        merged = merged.withColumn('_holiday', is_holiday) \
+            .join(F.broadcast(holiday_baseline), on=['sku_id', 'store_id', '_holiday'], how='left') \
+            .withColumn('baseline_avg_units', F.coalesce('_day_baseline', 'baseline_avg_units'))
+
+    # Division by a zero or missing baseline gives null, which avg skips
+    merged = merged.withColumn('lift', F.col('units_sold') / F.col('baseline_avg_units'))
+    expected = F.col('baseline_avg_units')
+    if by_promo_type:
+        merged = merged.withColumn('expected_units', expected * F.avg('lift').over(Window.partitionBy('promo_type')))
+        expected = F.col('expected_units')
+
+    if isinstance(min_lift, dict):
+        thresholds = F.create_map(*[F.lit(value) for item in min_lift.items() for value in item])
+        min_lift = F.coalesce(thresholds[F.col('promo_type')], F.lit(1.0))
+
+    # Keep the pandas column order: promo row columns, then the baseline and the optional columns
+    columns = [*promo_days.columns, 'baseline_avg_units'] + ['expected_units'] * by_promo_type + ['lift'] * lift_ratio
+    return merged.filter(F.col('units_sold') < expected * min_lift) \
+        .select(*columns) \
+        .orderBy('date') \
+        .toPandas()
+
+def sku_totals(sdf, sku_id: int):
+    """
+    Total revenue, total units and average price of a SKU, or None if the SKU has no rows.
+    """
+    F, _ = _pyspark()
+    row = sdf.filter(F.col('sku_id') == sku_id).agg(
+        F.count(F.lit(1)).alias('rows'),
+        F.sum('revenue').alias('revenue'),
+        F.sum('units_sold').alias('units_sold'),
+        F.avg('price').alias('price')
+    ).first()
+
+    if row['rows'] == 0:
+        return None
+    return row['revenue'], row['units_sold'], row['price']
+
+def category_totals(sdf, category: str):
+    """
+    Non-promo units, non-promo revenue and average price of a category, or None if the category has no rows.
+    """
+    F, _ = _pyspark()
+    non_promo = F.col('promo_flag') == 0
+    row = sdf.filter(F.col('category') == category).agg(
+        F.count(F.lit(1)).alias('rows'),
+        F.sum(F.when(non_promo, F.col('units_sold')).otherwise(0)).alias('units_sold'),
+        F.sum(F.when(non_promo, F.col('revenue')).otherwise(0)).alias('revenue'),
+        F.avg('price').alias('price')
+    ).first()
+
+    if row['rows'] == 0:
+        return None
+    return row['units_sold'], row['revenue'], row['price']
+
+def sufficient_stats(sdf, key: str, values):
+    """
+    Spark version of rollups.sufficient_stats restricted to the given `key` values, collected as a small pandas frame.
+    """
+    F, _ = _pyspark()
+    promo = F.col('promo_flag') == 1
+    non_promo = F.col('promo_flag') == 0
+    units = F.col('units_sold').cast('double')
+    revenue = F.col('revenue').cast('double')
+
+    stats = sdf.filter(F.col(key).isin(list(values))).groupBy(key).agg(
+        F.count(F.lit(1)).alias('rows'),
+        F.sum(units).alias('units_sold'),
+        F.sum(revenue).alias('revenue'),
+        F.sum(F.col('price').cast('double')).alias('price_sum'),
+        F.count('price').alias('price_count'),
+        F.sum(F.when(promo, units).otherwise(0.0)).alias('promo_units'),
+        F.sum(F.when(promo, revenue).otherwise(0.0)).alias('promo_revenue'),
+        F.sum(F.when(non_promo, units).otherwise(0.0)).alias('non_promo_units'),
+        F.sum(F.when(non_promo, revenue).otherwise(0.0)).alias('non_promo_revenue')
+    ).toPandas()
+
+    return stats.set_index(key)
+
+def log_price_sums(sdf, sku_ids=None):
+    """
+    Spark version of scenario_simulation._log_price_sums: per-SKU log-log regression sums, collected as a small pandas frame.
+    """
+    F, _ = _pyspark()
+    if sku_ids is not None:
+        sdf = sdf.filter(F.col('sku_id').isin([int(sku_id) for sku_id in sku_ids]))
+
+    x = F.log(F.col('price').cast('double'))
+    y = F.log(F.col('units_sold').cast('double'))
+    sums = sdf.filter((F.col('price') > 0) & (F.col('units_sold') > 0)).groupBy('sku_id').agg(
+        F.count(F.lit(1)).alias('n'),
+        F.sum(x).alias('sum_x'),
+        F.sum(y).alias('sum_y'),
+        F.sum(x * x).alias('sum_xx'),
+        F.sum(x * y).alias('sum_xy'),
+        F.sum(y * y).alias('sum_yy')
+    ).toPandas()
+
+    return sums.set_index('sku_id').sort_index()
@@ -1,18 +1,43 @@
 import pandas as pd
 import numpy as np
+from src.calendar_keys import PERIOD_ALIASES, period_key, month_key
+from src.dataset import PreparedDataset
+from src.tools import duckdb_backend, spark_backend
+from src.tools.duckdb_backend import is_duckdb_table
+from src.tools.spark_backend import is_spark_frame
 
 def calculate_category_trends(df: pd.DataFrame, time_period='W'):
     """
     Calculates sales volume and revenue trends over a specified period (default Weekly 'W').
-    This function expects a pandas DataFrame for quick heuristic calculation within tools.
+    Accepts a pandas DataFrame or a PreparedDataset; the input is never modified.
+    For a PreparedDataset the trends are re-aggregated from the daily rollup instead of the raw rows.
+    Spark DataFrames (on the cluster) and DuckDB tables (in SQL) are aggregated for the 'D', 'W', 'M' and 'Q' periods.
     """
-    # Group by the specified period and category
-    df['date'] = pd.to_datetime(df['date'])
+    period = PERIOD_ALIASES.get(time_period)
 
-    # Resample by time_period and category
-    trends = df.groupby([pd.Grouper(key='date', freq=time_period), 'category']).agg(
-        total_units_sold=('units_sold', 'sum'),
-        total_revenue=('revenue', 'sum')
+    if is_spark_frame(df) or is_duckdb_table(df):
+        if period is None:
+            raise ValueError(f"Time period '{time_period}' is not supported for Spark DataFrames or DuckDB tables. Use 'D', 'W', 'M' or 'Q'.")
+        backend = spark_backend if is_spark_frame(df) else duckdb_backend
+        return backend.calculate_category_trends(df, period)
+
+    if isinstance(df, PreparedDataset):
+        frame, units, revenue = df.rollups.daily_category, 'total_units_sold', 'total_revenue'
+    else:
+        frame, units, revenue = df, 'units_sold', 'revenue'
+
+    if period is not None:
+        # Group by the period label and category
+        keys = [period_key(frame, period).rename('date'), 'category']
+        grouped = frame.groupby(keys, observed=True)
+    else:
+        # Any other pandas frequency string is resampled from the parsed dates
+        view = frame[['category', units, revenue]].assign(date=pd.to_datetime(frame['date']))
+        grouped = view.groupby([pd.Grouper(key='date', freq=time_period), 'category'], observed=True)
+
+    trends = grouped.agg(
+        total_units_sold=(units, 'sum'),
+        total_revenue=(revenue, 'sum')
     ).reset_index()
 
     return trends
@@ -20,11 +45,20 @@ def calculate_category_trends(df: pd.DataFrame, time_period='W'):
 def compare_stores_performance(df: pd.DataFrame, metric='revenue'):
     """
     Compares the overall performance of all stores based on a given metric (revenue or units_sold).
+    For a PreparedDataset the store rollup is used directly.
     """
-    store_performance = df.groupby(['store_id', 'store_region']).agg(
-        total_revenue=('revenue', 'sum'),
-        total_units_sold=('units_sold', 'sum')
-    ).reset_index()
+    if is_spark_frame(df):
+        return spark_backend.compare_stores_performance(df, metric=metric)
+    if is_duckdb_table(df):
+        return duckdb_backend.compare_stores_performance(df, metric=metric)
+
+    if isinstance(df, PreparedDataset):
+        store_performance = df.rollups.stores
+    else:
+        store_performance = df.groupby(['store_id', 'store_region'], observed=True).agg(
+            total_revenue=('revenue', 'sum'),
+            total_units_sold=('units_sold', 'sum')
+        ).reset_index()
 
     store_performance = store_performance.sort_values(by=f'total_{metric}', ascending=False)
     return store_performance
@@ -32,18 +66,26 @@ def compare_stores_performance(df: pd.DataFrame, metric='revenue'):
 def analyze_seasonality(df: pd.DataFrame, category=None):
     """
     Identifies the best selling months for a given category (or overall).
+    For a PreparedDataset the months are re-aggregated from the daily rollup; the input is never modified.
     """
-    df['date'] = pd.to_datetime(df['date'])
-    df['month'] = df['date'].dt.month
+    if is_spark_frame(df):
+        return spark_backend.analyze_seasonality(df, category=category)
+    if is_duckdb_table(df):
+        return duckdb_backend.analyze_seasonality(df, category=category)
 
-    if category:
-        filtered_df = df[df['category'] == category]
+    if isinstance(df, PreparedDataset):
+        frame, revenue = df.rollups.daily_category, 'total_revenue'
     else:
-        filtered_df = df
+        frame, revenue = df, 'revenue'
 
-    monthly_sales = filtered_df.groupby('month').agg(
-        total_revenue=('revenue', 'sum')
-    ).reset_index()
+    sales = frame[revenue]
+    month = month_key(frame)
+
+    if category:
+        in_category = frame['category'] == category
+        sales, month = sales[in_category], month[in_category]
+
+    monthly_sales = sales.groupby(month.rename('month')).sum().rename('total_revenue').reset_index()
 
     monthly_sales = monthly_sales.sort_values(by='total_revenue', ascending=False)
     return monthly_sales
@@ -1,68 +1,129 @@
 import argparse
 import sys
 import os
-import pandas as pd
 
 # Ensure src modules can be imported
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from src.data_loader import DataLoader
-from src.agent.agent_core import create_cpg_agent
+# Only the startup helper is imported up front: pandas, the data backends and LangChain load in
+# the background (see BackgroundStartup), so `--help` and the first prompt appear immediately
+from src.ui.startup import BackgroundStartup
 
-def main():
-    parser = argparse.ArgumentParser(description="CLI for the Smart CPG Decision Support Agent.")
-    parser.add_argument("--data_path", type=str, default="../../data/cpg_sales_data.parquet", help="Path to the synthetic data.")
-    args = parser.parse_args()
+def load_dataset(args, data_path):
+    """
+    Returns the dataset and the memory report of its compact load (None when nothing was compacted).
+    """
+    import pandas as pd
+    from src.data_loader import DataLoader
+    from src.dataset import PreparedDataset
 
-    data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), args.data_path))
+    if not os.path.exists(data_path):
+        print(f"Data file {data_path} not found. Creating a dummy dataframe for testing CLI.")
+        df = pd.DataFrame({
+            'date': ['2022-01-01'], 'store_id': [1], 'store_region': ['North'],
+            'sku_id': [101], 'category': ['Beverages'], 'units_sold': [18],
+            'revenue': [90.0], 'promo_flag': [0], 'promo_type': ['None'],
+            'price': [5.0], 'inventory_level': [550], 'store_size': ['Medium'],
+            'holiday_flag': [0]
+        })
+        return PreparedDataset(df), None
+    if args.backend == "duckdb":
+        # Queried in place by the tools; nothing is loaded into memory
+        return DataLoader(backend="duckdb", database=args.database).load_data(data_path), None
 
     # Load data using Pandas for CLI
-    print("Loading synthetic data...")
-    try:
-        if not os.path.exists(data_path):
-            print(f"Data file {data_path} not found. Creating a dummy dataframe for testing CLI.")
-            df = pd.DataFrame({
-                'date': ['2022-01-01'], 'store_id': [1], 'store_region': ['North'],
-                'sku_id': [101], 'category': ['Beverages'], 'units_sold': [18],
-                'revenue': [90.0], 'promo_flag': [0], 'promo_type': ['None'],
-                'price': [5.0], 'inventory_level': [550], 'store_size': ['Medium'],
-                'holiday_flag': [0]
-            })
-        else:
-            dl = DataLoader(use_spark=False)
-            df = dl.load_data(data_path)
+    dl = DataLoader(use_spark=False)
+    df = dl.load_data(data_path, compact=True)
+    return PreparedDataset(df, fingerprint=dl.last_fingerprint), dl.last_memory_report
 
-        print(f"Data loaded successfully. Total Records: {len(df)}")
-    except Exception as e:
-        print(f"Failed to load data: {e}")
-        sys.exit(1)
+def build_sessions(loaded, args):
+    from src.agent.runner import AgentSessions
+    from src.agent.tool_cache import ToolResultCache
+    from src.agent.result_store import ResultStore
 
-    # Initialize Agent
-    print("Initializing Agentic AI loop...")
+    dataset, _ = loaded
+    sessions = AgentSessions(
+        dataset,
+        tool_cache=ToolResultCache(persist_dir=args.cache_dir),
+        result_store=ResultStore(token_budget=args.token_budget),
+        mode=args.mode
+    )
+    # Build the agent now, so a missing LLM key is reported before the first question is answered
+    sessions.get("cli")
+    return sessions
+
+def wait_until_ready(startup):
+    """
+    Waits for the background startup and returns ((dataset, memory report), sessions), or exits with
+    the reason it failed.
+    """
+    if not startup.ready.is_set():
+        print(f"(Still {startup.stage}...)")
     try:
-        agent = create_cpg_agent(df)
-        print("Agent initialized successfully!")
+        loaded, sessions = startup.result()
     except Exception as e:
-        print(f"Failed to initialize agent: {e}")
-        print("Please ensure you have set OPENAI_API_KEY, GOOGLE_API_KEY, or HUGGINGFACEHUB_API_TOKEN in your environment.")
+        if startup.stage == "loading data":
+            print(f"Failed to load data: {e}")
+        else:
+            print(f"Failed to initialize agent: {e}")
+            print("Please ensure you have set OPENAI_API_KEY, GOOGLE_API_KEY, or HUGGINGFACEHUB_API_TOKEN in your environment.")
         sys.exit(1)
+    return loaded, sessions
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI for the Smart CPG Decision Support Agent.")
+    parser.add_argument("--data_path", type=str, default="../../data/cpg_sales_data.parquet", help="Path to the synthetic data.")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Directory to persist tool results in across runs.")
+    parser.add_argument("--token_budget", type=int, default=800, help="Approximate token budget for each tool result shown to the agent.")
+    parser.add_argument("--backend", choices=["pandas", "duckdb"], default="pandas", help="'duckdb' queries the data on disk instead of loading it into memory.")
+    parser.add_argument("--database", type=str, default=None, help="DuckDB file to store the loaded data in across runs (with --backend duckdb).")
+    parser.add_argument("--mode", choices=["react", "plan"], default="react", help="'plan' plans all tool calls up front and runs them concurrently, for multi-part questions.")
+    parser.add_argument("--profile", action="store_true", help="Print the time, rows, memory and tokens of every tool and LLM call after each answer.")
+    parser.add_argument("--trace_file", type=str, default=None, help="Append every turn's tool and LLM call spans to this file as JSON lines.")
+    args = parser.parse_args()
+
+    data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), args.data_path))
+
+    if args.profile or args.trace_file:
+        from src.telemetry import telemetry, format_turn, trace_memory
+        telemetry.path = args.trace_file or telemetry.path
+        # Peak memory per tool call slows allocation heavy tools, so only when profiling
+        trace_memory(args.profile)
+
+    # Load the data and initialize the agent in the background while the prompt is shown
+    print("Loading synthetic data and initializing the Agentic AI loop in the background...")
+    startup = BackgroundStartup(lambda: load_dataset(args, data_path), lambda loaded: build_sessions(loaded, args))
 
     print("\n" + "="*50)
     print("Welcome to the CPG Decision Support Agent CLI.")
     print("Type 'exit' or 'quit' to terminate the session.")
     print("="*50 + "\n")
 
+    sessions = None
     while True:
         try:
-            query = input("Ask the agent: ")
+            if startup.failed:
+                wait_until_ready(startup)
+            # The prompt doubles as the ready signal
+            status = "" if startup.ready.is_set() else f" ({startup.stage}...)"
+            query = input(f"Ask the agent{status}: ")
             if query.lower() in ['exit', 'quit']:
                 print("Goodbye!")
                 break
 
+            if sessions is None:
+                (_, memory_report), sessions = wait_until_ready(startup)
+                print(f"Data loaded successfully. Total Records: {len(sessions.dataset)}")
+                if memory_report:
+                    print(f"Compact load saved {memory_report['bytes_saved'] / 1e6:.1f} MB of memory.")
+
             print("\nThinking...")
-            response = agent.run(query)
+            response = sessions.run("cli", query)
             print("\nAgent Response:")
             print(response)
+            if args.profile:
+                print("\nProfile:")
+                print(format_turn(telemetry.last_turn("cli")))
             print("\n" + "-"*50 + "\n")
 
         except KeyboardInterrupt:
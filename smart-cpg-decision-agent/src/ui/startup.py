@@ -0,0 +1,67 @@
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Modules the agent needs that are slow to import (LangChain); imported while the data loads
+AGENT_MODULES = ('src.agent.agent_core',)
+
+# Heavy dependencies that must load on first use only, never when a front end or the tools are imported
+LAZY_MODULES = (
+    'pyspark',
+    'duckdb',
+    'langchain.agents',
+    'langchain.memory',
+    'langchain_openai',
+    'langchain_google_genai',
+    'langchain_huggingface',
+)
+
+class BackgroundStartup:
+    """
+    Loads the dataset and builds the agent sessions off the main thread, so a front end can show
+    itself, and take the first question, while they load.
+
+    `load_dataset()` runs while the agent modules are imported alongside it, then
+    `build_sessions(dataset)` runs. `ready` is set once both are done, or as soon as one fails;
+    `stage` names the step in progress for a status line. `result()` waits for them and returns
+    (dataset, sessions), re-raising the error if one failed. `timings` records each step in seconds.
+    """
+    def __init__(self, load_dataset, build_sessions):
+        self.ready = threading.Event()
+        self.stage = "loading data"
+        self.timings = {}
+        self._started = time.perf_counter()
+
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="startup")
+        self._imports = executor.submit(self._timed, "imports", _import_agent_modules)
+        self._future = executor.submit(self._run, load_dataset, build_sessions)
+        self._future.add_done_callback(lambda _: self.ready.set())
+        executor.shutdown(wait=False)
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+    @property
+    def failed(self):
+        return self.ready.is_set() and self._future.exception() is not None
+
+    def _run(self, load_dataset, build_sessions):
+        dataset = self._timed("dataset", load_dataset)
+        self.stage = "building the agent"
+        self._imports.result()
+        sessions = self._timed("agent", build_sessions, dataset)
+        self.stage = "ready"
+        self.timings["total"] = time.perf_counter() - self._started
+        return dataset, sessions
+
+    def _timed(self, name, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+def _import_agent_modules():
+    for module in AGENT_MODULES:
+        importlib.import_module(module)
@@ -1,37 +1,96 @@
 import streamlit as st
-import pandas as pd
 import os
 import sys
+import threading
+import uuid
 
 # Ensure src modules can be imported
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
-from src.data_loader import DataLoader
-from src.agent.agent_core import create_cpg_agent
+# The data backends and LangChain are imported by the background startup, not here, so the page renders at once
+from src.ui.startup import BackgroundStartup
+
+# Assume the data file is in the root data folder
+DATA_PATH = os.path.join(os.path.dirname(__file__), '../../data/cpg_sales_data.parquet')
 
 # Initialize the DataLoader (forcing pandas for local Streamlit use to simplify dependencies)
-@st.cache_resource
 def load_app_data():
+    """
+    Returns the shared dataset and the watermark of what it has ingested so far (None for the dummy data).
+    Runs in the background startup thread, so it must not call Streamlit.
+    """
+    import pandas as pd
+    from src.data_loader import DataLoader
+    from src.dataset import PreparedDataset
+
     dl = DataLoader(use_spark=False)
-    # Assume the data file is in the root data folder
-    data_path = os.path.join(os.path.dirname(__file__), '../../data/cpg_sales_data.parquet')
 
     # If the file doesn't exist (e.g., this is a fresh clone), create a small dummy df for the UI to load
-    if not os.path.exists(data_path):
-        st.warning(f"Data file {data_path} not found. Using a dummy dataframe for testing UI.")
-        return pd.DataFrame({
+    if not os.path.exists(DATA_PATH):
+        return PreparedDataset(pd.DataFrame({
             'date': ['2022-01-01'], 'store_id': [1], 'store_region': ['North'],
             'sku_id': [101], 'category': ['Beverages'], 'units_sold': [18],
             'revenue': [90.0], 'promo_flag': [0], 'promo_type': ['None'],
             'price': [5.0], 'inventory_level': [550], 'store_size': ['Medium'],
             'holiday_flag': [0]
-        })
+        })), None
+
+    # Compact dtypes keep the cached frame small across all sessions; calendar keys are derived once here
+    df, watermark = dl.load_new(DATA_PATH, compact=True)
+    return PreparedDataset(df, fingerprint=dl.last_fingerprint), watermark
+
+def refresh_app_data(dataset, watermark):
+    """
+    Appends the data that arrived since `watermark` (updated in place) and returns the number of new rows.
+
+    The watermark and dataset are shared by every browser session: the read, append and watermark
+    update run under one lock, and a refresh that waited for another one to finish skips the load,
+    so the same new rows are never appended twice.
+    """
+    from src.data_loader import DataLoader
+
+    seen = dict(watermark)
+    with get_refresh_lock():
+        if watermark != seen:
+            return 0
+        dl = DataLoader(use_spark=False)
+        new_rows, updated = dl.load_new(DATA_PATH, watermark, compact=True)
+        if new_rows is None:
+            return 0
+
+        dataset.append(new_rows, fingerprint=dl.last_fingerprint)
+        watermark.update(updated)
+        # Cached tool results describe the old data
+        get_tool_cache().bind(dataset.fingerprint)
+        return len(new_rows)
 
-    return dl.load_data(data_path)
+@st.cache_resource
+def get_refresh_lock():
+    # Cached rather than a module global: Streamlit re-executes this script on every rerun
+    return threading.Lock()
 
 @st.cache_resource
-def get_agent(_df):
-    return create_cpg_agent(_df)
+def get_tool_cache():
+    from src.agent.tool_cache import ToolResultCache
+
+    # Persisted next to the data so a restarted app starts warm
+    cache_dir = os.path.join(os.path.dirname(__file__), '../../.cache/tool_results')
+    return ToolResultCache(persist_dir=cache_dir)
+
+def build_sessions(loaded, tool_cache):
+    from src.agent.runner import AgentSessions
+
+    # Shared by all browser sessions: the dataset, tool cache and tool thread pool.
+    # Each session gets its own agent and memory (keyed by st.session_state.session_id).
+    dataset, _ = loaded
+    return AgentSessions(dataset, tool_cache=tool_cache)
+
+@st.cache_resource
+def start_app(_tool_cache):
+    """
+    Starts loading the data and the agent once per server process; every browser session shares the result.
+    """
+    return BackgroundStartup(load_app_data, lambda loaded: build_sessions(loaded, _tool_cache))
 
 def main():
     st.set_page_config(page_title="CPG Decision Support Agent", page_icon="📈", layout="wide")
@@ -39,19 +98,45 @@ def main():
     st.title("📈 Smart CPG Decision Support Agent")
     st.markdown("Interact with the Agentic AI to analyze multi-store sales data, simulate scenarios, and generate strategy memos.")
 
-    # Load Data
-    with st.spinner("Loading synthetic sales data..."):
-        df = load_app_data()
+    # Load Data: started in the background on the first page view, so later views (and reruns) find it ready
+    startup = start_app(get_tool_cache())
+    if not startup.ready.is_set():
+        with st.spinner(f"Loading synthetic sales data and the agent ({startup.stage})..."):
+            startup.ready.wait()
+    try:
+        (dataset, watermark), sessions = startup.result()
+    except Exception as e:
+        st.error(f"Failed to load the data or the agent: {str(e)}")
+        # Not kept for later page views: the next rerun starts over (e.g. once the data file exists)
+        start_app.clear()
+        st.stop()
+
+    if not os.path.exists(DATA_PATH):
+        st.warning(f"Data file {DATA_PATH} not found. Using a dummy dataframe for testing UI.")
+
+    if watermark is not None and st.sidebar.button("Check for new data"):
+        with st.spinner("Loading new data..."):
+            st.sidebar.write(f"Appended {refresh_app_data(dataset, watermark):,} new rows.")
+    df = dataset.df
 
     st.sidebar.header("Data Overview")
     st.sidebar.write(f"**Total Records:** {len(df)}")
+    st.sidebar.write(f"**Memory:** {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
     st.sidebar.write(f"**Unique Stores:** {df['store_id'].nunique()}")
     st.sidebar.write(f"**Unique SKUs:** {df['sku_id'].nunique()}")
     st.sidebar.write(f"**Categories:** {', '.join(df['category'].unique())}")
+    st.sidebar.write(f"**Startup:** {startup.timings['total']:.1f}s (data {startup.timings['dataset']:.1f}s, agent {startup.timings['agent']:.1f}s)")
+
+    cache_stats = get_tool_cache().stats()
+    st.sidebar.header("Tool Cache")
+    st.sidebar.write(f"**Hits / Misses:** {cache_stats['hits']} / {cache_stats['misses']} ({cache_stats['hit_rate']:.0%})")
+    st.sidebar.write(f"**Entries:** {cache_stats['entries']} ({cache_stats['bytes'] / 1e6:.1f} MB)")
 
     # Initialize session state for chat history
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())
 
     # Display chat messages from history on app rerun
     for message in st.session_state.messages:
@@ -60,7 +145,8 @@ def main():
 
     # Initialize the LangChain Agent
     try:
-        agent = get_agent(df)
+        # Build the agent now, so a missing LLM key is reported before the first question
+        agent = sessions.get(st.session_state.session_id)
 
         # Accept user input
         if prompt := st.chat_input("Ask the agent to analyze trends or simulate a scenario..."):
@@ -74,7 +160,7 @@ def main():
                 with st.spinner("Agent is thinking and using tools..."):
                     try:
                         # Run the agent
-                        response = agent.run(prompt)
+                        response = sessions.run(st.session_state.session_id, prompt)
                         st.markdown(response)
                         # Add assistant response to chat history
                         st.session_state.messages.append({"role": "assistant", "content": response})
@@ -82,6 +168,38 @@ def main():
                         st.error(f"Error executing agent: {str(e)}")
                         st.session_state.messages.append({"role": "assistant", "content": f"I encountered an error: {str(e)}"})
 
+        memory_stats = agent.memory.metrics()
+        st.sidebar.header("Conversation Memory")
+        st.sidebar.write(f"**History sent per turn:** ~{memory_stats['last_history_tokens']} tokens (max {memory_stats['max_history_tokens']})")
+        st.sidebar.write(f"**Summarized turns:** {memory_stats['summarized_turns']}")
+
+        from src.genai.llm_interface import llm_metrics
+        llm_stats = llm_metrics()
+        st.sidebar.header("LLM Calls")
+        st.sidebar.write(f"**Calls:** {llm_stats['latency']['calls']} (p50 {llm_stats['latency']['p50_s']:.2f}s, p95 {llm_stats['latency']['p95_s']:.2f}s)")
+        if llm_stats['cache']:
+            st.sidebar.write(f"**Response cache hits:** {llm_stats['cache']['hit_rate']:.0%} of {llm_stats['cache']['hits'] + llm_stats['cache']['misses']}")
+
+        # Timing panel: where the last answer of this session spent its time, and the slowest calls overall
+        from src.telemetry import telemetry
+        last_turn = telemetry.last_turn(st.session_state.session_id)
+        if last_turn is not None:
+            turn_stats = last_turn.summary()
+            with st.expander(f"Timing of the last answer: {turn_stats['wall_s']:.2f}s"):
+                st.write(
+                    f"**LLM:** {turn_stats['llm_calls']} calls, {turn_stats['llm_s']:.2f}s, "
+                    f"{turn_stats['prompt_tokens']:,} prompt / {turn_stats['completion_tokens']:,} completion tokens"
+                )
+                st.write(
+                    f"**Tools:** {turn_stats['tool_calls']} calls, {turn_stats['tool_s']:.2f}s, {turn_stats['cache_hits']} cached, "
+                    f"{turn_stats['dataset_rows']:,} dataset rows"
+                )
+                st.dataframe(last_turn.span_rows(), use_container_width=True)
+        hot_spots = telemetry.hot_spots()
+        if len(hot_spots):
+            st.sidebar.header("Hot Paths")
+            st.sidebar.dataframe(hot_spots.head(5), use_container_width=True)
+
     except Exception as e:
         st.error(f"Failed to initialize the Agent. Have you set your LLM API keys in the environment? Error: {str(e)}")
         st.info("Set OPENAI_API_KEY, GOOGLE_API_KEY, or HUGGINGFACEHUB_API_TOKEN in your terminal before running Streamlit.")
@@ -0,0 +1,292 @@
+import pytest
+import pandas as pd
+from src.agent.tool_args import normalize_tool_input
+from src.agent.tool_cache import ToolResultCache
+from src.agent.result_store import ResultStore, estimate_tokens
+from src.dataset import PreparedDataset
+
+@pytest.fixture
+def sales_data():
+    return pd.DataFrame({
+        'date': ['2022-01-01', '2022-01-02', '2022-02-03', '2022-02-04'],
+        'store_id': [1, 2, 1, 2], 'store_region': ['North', 'South', 'North', 'South'],
+        'sku_id': [101, 101, 102, 102], 'category': ['Beverages', 'Beverages', 'Snacks', 'Snacks'],
+        'units_sold': [10, 20, 5, 8], 'revenue': [50.0, 100.0, 20.0, 32.0],
+        'promo_flag': [0, 1, 0, 1], 'promo_type': ['None', 'BOGO', 'None', 'Discount'],
+        'price': [5.0, 5.0, 4.0, 4.0], 'inventory_level': [550, 30, 70, 20],
+        'store_size': ['Medium', 'Large', 'Medium', 'Large'], 'holiday_flag': [0, 0, 1, 0]
+    })
+
+def test_normalize_tool_input():
+    assert {normalize_tool_input('CategoryTrends', raw) for raw in ['W', ' w ', 'weekly', "'W'"]} == {'W'}
+    assert normalize_tool_input('StorePerformance', ' Units ') == 'units_sold'
+    assert normalize_tool_input('SimulatePriceChange', ' 101, 0.10 ,-1.5') == '101,0.1,-1.5'
+    assert normalize_tool_input('ScenarioGrid', '{"b": 1, "a": [2]}') == normalize_tool_input('ScenarioGrid', '{"a":[2],"b":1}')
+    # Unparseable input reaches the tool (stripped) so it can report the error
+    assert normalize_tool_input('SalesSpikes', ' high ') == 'high'
+    assert normalize_tool_input('FailedPromotions', 'Promo Type, holidays') == 'holiday,promo_type'
+    assert normalize_tool_input('FailedPromotions', 'None') == ''
+
+def test_tool_cache_hits_lru_and_rebinding():
+    calls = []
+    cache = ToolResultCache(max_entries=2)
+    cache.bind('v1')
+    trends = cache.wrap('CategoryTrends', lambda period: calls.append(period) or f"trends {period}")
+
+    assert trends('weekly') == "trends W"
+    assert trends(' W ') == "trends W"
+    assert calls == ['W']
+    assert cache.stats()['hits'] == 1
+
+    trends('M')
+    trends('Q')
+    # 'W' was least recently used and is evicted at max_entries=2
+    trends('W')
+    assert calls == ['W', 'M', 'Q', 'W']
+
+    cache.bind('v2')
+    assert cache.stats()['entries'] == 0
+
+def test_tool_cache_persists_to_disk(tmp_path):
+    cache = ToolResultCache(persist_dir=str(tmp_path))
+    cache.bind('v1')
+    cache.wrap('StockShortages', lambda level: f"below {level}")('50')
+
+    restarted = ToolResultCache(persist_dir=str(tmp_path))
+    restarted.bind('v1')
+    tool = restarted.wrap('StockShortages', lambda level: pytest.fail("should be served from disk"))
+    assert tool('50.0') == "below 50"
+
+    # Data changed: persisted entries for the old fingerprint are dropped
+    restarted.bind('v2')
+    assert list(tmp_path.glob('*.pkl')) == []
+
+def test_agent_tools_are_memoized(monkeypatch, sales_data):
+    pytest.importorskip("langchain")
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from src.agent import agent_core
+
+    monkeypatch.setattr(agent_core, "get_llm", lambda: FakeListChatModel(responses=["unused"]))
+    cache = ToolResultCache()
+    dataset = PreparedDataset(sales_data)
+    agent = agent_core.create_cpg_agent(dataset, tool_cache=cache)
+    tools = {tool.name: tool for tool in agent.tools}
+
+    assert tools['CategoryTrends'].run('weekly') == tools['CategoryTrends'].run('W')
+    assert cache.stats() == {**cache.stats(), "hits": 1, "misses": 1}
+    assert cache.fingerprint == dataset.fingerprint
+    assert 'ResultPage' in tools
+
+def test_result_store_summarizes_large_results():
+    frame = pd.DataFrame({
+        'store_id': [1, 2] * 500, 'category': ['Beverages', 'Snacks', 'Snacks', 'Dairy'] * 250,
+        'units_sold': range(1000),
+    })
+    store = ResultStore(token_budget=300, top_k=5)
+
+    text = store.summarize(frame, 'SalesSpikes', sort_by='units_sold')
+    assert estimate_tokens(text) <= 300
+    assert "returned 1,000 rows" in text and "Output truncated: showing" in text
+    assert "Snacks (500)" in text
+    # Top rows are the largest by units_sold
+    assert text.index(" 999") < text.index(" 998")
+
+    handle = text.split("result handle: ")[1].split(")")[0]
+    assert store.get(handle) is frame
+    assert handle in store.summarize(frame, "SalesSpikes")
+
+    first_page = store.page_tool_input(f"{handle},1")
+    assert estimate_tokens(first_page) <= 300
+    assert f"'{handle},2'" in first_page
+    assert "Unknown or expired" in store.page_tool_input("R99,1")
+
+def test_result_store_returns_small_results_in_full():
+    frame = pd.DataFrame({'month': [1, 2], 'total_revenue': [10.0, 20.0]})
+    store = ResultStore()
+    assert store.summarize(frame) == frame.to_string()
+    assert store.summarize({'revenue_impact': 1.0}) == {'revenue_impact': 1.0}
+
+def test_scenario_grid_rejects_bad_or_oversized_ranges(sales_data):
+    pytest.importorskip("langchain")
+    from src.agent.agent_core import MAX_GRID_CELLS, run_scenario_grid
+
+    grid = run_scenario_grid(sales_data, '{"sku_ids": [101, 102], "price_changes": {"start": -0.1, "stop": 0.1, "step": 0.1}}')
+    assert sorted(grid['price_change_pct'].unique()) == [-0.1, 0.0, 0.1] and len(grid) == 6
+
+    for bad in ['{"start": -0.2, "stop": 0.2, "step": 0}', '{"start": 0.2, "stop": -0.2, "step": 0.1}', '{"start": -0.2, "stop": 0.2, "step": -0.1}']:
+        with pytest.raises(ValueError, match="step > 0 and stop >= start"):
+            run_scenario_grid(sales_data, f'{{"sku_ids": [101], "price_changes": {bad}}}')
+    with pytest.raises(ValueError, match="400,000,001 values"):
+        run_scenario_grid(sales_data, '{"sku_ids": [101], "price_changes": {"start": -0.2, "stop": 0.2, "step": 1e-9}}')
+    # Each axis fits, but not their product
+    with pytest.raises(ValueError, match=f"at most {MAX_GRID_CELLS:,}"):
+        run_scenario_grid(sales_data, '{"sku_ids": {"start": 1, "stop": 1000, "step": 1}, "price_changes": {"start": 0, "stop": 0.5, "step": 0.01}}')
+
+def test_sessions_run_concurrently_with_separate_memory(sales_data):
+    pytest.importorskip("langchain")
+    import asyncio
+    import time
+    from src.agent.runner import AgentSessions
+    from src.genai.stub_llm import StubChatModel
+
+    sessions = AgentSessions(PreparedDataset(sales_data), llm_factory=lambda: StubChatModel(latency=0.2), verbose=False)
+    questions = ["Any sales spikes?", "Low stock?", "Store ranking?", "Trends?", "Seasonality?"]
+
+    async def ask_all():
+        return await asyncio.gather(*(sessions.arun(i, q) for i, q in enumerate(questions)))
+
+    start = time.perf_counter()
+    answers = asyncio.run(ask_all())
+    # Two LLM calls per turn: run one after another the five turns would take at least 2s
+    assert time.perf_counter() - start < 1.5
+    assert all(answer.startswith("Based on the data") for answer in answers)
+
+    sessions.run(0, "And the trends?")
+    assert len(sessions.get(0).memory.chat_memory.messages) == 4
+    assert len(sessions.get(1).memory.chat_memory.messages) == 2
+    sessions.close()
+
+def test_sessions_are_evicted_when_idle_or_beyond_the_limit(sales_data):
+    pytest.importorskip("langchain")
+    import time
+    from src.agent.runner import AgentSessions
+    from src.genai.stub_llm import StubChatModel
+
+    sessions = AgentSessions(PreparedDataset(sales_data), llm_factory=StubChatModel, verbose=False, max_sessions=2, idle_seconds=None)
+    first = sessions.get("a")
+    sessions.get("b")
+    sessions.get("a")
+    sessions.get("c")
+    # "b" was the least recently used
+    assert len(sessions) == 2 and sessions.get("a") is first
+    assert "b" not in sessions._sessions
+
+    sessions.max_sessions, sessions.idle_seconds = 10, 0.05
+    time.sleep(0.1)
+    sessions.get("d")
+    assert len(sessions) == 1 and sessions.get("a") is not first
+    sessions.close()
+
+def test_session_turns_run_in_order_and_builds_do_not_block(sales_data):
+    pytest.importorskip("langchain")
+    import threading
+    from src.agent.runner import AgentSessions
+    from src.genai.stub_llm import StubChatModel
+    from src.telemetry import telemetry
+
+    # Each run() call gets its own event loop; turns of one session must still not overlap
+    sessions = AgentSessions(PreparedDataset(sales_data), llm_factory=lambda: StubChatModel(latency=0.1), verbose=False)
+    threads = [threading.Thread(target=sessions.run, args=("shared", question)) for question in ["Low stock?", "Trends?", "Store ranking?"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    turns = sorted((turn.root.start_ns, turn.root.end_ns) for turn in telemetry.turns if turn.root.attributes['session_id'] == "shared")
+    assert len(turns) == 3 and all(end <= start for (_, end), (start, _) in zip(turns, turns[1:]))
+    assert len(sessions.get("shared").memory.chat_memory.messages) == 6
+    sessions.close()
+
+    # An agent that is slow to build holds up only its own session
+    release, building = threading.Event(), threading.Event()
+    def slow_then_fast():
+        if not building.is_set():
+            building.set()
+            release.wait(5)
+        return StubChatModel()
+    sessions = AgentSessions(PreparedDataset(sales_data), llm_factory=slow_then_fast, verbose=False)
+    slow = threading.Thread(target=sessions.get, args=("slow",))
+    slow.start()
+    building.wait(5)
+    assert sessions.run("fast", "Low stock?").startswith("Based on the data")
+    assert slow.is_alive()
+    release.set()
+    slow.join()
+    sessions.close()
+
+def test_memory_keeps_prompt_size_bounded(sales_data):
+    pytest.importorskip("langchain")
+    from src.agent import agent_core
+    from src.genai.stub_llm import StubChatModel
+
+    llm = StubChatModel()
+    agent = agent_core.create_cpg_agent(PreparedDataset(sales_data), llm=llm, verbose=False)
+    questions = ["Any sales spikes?", "Low stock?", "Store ranking?", "Weekly trends?", "Seasonality?", "Failed promotion?"]
+    for turn in range(50):
+        agent.run(f"{questions[turn % len(questions)]} (turn {turn})")
+
+    memory = agent.memory
+    metrics = memory.metrics()
+    assert metrics["turns"] == 50 and metrics["summarized_turns"] == 50 - memory.window_turns
+    assert metrics["max_history_tokens"] <= memory.max_tokens + memory.summary_max_tokens
+
+    # Two LLM calls per turn: the prompts of the last 10 turns are no larger than those of turns 10-20
+    assert max(llm.prompt_tokens[-20:]) <= 1.1 * max(llm.prompt_tokens[20:40])
+
+def test_memory_compacts_bulky_messages():
+    from src.agent.memory import get_memory
+
+    memory = get_memory(window_turns=2)
+    table = "SalesSpikes returned 9,000 rows x 13 columns (result handle: R7).\n" + "\n".join(f"row {i} " * 10 for i in range(500))
+    memory.save_context({"input": "Show spikes"}, {"output": table})
+
+    stored = memory.chat_memory.messages[-1].content
+    assert len(stored) < len(table) / 10
+    assert "full result: R7" in stored
+
+    for turn in range(3):
+        memory.save_context({"input": f"question {turn}"}, {"output": f"answer {turn}"})
+    history = memory.load_memory_variables({})["chat_history"]
+    assert len(history) == 5
+    assert "User: Show spikes -> Agent: SalesSpikes returned 9,000 rows" in history[0].content
+
+def test_planner_runs_composite_question_in_two_llm_calls(sales_data):
+    pytest.importorskip("langchain")
+    from src.agent import agent_core
+    from src.genai.stub_llm import StubChatModel, HEALTH_CHECK_ROUTES
+
+    dataset = PreparedDataset(sales_data)
+    react_llm, plan_llm = StubChatModel(), StubChatModel()
+    react = agent_core.create_cpg_agent(dataset, llm=react_llm, verbose=False)
+    planner = agent_core.create_cpg_agent(dataset, llm=plan_llm, verbose=False, mode='plan')
+
+    react.run("Full health check please")
+    answer = planner.run("Full health check please")
+
+    # ReAct: one LLM call per tool plus the answer; planner: one plan and one synthesis
+    # (the wall-clock speedup this buys is measured by benchmarks/bench_planner.py)
+    assert len(react_llm.prompt_tokens) == len(HEALTH_CHECK_ROUTES) + 1
+    assert len(plan_llm.prompt_tokens) == 2
+    assert planner.last_plan == HEALTH_CHECK_ROUTES
+    assert answer.startswith("Based on the data") and answer.count(";") == len(HEALTH_CHECK_ROUTES) - 1
+    assert len(planner.memory.chat_memory.messages) == 2
+
+def test_planner_reports_tool_errors_and_runs_on_sessions(sales_data):
+    pytest.importorskip("langchain")
+    from langchain_core.tools import Tool
+    from src.agent.memory import get_memory
+    from src.agent.planner import PlannerAgent
+    from src.agent.runner import AgentSessions
+    from src.genai.stub_llm import StubChatModel
+
+    def failing(tool_input):
+        raise ValueError("bad threshold")
+
+    planner = PlannerAgent([Tool(name="SalesSpikes", func=failing, description="spikes")], StubChatModel(), get_memory(), "system")
+    assert planner.run("Any sales spikes?") == "Based on the data: Error: ValueError: bad threshold"
+
+    sessions = AgentSessions(PreparedDataset(sales_data), llm_factory=StubChatModel, verbose=False, mode='plan')
+    assert sessions.run("s", "Any store ranking?").startswith("Based on the data")
+    assert sessions.get("s").last_plan == [('StorePerformance', 'revenue')]
+    sessions.close()
+
+def test_parse_plan():
+    from src.agent.planner import parse_plan
+
+    tools = {'SalesSpikes', 'ScenarioGrid'}
+    text = 'Plan:\n```json\n[{"tool": "SalesSpikes", "input": "2.0"}, {"action": "SalesSpikes", "action_input": "2.0"},' \
+           ' {"tool": "Unknown", "input": ""}, {"tool": "ScenarioGrid", "input": {"sku_ids": [101]}}]\n```'
+    assert parse_plan(text, tools) == [('SalesSpikes', '2.0'), ('ScenarioGrid', '{"sku_ids": [101]}')]
+    assert parse_plan('[]', tools) == []
+    assert parse_plan(text, tools, max_calls=1) == [('SalesSpikes', '2.0')]
+    with pytest.raises(ValueError, match="Could not parse"):
+        parse_plan("I will call SalesSpikes.", tools)
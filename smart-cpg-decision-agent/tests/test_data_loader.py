@@ -0,0 +1,237 @@
+import threading
+import pytest
+import numpy as np
+import pandas as pd
+from src.data_loader import DataLoader, compact_frame, write_partitioned_dataset
+from src.data_loader import read_watermark, write_watermark
+from src.dataset import PreparedDataset
+from src.tools.anomaly_detection import detect_sales_spikes, flag_anomalous_promotions
+
+@pytest.fixture
+def raw_data():
+    return pd.DataFrame({
+        'date': ['2022-01-01', '2022-01-02', '2022-01-03'],
+        'store_id': [1, 2, 1], 'store_region': ['North', 'South', 'North'],
+        'sku_id': [101, 101, 102], 'category': ['Beverages', 'Beverages', 'Snacks'],
+        'units_sold': [18, 20, 5], 'revenue': [90.0, 100.0, 20.0],
+        'promo_flag': [0, 1, 0], 'promo_type': ['None', 'BOGO', 'None'],
+        'price': [5.0, 5.0, 4.0], 'inventory_level': [550, 300, 70000],
+        'store_size': ['Medium', 'Large', 'Medium'], 'holiday_flag': [0, 0, 1]
+    })
+
+def test_compact_frame_dtypes(raw_data):
+    compact = compact_frame(raw_data)
+
+    assert compact['category'].dtype == 'category'
+    assert compact['store_region'].dtype == 'category'
+    assert compact['store_id'].dtype == 'int16'
+    assert compact['promo_flag'].dtype == 'int8'
+    assert compact['revenue'].dtype == 'float32'
+    assert pd.api.types.is_datetime64_any_dtype(compact['date'])
+    assert compact['inventory_level'].dtype == 'int32'
+    assert compact['inventory_level'].tolist() == [550, 300, 70000]
+
+    # The input frame is left untouched
+    assert raw_data['category'].dtype != 'category'
+
+def test_compact_frame_falls_back_when_values_overflow(raw_data):
+    raw_data['store_id'] = [1, 2, 40000]
+    compact = compact_frame(raw_data)
+
+    assert compact['store_id'].tolist() == [1, 2, 40000]
+
+def test_load_data_compact_reports_bytes_saved(raw_data, tmp_path):
+    path = tmp_path / "sales.csv"
+    raw_data.to_csv(path, index=False)
+
+    dl = DataLoader(use_spark=False)
+    df = dl.load_data(str(path), compact=True)
+
+    assert len(df) == 3
+    assert dl.last_memory_report["bytes_saved"] > 0
+    assert dl.last_memory_report["compact_bytes"] == df.memory_usage(deep=True).sum()
+
+def test_load_partitioned_dataset_with_pushdown(raw_data, tmp_path):
+    path = str(tmp_path / "sales")
+    write_partitioned_dataset(raw_data, path)
+
+    dl = DataLoader(use_spark=False)
+    full = dl.load_data(path)
+    assert len(full) == 3
+    assert 'year_month' not in full.columns
+
+    df = dl.load_data(path, columns=['date', 'sku_id', 'units_sold'],
+                      filters={'start_date': '2022-01-02', 'category': 'Beverages'})
+    assert list(df.columns) == ['date', 'sku_id', 'units_sold']
+    assert df['units_sold'].tolist() == [20]
+
+def test_load_for_tools_projects_columns(raw_data, tmp_path):
+    path = tmp_path / "sales.csv"
+    raw_data.to_csv(path, index=False)
+
+    dl = DataLoader(use_spark=False)
+    df = dl.load_for_tools(str(path), ['simulate_price_change'], filters={'sku_id': 101})
+
+    assert list(df.columns) == ['sku_id', 'units_sold', 'revenue', 'price']
+    assert df['units_sold'].tolist() == [18, 20]
+
+    with pytest.raises(ValueError):
+        dl.load_data(str(path), filters={'region': 'North'})
+
+@pytest.mark.parametrize("backend", ['pandas', 'duckdb'])
+@pytest.mark.parametrize("options", [{}, {'holiday_adjusted': True}, {'by_promo_type': True}, {'lift_ratio': True}])
+def test_load_for_tools_covers_every_promotion_option(raw_data, tmp_path, backend, options):
+    if backend == 'duckdb':
+        pytest.importorskip("duckdb")
+    path = tmp_path / "sales.parquet"
+    raw_data.assign(promo_flag=[1, 0, 0]).to_parquet(path, index=False)
+
+    pruned = DataLoader(backend=backend).load_for_tools(str(path), ['flag_anomalous_promotions'])
+    result = flag_anomalous_promotions(pruned, **options)
+    expected = flag_anomalous_promotions(raw_data.assign(promo_flag=[1, 0, 0]), **options)
+    assert result['sku_id'].tolist() == expected['sku_id'].tolist()
+
+def test_fingerprint_changes_with_data(raw_data, tmp_path):
+    path = tmp_path / "sales.csv"
+    raw_data.to_csv(path, index=False)
+
+    dl = DataLoader(use_spark=False)
+    dl.load_data(str(path))
+    first = dl.last_fingerprint
+    dl.load_data(str(path))
+    assert dl.last_fingerprint == first
+    dl.load_data(str(path), compact=True)
+    assert dl.last_fingerprint != first
+
+    raw_data.assign(units_sold=raw_data['units_sold'] + 1000).to_csv(path, index=False)
+    dl.load_data(str(path))
+    assert dl.last_fingerprint != first
+
+def test_subset_of_a_loaded_frame_gets_its_own_cache_key(raw_data, tmp_path):
+    from src.agent.tool_cache import ToolResultCache
+    from src.dataset import dataset_fingerprint
+    path = tmp_path / "sales.csv"
+    raw_data.to_csv(path, index=False)
+    dl = DataLoader(use_spark=False)
+    df = dl.load_data(str(path))
+
+    full = PreparedDataset(df, fingerprint=dl.last_fingerprint)
+    assert full.fingerprint == dl.last_fingerprint
+    # pandas copies attrs onto all of these, so they must not carry the loader's fingerprint
+    subsets = [df[df['category'] == 'Snacks'], df.head(2), df.assign(units_sold=df['units_sold'] * 2), df[['date', 'sku_id', 'units_sold']]]
+    keys = {full.fingerprint} | {dataset_fingerprint(subset) for subset in subsets}
+    assert len(keys) == 1 + len(subsets)
+    assert PreparedDataset(subsets[0]).fingerprint == dataset_fingerprint(subsets[0])
+
+    # A persisted result of the full data is not served to an agent on a subset, even after a restart
+    for dataset in [full, PreparedDataset(subsets[0])]:
+        cache = ToolResultCache(persist_dir=str(tmp_path / "cache"))
+        cache.bind(dataset.fingerprint)
+        rows = cache.wrap("StorePerformance", lambda _: len(dataset))("units_sold")
+        assert rows == len(dataset)
+
+@pytest.fixture
+def history():
+    # 3 months of daily rows for 2 stores x 3 SKUs
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2022-01-01', '2022-03-31', freq='D')
+    grid = pd.MultiIndex.from_product([dates, [1, 2], [101, 102, 103]], names=['date', 'store_id', 'sku_id']).to_frame(index=False)
+    n = len(grid)
+    promo = (rng.random(n) < 0.2).astype(int)
+    units = rng.poisson(20 + 5 * promo)
+    units[rng.random(n) < 0.02] *= 4
+    return grid.assign(
+        date=grid['date'].dt.strftime('%Y-%m-%d'),
+        store_region=np.where(grid['store_id'] == 1, 'North', 'South'),
+        category=np.where(grid['sku_id'] == 103, 'Snacks', 'Beverages'),
+        units_sold=units, revenue=units * 2.5, promo_flag=promo,
+        promo_type=np.where(promo == 1, 'BOGO', 'None'), price=2.5,
+        inventory_level=rng.integers(0, 500, n), store_size='Medium', holiday_flag=0
+    )
+
+def _canonical(frame):
+    return frame.sort_values(['date', 'store_id', 'sku_id']).reset_index(drop=True)
+
+def test_incremental_load_matches_full_recompute(history, tmp_path):
+    path = str(tmp_path / "sales")
+    dl = DataLoader(use_spark=False)
+    write_partitioned_dataset(history[history['date'] < '2022-03-01'], path)
+
+    df, watermark = dl.load_new(path, compact=True)
+    dataset = PreparedDataset(df)
+    assert dl.load_new(path, watermark) == (None, watermark)
+
+    # A new month lands as new partition files; only those are read
+    write_partitioned_dataset(history[history['date'] >= '2022-03-01'], path)
+    watermark_path = str(tmp_path / "watermark.json")
+    write_watermark(watermark, watermark_path)
+    new_rows, watermark = dl.load_new(path, read_watermark(watermark_path), compact=True)
+    assert new_rows['date'].min() == pd.Timestamp('2022-03-01') and len(new_rows) == 31 * 6
+    assert watermark['max_date'] == '2022-03-31'
+
+    fingerprint = dataset.fingerprint
+    dataset.append(new_rows)
+    assert dataset.fingerprint != fingerprint
+
+    full = PreparedDataset(dl.load_data(path, compact=True))
+    incremental, recomputed = dataset.rollups, full.rollups
+    for name in ['daily_category', 'stores', 'sku_stats', 'category_stats']:
+        pd.testing.assert_frame_equal(getattr(incremental, name), getattr(recomputed, name), check_categorical=False)
+    pd.testing.assert_frame_equal(incremental.series_stats.sort_index(), recomputed.series_stats, check_index_type=False)
+    assert incremental.source_rows == len(history)
+
+    for tool in [detect_sales_spikes, flag_anomalous_promotions]:
+        pd.testing.assert_frame_equal(_canonical(tool(dataset)), _canonical(tool(full)), check_categorical=False)
+
+def test_incremental_load_of_single_file(history, tmp_path):
+    path = str(tmp_path / "sales.csv")
+    dl = DataLoader(use_spark=False)
+    history[history['date'] < '2022-02-01'].to_csv(path, index=False)
+    df, watermark = dl.load_new(path)
+    assert watermark == {'max_date': '2022-01-31'}
+
+    history.to_csv(path, index=False)
+    new_rows, watermark = dl.load_new(path, watermark)
+    assert new_rows['date'].min() == '2022-02-01'
+    assert len(df) + len(new_rows) == len(history)
+
+def test_snapshot_keeps_its_version_across_appends(history):
+    earlier, later = history[history['date'] < '2022-03-01'], history[history['date'] >= '2022-03-01']
+    dataset = PreparedDataset(earlier)
+    snapshot = dataset.snapshot()
+    expected = {tool: tool(dataset) for tool in [detect_sales_spikes, flag_anomalous_promotions]}
+
+    dataset.append(later)
+    assert len(dataset) == len(history) and len(snapshot) == len(earlier)
+    assert len(snapshot.rollups.series_codes) == len(snapshot.df)
+    assert snapshot.fingerprint != dataset.fingerprint
+    for tool, result in expected.items():
+        pd.testing.assert_frame_equal(tool(snapshot), result)
+
+def test_tools_read_a_consistent_version_while_appending(history):
+    dataset = PreparedDataset(history[history['date'] < '2022-01-15'])
+    days = sorted(history.loc[history['date'] >= '2022-01-15', 'date'].unique())
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                for tool in [detect_sales_spikes, flag_anomalous_promotions]:
+                    tool(dataset)
+                snapshot = dataset.snapshot()
+                assert len(snapshot.rollups.series_codes) == len(snapshot.df) == snapshot.rollups.source_rows
+            except Exception as error:
+                errors.append(error)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for day in days:
+        dataset.append(history[history['date'] == day])
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert len(dataset) == len(history)
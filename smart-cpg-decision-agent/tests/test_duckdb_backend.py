@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_loader import DataLoader, write_partitioned_dataset
+from src.dataset import dataset_fingerprint
+from src.tools.trend_analysis import calculate_category_trends, compare_stores_performance, analyze_seasonality
+from src.tools.anomaly_detection import detect_sales_spikes, detect_stock_shortages, flag_anomalous_promotions
+from src.tools.scenario_simulation import simulate_price_change, simulate_promotion, simulate_price_grid, simulate_promotion_grid
+from src.tools.scenario_simulation import simulate_price_change_mc
+
+pytest.importorskip("duckdb")
+
+@pytest.fixture(scope="module")
+def sales_data():
+    rng = np.random.default_rng(7)
+    days, stores, skus = 60, 2, 3
+    n = days * stores * skus
+    units = rng.poisson(20, n)
+    units[::47] *= 6
+    price = np.tile([5.0, 4.0, 2.5], days * stores)
+    return pd.DataFrame({
+        'date': np.repeat(pd.date_range('2022-01-01', periods=days).strftime('%Y-%m-%d'), stores * skus),
+        'store_id': np.tile(np.repeat([1, 2], skus), days),
+        'store_region': np.tile(np.repeat(['North', 'South'], skus), days),
+        'sku_id': np.tile([101, 102, 103], days * stores),
+        'category': np.tile(['Beverages', 'Snacks', 'Snacks'], days * stores),
+        'units_sold': units,
+        'revenue': units * price,
+        'promo_flag': (np.arange(n) % 5 == 0).astype(int),
+        'promo_type': np.where(np.arange(n) % 5 == 0, np.where(np.arange(n) % 2 == 0, 'BOGO', 'Discount'), 'None'),
+        'price': price,
+        'inventory_level': rng.integers(0, 200, n),
+        'holiday_flag': (np.arange(n) % 7 == 0).astype(int),
+    })
+
+@pytest.fixture(scope="module", params=["parquet", "csv", "database"])
+def duckdb_data(request, sales_data, tmp_path_factory):
+    directory = tmp_path_factory.mktemp(request.param)
+    if request.param == "csv":
+        path = str(directory / "sales.csv")
+        sales_data.to_csv(path, index=False)
+        return DataLoader(backend='duckdb').load_data(path)
+
+    path = str(directory / "sales.parquet")
+    sales_data.to_parquet(path, index=False)
+    database = str(directory / "sales.duckdb") if request.param == "database" else None
+    return DataLoader(backend='duckdb', database=database).load_data(path)
+
+def assert_same_rows(pandas_result, duckdb_result, keys):
+    """
+    Same columns and same rows, ignoring row order among ties and integer widths.
+    """
+    assert list(duckdb_result.columns) == list(pandas_result.columns)
+    expected = pandas_result.sort_values(keys).reset_index(drop=True)
+    actual = duckdb_result.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+@pytest.mark.parametrize("period", ['D', 'W', 'M', 'Q'])
+def test_category_trends_parity(sales_data, duckdb_data, period):
+    assert_same_rows(
+        calculate_category_trends(sales_data, time_period=period),
+        calculate_category_trends(duckdb_data, time_period=period),
+        ['date', 'category']
+    )
+
+def test_store_and_seasonality_parity(sales_data, duckdb_data):
+    assert_same_rows(compare_stores_performance(sales_data), compare_stores_performance(duckdb_data), ['store_id'])
+    assert_same_rows(analyze_seasonality(sales_data, 'Snacks'), analyze_seasonality(duckdb_data, 'Snacks'), ['month'])
+
+@pytest.mark.parametrize("window", [None, 7])
+def test_sales_spikes_parity(sales_data, duckdb_data, window):
+    pandas_result = detect_sales_spikes(sales_data, threshold=2.0, window=window)
+    assert len(pandas_result) > 0
+    assert_same_rows(pandas_result, detect_sales_spikes(duckdb_data, threshold=2.0, window=window), ['date', 'store_id', 'sku_id'])
+
+@pytest.mark.parametrize("options", [
+    {},
+    {'holiday_adjusted': True, 'lift_ratio': True},
+    {'by_promo_type': True, 'min_lift': {'BOGO': 1.2}},
+])
+def test_shortages_and_promotions_parity(sales_data, duckdb_data, options):
+    assert_same_rows(detect_stock_shortages(sales_data, 20), detect_stock_shortages(duckdb_data, 20), ['date', 'store_id', 'sku_id'])
+    pandas_result = flag_anomalous_promotions(sales_data, **options)
+    assert len(pandas_result) > 0
+    assert_same_rows(pandas_result, flag_anomalous_promotions(duckdb_data, **options), ['date', 'store_id', 'sku_id'])
+
+def test_simulation_parity(sales_data, duckdb_data):
+    assert simulate_price_change(duckdb_data, 101, 0.1) == simulate_price_change(sales_data, 101, 0.1)
+    assert simulate_promotion(duckdb_data, 'Snacks', 0.2, 1.5) == simulate_promotion(sales_data, 'Snacks', 0.2, 1.5)
+    assert simulate_price_change(duckdb_data, 999, 0.1) == "No data found for SKU 999"
+    pd.testing.assert_frame_equal(
+        simulate_price_grid(duckdb_data, [101, 103, 999], [-0.1, 0.2], [-1.5]),
+        simulate_price_grid(sales_data, [101, 103, 999], [-0.1, 0.2], [-1.5])
+    )
+    pd.testing.assert_frame_equal(
+        simulate_promotion_grid(duckdb_data, ['Snacks'], [0.1, 0.2], [1.0]),
+        simulate_promotion_grid(sales_data, ['Snacks'], [0.1, 0.2], [1.0])
+    )
+    pd.testing.assert_frame_equal(
+        simulate_price_change_mc(duckdb_data, [101, 102], 0.1, use_estimated=True, n_draws=1000, seed=1),
+        simulate_price_change_mc(sales_data, [101, 102], 0.1, use_estimated=True, n_draws=1000, seed=1)
+    )
+
+def test_partitioned_load_with_pushdown_and_persistence(sales_data, tmp_path):
+    path = str(tmp_path / "sales")
+    write_partitioned_dataset(sales_data, path)
+    filters = {'start_date': '2022-02-01', 'category': 'Snacks'}
+
+    loader = DataLoader(backend='duckdb', database=str(tmp_path / "sales.duckdb"))
+    table = loader.load_data(path, columns=['date', 'sku_id', 'units_sold'], filters=filters)
+    expected = DataLoader(use_spark=False).load_data(path, columns=['date', 'sku_id', 'units_sold'], filters=filters)
+    assert table.columns == ['date', 'sku_id', 'units_sold']
+    assert len(table) == len(expected)
+    assert table.to_pandas()['units_sold'].sum() == expected['units_sold'].sum()
+    assert dataset_fingerprint(table) == f"duckdb-{loader.last_fingerprint}"
+
+    # The selection is stored in the database file; reopening it finds the same table
+    loader.duckdb.close()
+    reopened = DataLoader(backend='duckdb', database=str(tmp_path / "sales.duckdb"))
+    assert reopened.load_data(path, columns=['date', 'sku_id', 'units_sold'], filters=filters).source == table.source
+    assert reopened.duckdb.execute(f"SELECT COUNT(*) FROM {table.source}").fetchone()[0] == len(expected)
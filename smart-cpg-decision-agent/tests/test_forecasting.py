@@ -0,0 +1,108 @@
+import pytest
+import numpy as np
+import pandas as pd
+from src.dataset import PreparedDataset
+from src.tools.forecasting import RIDGE_PENALTY, SalesPanel, _ridge_calendar, forecast_demand, project_stock_outs
+
+WEEKLY = np.array([10.0, 12.0, 11.0, 13.0, 18.0, 25.0, 20.0])
+
+@pytest.fixture
+def weekly_data():
+    # Four series over eight weeks: a weekly pattern scaled per series, with promotions selling 5 more units
+    dates = pd.date_range('2022-01-03', periods=56, freq='D')
+    rng = np.random.default_rng(0)
+    frames = []
+    for series, (sku_id, store_id) in enumerate([(101, 1), (101, 2), (102, 1), (102, 2)]):
+        promo = (rng.random(len(dates)) < 0.2).astype(int)
+        units = WEEKLY[dates.dayofweek] * (1 + series) + 5 * promo
+        frames.append(pd.DataFrame({
+            'date': dates.strftime('%Y-%m-%d'), 'sku_id': sku_id, 'store_id': store_id, 'store_region': 'North',
+            'category': 'Snacks', 'units_sold': units, 'revenue': units * 4.0, 'promo_flag': promo,
+            'holiday_flag': 0, 'price': 4.0,
+            'inventory_level': 1000 if series < 3 else 200,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+def test_models_forecast_a_weekly_pattern(weekly_data):
+    dataset = PreparedDataset(weekly_data)
+    # The week after the data starts on a Monday
+    expected = np.tile(WEEKLY, 2)
+
+    naive = forecast_demand(dataset, horizon=14, model='seasonal_naive')
+    assert list(naive.columns) == ['date', 'sku_id', 'store_id', 'forecast_units']
+    assert len(naive) == 4 * 14 and naive['date'].min() == pd.Timestamp('2022-02-28')
+
+    # Exponential smoothing has no promotion term, so its level carries part of the promotion lift
+    for model, tolerance in [('exp_smoothing', 3.0), ('ridge', 1.0)]:
+        forecast = forecast_demand(dataset, horizon=14, model=model, sku_ids=[101], store_ids=[1])
+        assert np.allclose(forecast['forecast_units'], expected, atol=tolerance), model
+
+    # The other series scale the pattern (the penalty shrinks the weekday effects a little)
+    forecast = forecast_demand(dataset, horizon=14, model='ridge', sku_ids=[102], store_ids=[2])
+    assert np.allclose(forecast['forecast_units'], 4 * expected, rtol=0.1)
+
+def test_batched_ridge_matches_a_fit_per_series(weekly_data):
+    weekly_data = weekly_data.drop(index=[3, 60, 61]).assign(holiday_flag=lambda df: (df.index % 17 == 0).astype(int))
+    forecast = forecast_demand(weekly_data, horizon=10, model='ridge')
+    parallel = forecast_demand(weekly_data, horizon=10, model='ridge', n_jobs=2)
+    pd.testing.assert_frame_equal(forecast, parallel)
+
+    panel = SalesPanel(weekly_data)
+    calendar = _ridge_calendar(panel, 10).to_numpy()
+    n_days = len(panel.dates)
+    for row in range(len(panel)):
+        observed = ~np.isnan(panel.units[row])
+        features = np.column_stack([calendar[:n_days], panel.promo[row], np.zeros(n_days)])[observed]
+        penalty = np.diag([1e-8] + [RIDGE_PENALTY] * (features.shape[1] - 1))
+        coefficients = np.linalg.solve(features.T @ features + penalty, features.T @ panel.units[row][observed])
+        future = np.column_stack([calendar[n_days:], np.zeros((10, 2))])
+        sku_id, store_id = panel.series[row]
+        series = forecast[(forecast['sku_id'] == sku_id) & (forecast['store_id'] == store_id)]
+        assert np.allclose(series['forecast_units'], np.clip(future @ coefficients, 0, None).round(2), atol=0.01)
+
+def test_forecasts_are_cached_on_the_dataset(weekly_data):
+    dataset = PreparedDataset(weekly_data)
+    forecast_demand(dataset, horizon=28)
+    cached = dataset.derived[('forecast', 'ridge')]
+
+    # Shorter horizons and projected stock-outs read the cached forecasts
+    assert len(forecast_demand(dataset, horizon=7)) == 4 * 7
+    project_stock_outs(dataset, horizon=14)
+    assert dataset.derived[('forecast', 'ridge')] is cached
+
+    dataset.append(weekly_data.assign(date=lambda df: (pd.to_datetime(df['date']) + pd.Timedelta(days=56)).dt.strftime('%Y-%m-%d')))
+    assert dataset.derived == {}
+    assert forecast_demand(dataset, horizon=1)['date'].iloc[0] == pd.Timestamp('2022-04-25')
+
+def test_project_stock_outs(weekly_data):
+    dataset = PreparedDataset(weekly_data)
+    stock_outs = project_stock_outs(dataset, horizon=14, model='seasonal_naive')
+
+    # Only the last series runs out: 200 units against about 4 x 109 a week
+    assert list(stock_outs[['sku_id', 'store_id']].itertuples(index=False, name=None)) == [(102, 2)]
+    # Seasonal naive repeats the series' last week
+    demand = np.cumsum(np.tile(weekly_data['units_sold'].to_numpy()[-7:], 2))
+    first_day = int(np.argmax(200 - demand < 0))
+    row = stock_outs.iloc[0]
+    assert row['days_until_stockout'] == first_day + 1
+    assert row['stockout_date'] == pd.Timestamp('2022-02-28') + pd.Timedelta(days=first_day)
+    assert row['uncovered_units'] == pytest.approx(demand[-1] - 200, abs=0.01)
+
+    with pytest.raises(ValueError, match="Unknown forecast model"):
+        forecast_demand(dataset, model='arima')
+
+def test_agent_answers_stock_out_questions_from_the_forecast(weekly_data):
+    pytest.importorskip("langchain")
+    from src.agent.runner import AgentSessions
+    from src.genai.stub_llm import StubChatModel
+    from src.telemetry import telemetry
+
+    dataset = PreparedDataset(weekly_data)
+    sessions = AgentSessions(dataset, llm_factory=StubChatModel, verbose=False)
+    sessions.run("planner", "Which products will run out in the next two weeks?")
+    assert [span.name for span in telemetry.last_turn("planner").spans if span.kind == 'tool'] == ['ProjectedStockouts']
+    assert ('forecast', 'ridge') in dataset.derived
+
+    sessions.run("planner", "Forecast demand for the next two weeks")
+    assert [span.name for span in telemetry.last_turn("planner").spans if span.kind == 'tool'] == ['DemandForecast']
+    sessions.close()
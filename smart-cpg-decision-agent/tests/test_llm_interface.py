@@ -0,0 +1,52 @@
+import pytest
+pytest.importorskip("langchain_core")
+from langchain_core.messages import HumanMessage
+from src.genai import llm_interface
+from src.genai.llm_cache import SQLiteResponseCache
+from src.genai.stub_llm import StubChatModel
+
+QUESTION = [HumanMessage(content="USER'S INPUT\nAny sales spikes?")]
+
+def test_response_cache_hits_and_evicts(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "llm.sqlite"), max_entries=2)
+    llm = StubChatModel(cache=cache)
+
+    first = llm.invoke(QUESTION)
+    assert llm.invoke(QUESTION).content == first.content
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+
+    # Different model parameters are a different key
+    StubChatModel(cache=cache, latency=0.001).invoke(QUESTION)
+    assert cache.stats()["misses"] == 2
+
+    llm.invoke([HumanMessage(content="USER'S INPUT\nLow stock?")])
+    assert cache.stats()["entries"] == 2
+
+def test_response_cache_ttl(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "llm.sqlite"), ttl=-1)
+    llm = StubChatModel(cache=cache)
+    llm.invoke(QUESTION)
+    llm.invoke(QUESTION)
+    assert cache.stats()["hits"] == 0
+
+def test_get_llm_stub_and_replay_backends(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "recording.sqlite"))
+    stats = llm_interface.LLMCallStats()
+
+    recorded = llm_interface.get_llm(stats=stats).invoke(QUESTION)
+
+    monkeypatch.setenv("LLM_BACKEND", "replay")
+    replay = llm_interface.get_llm(stats=stats)
+    assert replay.invoke(QUESTION).content == recorded.content
+    with pytest.raises(ValueError):
+        replay.invoke([HumanMessage(content="never recorded")])
+
+    assert stats.summary()["calls"] == 3
+    assert llm_interface.llm_metrics()["cache"]["entries"] == 1
+
+def test_get_llm_without_keys_raises(monkeypatch):
+    for name in ["LLM_BACKEND", "LLM_CACHE_PATH", "GOOGLE_API_KEY", "HUGGINGFACEHUB_API_TOKEN", "OPENAI_API_KEY"]:
+        monkeypatch.delenv(name, raising=False)
+    with pytest.raises(ValueError):
+        llm_interface.get_llm()
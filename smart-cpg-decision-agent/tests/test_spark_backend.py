@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.tools.trend_analysis import calculate_category_trends, compare_stores_performance, analyze_seasonality
+from src.tools.anomaly_detection import detect_sales_spikes, detect_stock_shortages, flag_anomalous_promotions
+from src.tools.scenario_simulation import simulate_price_change, simulate_promotion, simulate_price_grid, simulate_promotion_grid
+from src.tools.scenario_simulation import simulate_price_change_mc
+
+pytest.importorskip("pyspark")
+
+@pytest.fixture(scope="module")
+def spark():
+    from pyspark.sql import SparkSession
+    try:
+        session = SparkSession.builder.master("local[1]").appName("cpg-parity-tests").getOrCreate()
+    except Exception as e:
+        pytest.skip(f"Local SparkSession unavailable: {e}")
+    yield session
+    session.stop()
+
+@pytest.fixture(scope="module")
+def sales_data():
+    rng = np.random.default_rng(7)
+    days, stores, skus = 60, 2, 3
+    n = days * stores * skus
+    units = rng.poisson(20, n)
+    units[::47] *= 6
+    price = np.tile([5.0, 4.0, 2.5], days * stores)
+    return pd.DataFrame({
+        'date': np.repeat(pd.date_range('2022-01-01', periods=days).strftime('%Y-%m-%d'), stores * skus),
+        'store_id': np.tile(np.repeat([1, 2], skus), days),
+        'store_region': np.tile(np.repeat(['North', 'South'], skus), days),
+        'sku_id': np.tile([101, 102, 103], days * stores),
+        'category': np.tile(['Beverages', 'Snacks', 'Snacks'], days * stores),
+        'units_sold': units,
+        'revenue': units * price,
+        'promo_flag': (np.arange(n) % 5 == 0).astype(int),
+        'price': price,
+        'inventory_level': rng.integers(0, 200, n),
+    })
+
+@pytest.fixture(scope="module")
+def spark_data(spark, sales_data):
+    return spark.createDataFrame(sales_data.astype({'date': object, 'store_region': object, 'category': object}))
+
+def assert_same_rows(pandas_result, spark_result, keys):
+    """
+    Same columns and same rows, ignoring row order among ties and integer widths.
+    """
+    assert list(spark_result.columns) == list(pandas_result.columns)
+    expected = pandas_result.sort_values(keys).reset_index(drop=True)
+    actual = spark_result.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+@pytest.mark.parametrize("period", ['D', 'W', 'M', 'Q'])
+def test_category_trends_parity(sales_data, spark_data, period):
+    assert_same_rows(
+        calculate_category_trends(sales_data, time_period=period),
+        calculate_category_trends(spark_data, time_period=period),
+        ['date', 'category']
+    )
+
+def test_store_and_seasonality_parity(sales_data, spark_data):
+    assert_same_rows(compare_stores_performance(sales_data), compare_stores_performance(spark_data), ['store_id'])
+    assert_same_rows(analyze_seasonality(sales_data, 'Snacks'), analyze_seasonality(spark_data, 'Snacks'), ['month'])
+
+@pytest.mark.parametrize("window", [None, 7])
+def test_sales_spikes_parity(sales_data, spark_data, window):
+    pandas_result = detect_sales_spikes(sales_data, threshold=2.0, window=window)
+    assert len(pandas_result) > 0
+    assert_same_rows(pandas_result, detect_sales_spikes(spark_data, threshold=2.0, window=window), ['date', 'store_id', 'sku_id'])
+
+def test_shortages_and_promotions_parity(sales_data, spark_data):
+    assert_same_rows(detect_stock_shortages(sales_data, 20), detect_stock_shortages(spark_data, 20), ['date', 'store_id', 'sku_id'])
+    assert_same_rows(flag_anomalous_promotions(sales_data), flag_anomalous_promotions(spark_data), ['date', 'store_id', 'sku_id'])
+
+@pytest.mark.parametrize("options", [
+    {'holiday_adjusted': True, 'lift_ratio': True},
+    {'by_promo_type': True, 'min_lift': {'BOGO': 1.2}},
+])
+def test_promotion_options_parity(spark, sales_data, options):
+    data = sales_data.assign(
+        holiday_flag=(np.arange(len(sales_data)) % 7 == 0).astype(int),
+        promo_type=np.where(sales_data['promo_flag'] == 1, np.where(np.arange(len(sales_data)) % 2 == 0, 'BOGO', 'Discount'), 'None')
+    )
+    pandas_result = flag_anomalous_promotions(data, **options)
+    assert len(pandas_result) > 0
+    spark_result = flag_anomalous_promotions(spark.createDataFrame(data.astype({'date': object, 'store_region': object, 'category': object})), **options)
+    assert_same_rows(pandas_result, spark_result, ['date', 'store_id', 'sku_id'])
+
+def test_simulation_parity(sales_data, spark_data):
+    assert simulate_price_change(spark_data, 101, 0.1) == simulate_price_change(sales_data, 101, 0.1)
+    assert simulate_promotion(spark_data, 'Snacks', 0.2, 1.5) == simulate_promotion(sales_data, 'Snacks', 0.2, 1.5)
+    assert simulate_price_change(spark_data, 999, 0.1) == "No data found for SKU 999"
+
+def test_simulation_grid_parity(sales_data, spark_data):
+    pd.testing.assert_frame_equal(
+        simulate_price_grid(spark_data, [101, 103, 999], [-0.1, 0.2], [-1.5]),
+        simulate_price_grid(sales_data, [101, 103, 999], [-0.1, 0.2], [-1.5])
+    )
+    pd.testing.assert_frame_equal(
+        simulate_promotion_grid(spark_data, ['Snacks'], [0.1, 0.2], [1.0]),
+        simulate_promotion_grid(sales_data, ['Snacks'], [0.1, 0.2], [1.0])
+    )
+
+def test_monte_carlo_parity(sales_data, spark_data):
+    pd.testing.assert_frame_equal(
+        simulate_price_change_mc(spark_data, [101, 102], 0.1, use_estimated=True, n_draws=1000, seed=1),
+        simulate_price_change_mc(sales_data, [101, 102], 0.1, use_estimated=True, n_draws=1000, seed=1)
+    )
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import threading
+import pytest
+from src.ui.startup import BackgroundStartup, LAZY_MODULES
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def test_front_ends_and_tools_import_no_heavy_dependencies():
+    script = (
+        "import sys\n"
+        "import src.ui.cli, src.data_loader, src.agent.runner\n"
+        "import src.tools.trend_analysis, src.tools.anomaly_detection, src.tools.scenario_simulation\n"
+        f"print([m for m in {LAZY_MODULES!r} if m in sys.modules])\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+def test_background_startup_signals_ready():
+    release = threading.Event()
+    def load_dataset():
+        release.wait(5)
+        return "dataset"
+
+    startup = BackgroundStartup(load_dataset, lambda dataset: f"sessions for {dataset}")
+    assert not startup.ready.is_set()
+    assert startup.stage == "loading data"
+
+    release.set()
+    assert startup.result(timeout=5) == ("dataset", "sessions for dataset")
+    assert startup.ready.wait(5)
+    assert startup.stage == "ready" and not startup.failed
+    assert set(startup.timings) == {"imports", "dataset", "agent", "total"}
+
+def test_background_startup_failure_sets_ready_and_reraises():
+    def build_sessions(dataset):
+        raise RuntimeError("no LLM key")
+
+    startup = BackgroundStartup(lambda: "dataset", build_sessions)
+    assert startup.ready.wait(5)
+    assert startup.failed
+    assert startup.stage == "building the agent"
+    with pytest.raises(RuntimeError, match="no LLM key"):
+        startup.result()
+
+def test_cli_load_reports_the_memory_saved(tmp_path):
+    import argparse
+    from src.synthetic import generate_sales_frame
+    from src.ui.cli import load_dataset
+
+    path = str(tmp_path / "sales.parquet")
+    generate_sales_frame(2, 5, 30).to_parquet(path, index=False)
+    dataset, memory_report = load_dataset(argparse.Namespace(backend="pandas", database=None), path)
+    assert len(dataset) == 2 * 5 * 30
+    assert memory_report["bytes_saved"] == memory_report["original_bytes"] - memory_report["compact_bytes"]
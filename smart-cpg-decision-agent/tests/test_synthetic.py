@@ -0,0 +1,45 @@
+import pandas as pd
+from src.data_loader import DataLoader
+from src.dataset import PreparedDataset
+from src.synthetic import generate_sales_frame, write_sales_dataset
+from src.tools.anomaly_detection import detect_stock_shortages
+
+COLUMNS = [
+    'date', 'store_id', 'store_region', 'sku_id', 'category', 'units_sold', 'revenue',
+    'promo_flag', 'promo_type', 'price', 'inventory_level', 'store_size', 'holiday_flag'
+]
+
+def test_generated_frame_has_the_production_schema():
+    df = generate_sales_frame(n_stores=4, n_skus=10, n_days=30)
+
+    assert sorted(df.columns) == sorted(COLUMNS)
+    assert len(df) == 4 * 10 * 30
+    assert not df.duplicated(['date', 'store_id', 'sku_id']).any()
+    assert set(df.loc[df['promo_flag'] == 0, 'promo_type']) == {'None'}
+    assert (df['units_sold'] >= 0).all() and (df['inventory_level'] >= 0).all()
+    assert (df['revenue'] - df['units_sold'] * df['price']).abs().max() < 0.01
+
+def test_generation_is_deterministic_and_independent_of_chunking(tmp_path):
+    expected = generate_sales_frame(n_stores=3, n_skus=8, n_days=90, seed=7)
+    pd.testing.assert_frame_equal(expected, generate_sales_frame(n_stores=3, n_skus=8, n_days=90, seed=7))
+    assert not expected.equals(generate_sales_frame(n_stores=3, n_skus=8, n_days=90, seed=8))
+
+    # Month-sized chunks written by two worker processes read back as the single frame
+    rows = write_sales_dataset(str(tmp_path / "sales"), n_stores=3, n_skus=8, n_days=90, seed=7, workers=2, chunk_rows=500)
+    loaded = DataLoader(use_spark=False).load_data(str(tmp_path / "sales"))
+    loaded = loaded[expected.columns].sort_values(['date', 'store_id', 'sku_id']).reset_index(drop=True)
+
+    assert rows == len(expected)
+    pd.testing.assert_frame_equal(loaded, expected, check_dtype=False, check_categorical=False)
+
+def test_rates_and_injected_anomalies():
+    df = generate_sales_frame(n_stores=20, n_skus=50, n_days=60, promo_rate=0.2, stockout_rate=0.01, labels=True)
+
+    assert abs(df['promo_flag'].mean() - 0.2) < 0.01
+    stockouts = df[df['injected_anomaly'] == 'stockout']
+    assert abs(len(stockouts) / len(df) - 0.01) < 0.002
+
+    # Every injected stock-out is found by the shortage detector
+    shortages = detect_stock_shortages(PreparedDataset(df.drop(columns='injected_anomaly')), critical_level=5)
+    found = set(zip(shortages['date'].astype(str), shortages['store_id'], shortages['sku_id']))
+    assert set(zip(stockouts['date'].astype(str), stockouts['store_id'], stockouts['sku_id'])) <= found
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from src.dataset import PreparedDataset
+from src.telemetry import Telemetry, format_turn, trace_memory, trace_scan, trace_tool
+
+pytest.importorskip("langchain")
+
+@pytest.fixture(scope="module")
+def dataset():
+    n = 400
+    return PreparedDataset(pd.DataFrame({
+        'date': np.repeat(pd.date_range('2022-01-01', periods=100).strftime('%Y-%m-%d'), 4),
+        'store_id': np.tile([1, 1, 2, 2], 100), 'store_region': np.tile(['North', 'North', 'South', 'South'], 100),
+        'sku_id': np.tile([101, 102], 200), 'category': np.tile(['Beverages', 'Snacks'], 200),
+        'units_sold': np.arange(n) % 30 + 1, 'revenue': (np.arange(n) % 30 + 1) * 4.0,
+        'promo_flag': (np.arange(n) % 6 == 0).astype(int), 'promo_type': np.where(np.arange(n) % 6 == 0, 'BOGO', 'None'),
+        'price': 4.0, 'inventory_level': np.arange(n) % 90, 'holiday_flag': (np.arange(n) % 9 == 0).astype(int),
+    }))
+
+def test_turn_records_every_tool_and_llm_call(dataset):
+    from src.agent.runner import AgentSessions
+    from src.genai.stub_llm import StubChatModel, HEALTH_CHECK_ROUTES
+    from src.telemetry import telemetry
+
+    llm = StubChatModel()
+    sessions = AgentSessions(dataset, llm_factory=lambda: llm, verbose=False)
+    sessions.run("profiled", "Full health check")
+    turn = telemetry.last_turn("profiled")
+    summary = turn.summary()
+
+    assert summary["llm_calls"] == len(HEALTH_CHECK_ROUTES) + 1
+    assert summary["prompt_tokens"] == sum(llm.prompt_tokens)
+    assert summary["completion_tokens"] > 0
+    assert summary["tool_calls"] == len(HEALTH_CHECK_ROUTES) and summary["cache_hits"] == 0
+    assert summary["dataset_rows"] == len(HEALTH_CHECK_ROUTES) * len(dataset)
+    assert [span.name for span in turn.spans if span.kind == 'tool'] == [tool for tool, _ in HEALTH_CHECK_ROUTES]
+    assert all(span.trace_id == turn.root.trace_id and span.parent_id == turn.root.span_id for span in turn.spans)
+    spikes = next(span for span in turn.spans if span.name == 'SalesSpikes')
+    assert spikes.attributes["result_rows"] >= 0 and spikes.attributes["result_bytes"] > 0
+    # The size of the data each tool was given, not rows it read (most answer from the rollups)
+    assert f"{len(dataset):,} dataset rows -> " in format_turn(turn) and "scanned" not in format_turn(turn)
+
+    # The same question again is answered from the tool cache
+    sessions.run("profiled", "Full health check")
+    summary = telemetry.last_turn("profiled").summary()
+    assert summary["cache_hits"] == len(HEALTH_CHECK_ROUTES) and summary["dataset_rows"] == 0
+    assert "SalesSpikes(2.0)" in format_turn(telemetry.last_turn("profiled"))
+    assert set(telemetry.hot_spots()['name']) >= {'StubChatModel', 'SalesSpikes'}
+    sessions.close()
+
+def test_concurrent_turns_keep_their_own_spans(dataset):
+    from src.agent.runner import AgentSessions
+    from src.genai.stub_llm import StubChatModel
+    from src.telemetry import telemetry
+
+    sessions = AgentSessions(dataset, llm_factory=lambda: StubChatModel(latency=0.05), verbose=False, mode='plan')
+    questions = {"a": "Any sales spikes?", "b": "Low stock?", "c": "Store ranking?"}
+
+    async def ask_all():
+        await asyncio.gather(*(sessions.arun(session, question) for session, question in questions.items()))
+
+    asyncio.run(ask_all())
+    tools = {session: [span.name for span in telemetry.last_turn(session).spans if span.kind == 'tool'] for session in questions}
+    assert tools == {"a": ["SalesSpikes"], "b": ["StockShortages"], "c": ["StorePerformance"]}
+    assert all(telemetry.last_turn(session).summary()["llm_calls"] == 2 for session in questions)
+    sessions.close()
+
+def test_spans_are_written_as_json_lines(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    collector = Telemetry(path=str(path))
+    frame = pd.DataFrame({'x': range(100)})
+
+    def failing(tool_input):
+        raise ValueError("bad input")
+
+    allocate = trace_tool("Allocate", trace_scan(lambda size: np.ones(int(size)), frame))
+    trace_memory()
+    try:
+        with collector.turn("Allocate some memory", session_id=7):
+            allocate("1000000")
+            with pytest.raises(ValueError):
+                trace_tool("Failing", failing, cached=False)("x")
+    finally:
+        trace_memory(False)
+    # Calls outside a turn are not recorded
+    allocate("10")
+
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    root, allocated, failed = spans
+    assert root["name"] == "turn" and root["parent_span_id"] is None
+    assert root["attributes"]["session_id"] == "7" and root["attributes"]["tool_calls"] == 2
+    assert root["attributes"]["errors"] == 1
+    assert allocated["parent_span_id"] == root["span_id"] and allocated["trace_id"] == root["trace_id"]
+    assert allocated["attributes"]["dataset_rows"] == 100 and allocated["attributes"]["cache_hit"] is False
+    assert allocated["attributes"]["peak_memory_bytes"] >= 8_000_000
+    assert failed["status"] == {"code": "ERROR", "message": "ValueError: bad input"}
+    assert len(collector.turns) == 1
@@ -1,6 +1,12 @@
 import pytest
+import numpy as np
 import pandas as pd
-from src.tools.scenario_simulation import simulate_price_change
+from src.tools.scenario_simulation import simulate_price_change, simulate_promotion, simulate_price_grid, simulate_promotion_grid
+from src.tools.scenario_simulation import estimate_elasticities, simulate_price_change_mc
+from src.tools.anomaly_detection import detect_sales_spikes, flag_anomalous_promotions
+from src.tools.anomaly_detection import detect_sales_spikes_streaming, detect_stock_shortages_streaming
+from src.tools.trend_analysis import calculate_category_trends, compare_stores_performance, analyze_seasonality
+from src.dataset import PreparedDataset
 
 @pytest.fixture
 def sample_data():
@@ -25,3 +31,193 @@ def test_simulate_price_change(sample_data):
     # Original revenue is 300. New price is 11. New volume 27. New revenue = 297
     assert result['original_revenue'] == 300.0
     assert result['simulated_revenue'] == 297.0
+
+@pytest.fixture
+def spike_data():
+    return pd.DataFrame({
+        'date': pd.date_range(start='2022-01-01', periods=10, freq='D').strftime('%Y-%m-%d').tolist() * 2,
+        'store_id': [1] * 20,
+        'sku_id': [101] * 10 + [102] * 10,
+        'units_sold': [10, 12, 11, 15, 80, 12, 9, 11, 14, 10] + [20] * 10,
+    })
+
+def test_detect_sales_spikes(spike_data):
+    result = detect_sales_spikes(spike_data, threshold=2.0)
+
+    # Only the day-5 spike of SKU 101 exceeds mean + 2 * std; SKU 102 is flat (std 0)
+    assert list(result.index) == [4]
+    assert result['units_sold'].tolist() == [80]
+
+def test_detect_sales_spikes_rolling_window(spike_data):
+    result = detect_sales_spikes(spike_data, threshold=2.0, window=3)
+
+    # Against its trailing 3-day history, the spike is flagged and the day after it is not
+    assert 4 in result.index
+    assert 5 not in result.index
+    # The first two days of each series have too little history to form a baseline
+    assert not set(result.index) & {0, 1, 10, 11}
+
+@pytest.mark.parametrize("file_format", ["parquet", "csv"])
+def test_streaming_detectors_match_in_memory(spike_data, tmp_path, file_format):
+    data = spike_data.assign(promo_flag=0, inventory_level=[40, 60] * 10)
+    path = str(tmp_path / f"sales.{file_format}")
+    data.to_parquet(path, row_group_size=4) if file_format == "parquet" else data.to_csv(path, index=False)
+
+    # Batches of 3 rows split every series across batches
+    summary = detect_sales_spikes_streaming(path, str(tmp_path / "spikes.parquet"), threshold=2.0, batch_rows=3)
+    assert summary == {"rows_scanned": 20, "anomalies": 1, "output_path": str(tmp_path / "spikes.parquet")}
+    assert pd.read_parquet(tmp_path / "spikes.parquet")['units_sold'].tolist() == [80]
+
+    detect_stock_shortages_streaming(path, str(tmp_path / "shortages.parquet"), critical_level=50, batch_rows=3)
+    shortages = pd.read_parquet(tmp_path / "shortages.parquet")
+    assert len(shortages) == 10 and (shortages['inventory_level'] < 50).all()
+
+@pytest.fixture
+def promo_data():
+    # Series (101, 1): non-promo units 10, 10 on regular days and 30 on a holiday; series (102, 1) has no holiday baseline
+    return pd.DataFrame({
+        'date': pd.date_range('2022-01-01', periods=9).strftime('%Y-%m-%d'),
+        'store_id': [1] * 9, 'store_region': ['North'] * 9, 'category': ['Snacks'] * 9, 'price': [2.0] * 9,
+        'sku_id': [101, 101, 101, 101, 101, 101, 102, 102, 102],
+        'units_sold': [10, 10, 30, 12, 25, 20, 10, 10, 15],
+        'promo_flag': [0, 0, 0, 1, 1, 1, 0, 0, 1],
+        'promo_type': ['None', 'None', 'None', 'Discount', 'BOGO', 'BOGO', 'None', 'None', 'Discount'],
+        'holiday_flag': [0, 0, 1, 0, 1, 0, 0, 0, 1],
+    }).assign(revenue=lambda f: f['units_sold'] * 2.0)
+
+def test_failed_promotions_match_merge_baseline(promo_data):
+    baseline = promo_data[promo_data['promo_flag'] == 0].groupby(['sku_id', 'store_id'])['units_sold'].mean()
+    merged = promo_data[promo_data['promo_flag'] == 1].merge(baseline.rename('baseline_avg_units').reset_index(), on=['sku_id', 'store_id'], how='left')
+    expected = merged[merged['units_sold'] < merged['baseline_avg_units']]
+
+    pd.testing.assert_frame_equal(flag_anomalous_promotions(promo_data), expected)
+    pd.testing.assert_frame_equal(flag_anomalous_promotions(PreparedDataset(promo_data)).assign(date=lambda f: f['date'].dt.strftime('%Y-%m-%d')), expected, check_dtype=False)
+
+@pytest.mark.parametrize("options, flagged_units", [
+    ({}, [12]),
+    ({'holiday_adjusted': True}, [25]),
+    ({'by_promo_type': True}, [12, 20]),
+    ({'min_lift': {'BOGO': 1.6}}, [12, 25, 20]),
+])
+def test_failed_promotion_options(promo_data, options, flagged_units):
+    raw = flag_anomalous_promotions(promo_data, lift_ratio=True, **options)
+    prepared = flag_anomalous_promotions(PreparedDataset(promo_data), lift_ratio=True, **options)
+
+    assert raw['units_sold'].tolist() == flagged_units
+    assert prepared['units_sold'].tolist() == flagged_units
+    np.testing.assert_allclose(raw['lift'], raw['units_sold'] / raw['baseline_avg_units'])
+    if options.get('by_promo_type'):
+        # Discount lifts 12/(50/3) and 15/10 average to 1.11
+        assert raw['expected_units'].iloc[0] == pytest.approx(50 / 3 * (0.72 + 1.5) / 2)
+
+@pytest.fixture
+def sales_data():
+    return pd.DataFrame({
+        'date': ['2022-01-01', '2022-01-02', '2022-02-03', '2022-02-04'],
+        'store_id': [1, 2, 1, 2], 'store_region': ['North', 'South', 'North', 'South'],
+        'sku_id': [101, 101, 102, 102], 'category': ['Beverages', 'Beverages', 'Snacks', 'Snacks'],
+        'units_sold': [10, 20, 5, 8], 'revenue': [50.0, 100.0, 20.0, 32.0],
+        'promo_flag': [0, 1, 0, 1], 'promo_type': ['None', 'BOGO', 'None', 'Discount'],
+        'price': [5.0, 5.0, 4.0, 4.0], 'inventory_level': [550, 30, 70, 20],
+        'store_size': ['Medium', 'Large', 'Medium', 'Large'], 'holiday_flag': [0, 0, 1, 0]
+    })
+
+def test_tools_leave_input_frame_unchanged(sales_data):
+    snapshot = sales_data.copy()
+    dataset = PreparedDataset(sales_data)
+    prepared_snapshot = dataset.df.copy()
+
+    for data in (sales_data, dataset):
+        calculate_category_trends(data, time_period='W')
+        calculate_category_trends(data, time_period='M')
+        analyze_seasonality(data, category='Snacks')
+        compare_stores_performance(data)
+        detect_sales_spikes(data, window=7)
+        flag_anomalous_promotions(data)
+
+    pd.testing.assert_frame_equal(sales_data, snapshot)
+    pd.testing.assert_frame_equal(dataset.df, prepared_snapshot)
+
+def test_trends_match_between_raw_and_prepared(sales_data):
+    dataset = PreparedDataset(sales_data)
+
+    raw = calculate_category_trends(sales_data, time_period='M')
+    prepared = calculate_category_trends(dataset, time_period='M')
+
+    pd.testing.assert_frame_equal(raw, prepared)
+    assert prepared['date'].dt.day.tolist() == [31, 28]
+
+    seasonality = analyze_seasonality(dataset, category='Snacks')
+    assert seasonality['month'].tolist() == [2]
+    assert seasonality['total_revenue'].tolist() == [52.0]
+
+def test_rollups_match_raw_rows_and_refresh(sales_data):
+    dataset = PreparedDataset(sales_data)
+
+    pd.testing.assert_frame_equal(
+        compare_stores_performance(dataset, metric='units_sold').reset_index(drop=True),
+        compare_stores_performance(sales_data, metric='units_sold').reset_index(drop=True)
+    )
+    pd.testing.assert_frame_equal(
+        calculate_category_trends(dataset, time_period='W'),
+        calculate_category_trends(sales_data, time_period='W')
+    )
+
+    # The cube only changes when it is refreshed
+    fingerprint = dataset.fingerprint
+    dataset.df = pd.concat([dataset.df, dataset.df.iloc[[0]]], ignore_index=True)
+    assert dataset.fingerprint != fingerprint
+    assert dataset.rollups.stores['total_units_sold'].sum() == 43
+    dataset.refresh_rollups()
+    assert dataset.rollups.stores['total_units_sold'].sum() == 53
+
+def test_simulations_match_between_raw_and_prepared(sales_data):
+    dataset = PreparedDataset(sales_data)
+
+    for sku_id in (101, 102, 999):
+        assert simulate_price_change(dataset, sku_id, 0.1) == simulate_price_change(sales_data, sku_id, 0.1)
+    for category in ('Beverages', 'Snacks', 'Dairy'):
+        assert simulate_promotion(dataset, category, 0.2, 1.5) == simulate_promotion(sales_data, category, 0.2, 1.5)
+
+def test_price_grid_matches_single_simulations(sales_data):
+    grid = simulate_price_grid(sales_data, sku_ids=[101, 102, 999], price_changes=[-0.2, 0.1, 0.8], elasticities=[-0.8, -1.5])
+
+    # SKU 999 has no data; 2 SKUs x 3 price changes x 2 elasticities remain
+    assert len(grid) == 12
+    for row in grid.itertuples():
+        single = simulate_price_change(sales_data, row.sku_id, row.price_change_pct, row.elasticity)
+        assert row.simulated_total_units == single['simulated_total_units']
+        assert row.simulated_revenue == single['simulated_revenue']
+
+def test_promotion_grid_matches_single_simulations(sales_data):
+    dataset = PreparedDataset(sales_data)
+    grid = simulate_promotion_grid(dataset, categories=['Snacks', 'Beverages'], promo_uplifts=[0.1, 0.3], promo_costs_per_unit=[1.5])
+
+    assert grid['category'].tolist() == ['Snacks', 'Snacks', 'Beverages', 'Beverages']
+    for row in grid.itertuples():
+        single = simulate_promotion(sales_data, row.category, row.promo_uplift_pct, row.promo_cost_per_unit)
+        assert row.simulated_net_revenue == single['simulated_net_revenue']
+
+def test_estimate_elasticities_recovers_log_log_slope():
+    rng = np.random.default_rng(0)
+    price = rng.uniform(2.0, 10.0, 400)
+    units = np.exp(8.0 - 1.2 * np.log(price) + rng.normal(0, 0.05, 400))
+    df = pd.DataFrame({'sku_id': [101] * 200 + [102] * 200, 'price': price, 'units_sold': units})
+    df.loc[df['sku_id'] == 102, 'price'] = 5.0
+
+    fitted = estimate_elasticities(df)
+
+    assert fitted.loc[101, 'elasticity'] == pytest.approx(-1.2, abs=0.05)
+    assert fitted.loc[101, 'observations'] == 200
+    # No price variation, no elasticity
+    assert np.isnan(fitted.loc[102, 'elasticity'])
+
+def test_price_change_mc_is_reproducible_and_centred(sales_data):
+    first = simulate_price_change_mc(sales_data, [101, 102], 0.1, elasticity_mean=-1.0, elasticity_sd=0.2, n_draws=5000, seed=42)
+    second = simulate_price_change_mc(sales_data, [101, 102], 0.1, elasticity_mean=-1.0, elasticity_sd=0.2, n_draws=5000, seed=42)
+    pd.testing.assert_frame_equal(first, second)
+
+    point = simulate_price_change(sales_data, 101, 0.1, elasticity=-1.0)
+    row = first.iloc[0]
+    assert row['simulated_total_units_p5'] < point['simulated_total_units'] < row['simulated_total_units_p95']
+    assert row['simulated_revenue_p50'] == pytest.approx(point['simulated_revenue'], rel=0.01)